@@ -1,7 +1,49 @@
+const API_BASE = "https://safecheck.up.railway.app";
+const QUEUE_KEY = "pendingReports";
+
+function loadQueue() {
+  return new Promise(resolve =>
+    chrome.storage.local.get({ [QUEUE_KEY]: [] }, items => resolve(items[QUEUE_KEY]))
+  );
+}
+
+function saveQueue(queue) {
+  return new Promise(resolve => chrome.storage.local.set({ [QUEUE_KEY]: queue }, resolve));
+}
+
+async function queueReport(data) {
+  const queue = await loadQueue();
+  queue.push(data);
+  await saveQueue(queue);
+}
+
+// Upload the reports saved while offline in one request. Every report has a
+// client_report_id, so resending after a lost response does not duplicate it.
+async function flushQueue() {
+  const queue = await loadQueue();
+  if (!queue.length) return 0;
+
+  const response = await fetch(`${API_BASE}/api/report-scam/bulk/`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(queue)
+  });
+  if (!response.ok) return 0;
+
+  // Created and duplicate reports are on the server, and invalid ones never
+  // will be; reports past the server's batch limit stay queued
+  const result = await response.json();
+  const handled = new Set(result.results.map(item => queue[item.index].client_report_id));
+  const remaining = (await loadQueue()).filter(report => !handled.has(report.client_report_id));
+  await saveQueue(remaining);
+  return handled.size;
+}
+
 document.getElementById("scamForm").addEventListener("submit", async (e) => {
   e.preventDefault();
 
   const data = {
+    client_report_id: crypto.randomUUID(),
     initiative_type: document.getElementById("initiative_type").value,
     reference: document.getElementById("reference").value,
     description: document.getElementById("description").value,
@@ -13,7 +55,7 @@ document.getElementById("scamForm").addEventListener("submit", async (e) => {
   const resultEl = document.getElementById("resultMessage");
 
   try {
-    const response = await fetch("https://safecheck.up.railway.app/api/report-scam/", {
+    const response = await fetch(`${API_BASE}/api/report-scam/`, {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify(data)
@@ -23,12 +65,19 @@ document.getElementById("scamForm").addEventListener("submit", async (e) => {
       resultEl.textContent = "✅ Report submitted successfully!";
       resultEl.className = "mt-4 text-green-600 font-semibold";
       document.getElementById("scamForm").reset();
+      flushQueue().catch(() => {});
     } else {
       resultEl.textContent = "❌ Error submitting report. Please try again.";
       resultEl.className = "mt-4 text-red-600 font-semibold";
     }
   } catch (err) {
-    resultEl.textContent = "⚠️ Network error. Check your internet.";
+    await queueReport(data);
+    resultEl.textContent = "⚠️ You're offline. Report saved and will be sent when you're back online.";
     resultEl.className = "mt-4 text-yellow-600 font-semibold";
+    document.getElementById("scamForm").reset();
   }
 });
+
+// Send anything saved offline whenever the popup opens or the connection returns
+flushQueue().catch(() => {});
+window.addEventListener("online", () => flushQueue().catch(() => {}));
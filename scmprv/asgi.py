@@ -2,6 +2,9 @@
 ASGI config for scmprv project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Production runs it under gunicorn with uvicorn workers::
+
+    gunicorn scmprv.asgi:application -k uvicorn_worker.UvicornWorker
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
@@ -9,8 +12,12 @@ https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 
 import os
 
+from scmprv import boot
+
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'scmprv.settings')
 
 application = get_asgi_application()
+
+boot.logger.info("ASGI application loaded in %.0f ms", boot.elapsed_ms())
@@ -0,0 +1,28 @@
+"""
+Boot timing for the web process.
+
+``wsgi.py`` and ``asgi.py`` import this module first, so ``BOOT_STARTED``
+is close to process start. The first finished request logs how long the
+worker took to become useful; the ``boot_report`` command measures the
+same thing (plus per-package import times) outside a server, for CI.
+"""
+import logging
+import time
+
+from django.core.signals import request_finished
+
+logger = logging.getLogger(__name__)
+
+BOOT_STARTED = time.perf_counter()
+
+
+def elapsed_ms():
+    return (time.perf_counter() - BOOT_STARTED) * 1000
+
+
+def log_first_request(sender, **kwargs):
+    request_finished.disconnect(log_first_request, dispatch_uid='boot_first_request')
+    logger.info("First request finished %.0f ms after boot", elapsed_ms())
+
+
+request_finished.connect(log_first_request, dispatch_uid='boot_first_request')
@@ -0,0 +1,47 @@
+"""
+Shared async HTTP client for the async views.
+
+One ``httpx.AsyncClient`` is kept per event loop, so every request served
+by an ASGI worker reuses the same connection pool (and TLS sessions) to
+OpenRouter, Safe Browsing and the other providers. Under WSGI each async
+view runs in a short-lived loop of its own and gets a fresh client, which
+is dropped together with the loop.
+"""
+import asyncio
+import logging
+import weakref
+
+import httpx
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+HTTP_MAX_CONNECTIONS = getattr(settings, 'HTTP_MAX_CONNECTIONS', 100)
+HTTP_MAX_KEEPALIVE = getattr(settings, 'HTTP_MAX_KEEPALIVE', 20)
+# Per-request default; callers pass their own for slower providers
+DEFAULT_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_client():
+    """The ``httpx.AsyncClient`` of the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            ),
+        )
+        _clients[loop] = client
+    return client
+
+
+async def aclose():
+    """Close the client of the running event loop, if it has one"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -108,6 +108,17 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 TWILIO_ACCOUNT_SID = os.environ.get("TWILIO_ACCOUNT_SID", "")
 TWILIO_AUTH_TOKEN = os.environ.get("TWILIO_AUTH_TOKEN", "")
 TWILIO_WHATSAPP_NUMBER = os.environ.get("TWILIO_WHATSAPP_NUMBER", "")
+TWILIO_VALIDATE_SIGNATURE = os.environ.get("TWILIO_VALIDATE_SIGNATURE", "False") == "True"
+# Messages per second Twilio accepts from our WhatsApp sender
+TWILIO_MESSAGES_PER_SECOND = float(os.environ.get("TWILIO_MESSAGES_PER_SECOND", "80"))
+# Public URL of the whatsapp_status_callback view, e.g. https://<host>/whatsapp/status/
+TWILIO_STATUS_CALLBACK_URL = os.environ.get("TWILIO_STATUS_CALLBACK_URL", "")
+
+# WHATSAPP BOT
+# Threads per web process that run conversation turns in the background
+WHATSAPP_WORKER_THREADS = int(os.environ.get("WHATSAPP_WORKER_THREADS", "4"))
+# Threads per web process that deliver replies to Twilio
+WHATSAPP_OUTBOUND_THREADS = int(os.environ.get("WHATSAPP_OUTBOUND_THREADS", "2"))
 
 # DRF
 REST_FRAMEWORK = {
@@ -117,6 +128,38 @@ REST_FRAMEWORK = {
     "PAGE_SIZE": 20,
 }
 
+# VIRUSTOTAL
+# Lookups per minute allowed by our VirusTotal plan (free tier: 4)
+VIRUSTOTAL_REQUESTS_PER_MINUTE = int(os.environ.get("VIRUSTOTAL_REQUESTS_PER_MINUTE", "4"))
+# SQLite file holding the quota bucket shared by all workers on the host
+VIRUSTOTAL_QUOTA_DB = os.environ.get("VIRUSTOTAL_QUOTA_DB", str(BASE_DIR / "vt_quota.sqlite3"))
+
+# LOCAL BLOCKLIST
+# Directory of known-bad domain/URL feed files and the index built from them
+BLOCKLIST_FEED_DIR = os.environ.get("BLOCKLIST_FEED_DIR", str(BASE_DIR / "blocklists"))
+BLOCKLIST_INDEX_PATH = os.environ.get("BLOCKLIST_INDEX_PATH", str(BASE_DIR / "blocklist.idx"))
+
+# SCAM REPORTS
+# Reports accepted per request by the bulk report API
+SCAM_REPORT_BULK_MAX = int(os.environ.get("SCAM_REPORT_BULK_MAX", "1000"))
+# Largest screenshot accepted, and the longest side it is stored at
+SCREENSHOT_MAX_BYTES = int(os.environ.get("SCREENSHOT_MAX_BYTES", str(15 * 1024 * 1024)))
+SCREENSHOT_MAX_SIDE = int(os.environ.get("SCREENSHOT_MAX_SIDE", "1600"))
+# Different reporters within the window needed before verify_link flags a link or domain
+REPUTATION_MIN_REPORTS = int(os.environ.get("REPUTATION_MIN_REPORTS", "3"))
+REPUTATION_WINDOW_DAYS = int(os.environ.get("REPUTATION_WINDOW_DAYS", "90"))
+# Proxies in front of the app that append to X-Forwarded-For (Railway's edge is one)
+TRUSTED_PROXY_COUNT = int(os.environ.get("TRUSTED_PROXY_COUNT", "1"))
+
 # OPENROUTER + GOOGLE SAFE BROWSING
 OPENROUTER_API_KEY = os.environ.get("OPENROUTER_API_KEY", "")
+# Seconds a chatbot answer is reused for the same question, and answers kept per process
+CHAT_CACHE_TTL = int(os.environ.get("CHAT_CACHE_TTL", str(6 * 60 * 60)))
+CHAT_CACHE_SIZE = int(os.environ.get("CHAT_CACHE_SIZE", "2000"))
+# Tokens of program records added to each chatbot prompt
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.environ.get("CHAT_CONTEXT_TOKEN_BUDGET", "350"))
 GOOGLE_SAFE_BROWSING_KEY = os.environ.get("GOOGLE_SAFE_BROWSING_KEY", "")
+
+# Connection pool of the shared async HTTP client, per ASGI worker
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.environ.get("HTTP_MAX_KEEPALIVE", "20"))
@@ -9,8 +9,12 @@ https://docs.djangoproject.com/en/5.0/howto/deployment/wsgi/
 
 import os
 
+from scmprv import boot
+
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'scmprv.settings')
 
 application = get_wsgi_application()
+
+boot.logger.info("WSGI application loaded in %.0f ms", boot.elapsed_ms())
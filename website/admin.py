@@ -1,10 +1,33 @@
 from django.contrib import admin
 
 
-from .models import ScamReport
+from .models import ReportedLink, ScamCluster, ScamReport, Screenshot
 
 @admin.register(ScamReport)
 class ScamReportAdmin(admin.ModelAdmin):
-    list_display = ('initiative_type', 'reference', 'contact', 'submitted_at')
-    search_fields = ('reference', 'contact')
-    list_filter = ('initiative_type', 'submitted_at')
\ No newline at end of file
+    list_display = ('initiative_type', 'reference', 'contact', 'cluster', 'submitted_at')
+    search_fields = ('reference', 'contact', 'client_report_id')
+    list_filter = ('initiative_type', 'submitted_at')
+    list_select_related = ('cluster',)
+    raw_id_fields = ('images', 'cluster')
+
+@admin.register(Screenshot)
+class ScreenshotAdmin(admin.ModelAdmin):
+    list_display = ('sha256', 'status', 'width', 'height', 'size', 'duplicate_of', 'created')
+    search_fields = ('sha256', 'dhash')
+    list_filter = ('status',)
+    readonly_fields = ('created', 'modified')
+
+@admin.register(ScamCluster)
+class ScamClusterAdmin(admin.ModelAdmin):
+    list_display = ('label', 'report_count', 'first_seen', 'last_seen')
+    search_fields = ('label', 'keys__key')
+    readonly_fields = ('signature', 'created', 'modified')
+    ordering = ('-last_seen',)
+
+@admin.register(ReportedLink)
+class ReportedLinkAdmin(admin.ModelAdmin):
+    list_display = ('key', 'report_count', 'first_reported', 'last_reported')
+    search_fields = ('key',)
+    readonly_fields = ('created', 'modified')
+    ordering = ('-last_reported',)
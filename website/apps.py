@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class WebsiteConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'website'
+
+    def ready(self):
+        from django.db.models.signals import post_save
+
+        from . import reputation
+        from .models import ScamReport
+
+        post_save.connect(reputation.record_report, sender=ScamReport, dispatch_uid='website.reputation')
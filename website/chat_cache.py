@@ -0,0 +1,145 @@
+"""
+In-process cache of chatbot answers.
+
+Many questions repeat with different casing, punctuation or filler words
+("How to apply for N-Power?", "how to apply npower"), so answers are keyed
+by a normalized form of the question plus its detected language: case and
+punctuation folded, hyphens and spaces inside names dropped, stopwords
+removed. Entries expire after ``CHAT_CACHE_TTL`` seconds and the least
+recently used ones are evicted past ``CHAT_CACHE_SIZE``.
+
+Questions about deadlines, news or "this year" are never cached, nor are
+error replies, so a cached answer cannot go stale in ways that matter.
+"""
+import logging
+import re
+import threading
+import unicodedata
+
+from django.conf import settings
+
+from whatsapp_verifier.lru import LRUCache
+from whatsapp_verifier.signals import programs_changed
+
+logger = logging.getLogger(__name__)
+
+CHAT_CACHE_TTL = getattr(settings, 'CHAT_CACHE_TTL', 6 * 60 * 60)
+CHAT_CACHE_SIZE = getattr(settings, 'CHAT_CACHE_SIZE', 2000)
+# Log the hit rate every this many lookups
+STATS_LOG_EVERY = 100
+
+STOPWORDS = {
+    'a', 'about', 'an', 'and', 'are', 'can', 'could', 'do', 'does', 'for', 'from', 'give', 'i', 'in',
+    'info', 'information', 'is', 'it', 'know', 'me', 'my', 'of', 'on', 'or', 'please', 'pls', 'plz',
+    'program', 'programme', 'scheme', 'should', 'so', 'tell', 'the', 'to', 'u', 'want', 'what', 'whats',
+    'you', 'your',
+}
+
+# Questions whose answer changes over time
+TIME_SENSITIVE_RE = re.compile(
+    r'\b(today|tomorrow|yesterday|now|currently|current|latest|recent|recently|news|update|updates|'
+    r'deadline|closing|closes|close date|still open|ongoing|this (week|month|year)|next (week|month|year)|'
+    r'when (is|will|does)|20\d\d)\b',
+    re.IGNORECASE,
+)
+
+# Markers of the languages the chatbot is asked in; English is the default
+LANGUAGE_MARKERS = {
+    'pcm': {'wetin', 'dey', 'abeg', 'una', 'wan', 'abi', 'sabi', 'comot', 'pikin', 'wahala', 'howfa'},
+    'ha': {'yaya', 'menene', 'mene', 'shirin', 'zan', 'nake', 'kuma', 'gwamnati', 'ake', 'neman'},
+    'ig': {'kedu', 'gini', 'biko', 'nke', 'ebee', 'olee', 'gọọmenti', 'achọrọ', 'enwere', 'esi', 'debanye', 'aha'},
+    'yo': {'bawo', 'kini', 'ṣe', 'jowo', 'ijoba', 'nibo', 'eto', 'fẹ', 'owo'},
+}
+# Letters only used by one of them
+LANGUAGE_LETTERS = {'ha': set('ɓɗƙƴ'), 'ig': set('ịụṅ'), 'yo': set('ẹṣ')}
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+_cache = LRUCache(maxsize=CHAT_CACHE_SIZE, ttl=CHAT_CACHE_TTL)
+_bypassed = 0
+_lookups = 0
+_stats_lock = threading.Lock()
+
+
+def detect_language(text):
+    """Best guess of the language of ``text``: en, pcm (pidgin), ha, ig or yo"""
+    lowered = text.lower()
+    for language, letters in LANGUAGE_LETTERS.items():
+        if letters.intersection(lowered):
+            return language
+    words = set(_WORD_RE.findall(lowered))
+    scores = {language: len(words & markers) for language, markers in LANGUAGE_MARKERS.items()}
+    language, score = max(scores.items(), key=lambda item: item[1])
+    return language if score >= 2 or (score == 1 and len(words) <= 3) else 'en'
+
+
+def normalize(question):
+    """Case-, punctuation- and filler-insensitive form of ``question``"""
+    text = unicodedata.normalize('NFKC', question).lower()
+    # "N-Power" and "n power" are the same name as "npower"
+    text = re.sub(r'(?<=\w)-(?=\w)', '', text)
+    text = re.sub(r'\b([b-hj-tv-z])\s(?=\w{3,})', r'\1', text)
+    words = [word for word in _WORD_RE.findall(text) if word not in STOPWORDS]
+    return ' '.join(words)
+
+
+def cache_key(question):
+    """``(language, normalized question)``, or None when the question must not be cached"""
+    if TIME_SENSITIVE_RE.search(question):
+        return None
+    normalized = normalize(question)
+    if not normalized:
+        return None
+    return (detect_language(question), normalized)
+
+
+def _count(bypassed=False):
+    global _bypassed, _lookups
+    with _stats_lock:
+        _lookups += 1
+        if bypassed:
+            _bypassed += 1
+        log_now = _lookups % STATS_LOG_EVERY == 0
+    if log_now:
+        current = stats()
+        logger.info(
+            "Chat cache: %.0f%% hit rate over %d lookups (%d bypassed, %d entries)",
+            current['hit_rate'] * 100, current['lookups'], current['bypassed'], current['size'],
+        )
+
+
+def get(question):
+    """The cached answer to ``question``, or None"""
+    key = cache_key(question)
+    if key is None:
+        _count(bypassed=True)
+        return None
+    _count()
+    return _cache.get(key)
+
+
+def put(question, answer):
+    """Remember ``answer`` unless the question is time-sensitive or the answer is an error"""
+    key = cache_key(question)
+    if key is None or not answer or answer.startswith('⚠️'):
+        return
+    _cache.set(key, answer)
+
+
+def stats():
+    return {
+        'lookups': _lookups,
+        'hits': _cache.hits,
+        'misses': _cache.misses,
+        'bypassed': _bypassed,
+        'hit_rate': _cache.hits / _lookups if _lookups else 0.0,
+        'size': len(_cache),
+    }
+
+
+def clear(**kwargs):
+    _cache.clear()
+
+
+# Answers are grounded in the program records, so they go stale with them
+programs_changed.connect(clear, dispatch_uid='chat_cache_clear')
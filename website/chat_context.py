@@ -0,0 +1,137 @@
+"""
+Program records retrieved for a chatbot question.
+
+Before a question goes to the model, the most relevant ``FederalProgram``
+rows are found (name matcher first, then full-text search) and packed as
+one compact line each into a context block that must fit
+``CONTEXT_TOKEN_BUDGET`` tokens. The model then answers from our own data
+instead of guessing or searching the web. Packed contexts are cached per
+normalized question until the programs change.
+"""
+import logging
+import math
+
+from django.conf import settings
+
+from whatsapp_verifier.lru import LRUCache
+from whatsapp_verifier.models import FederalProgram
+from whatsapp_verifier.program_matcher import match_programs
+from whatsapp_verifier.search import search_programs, search_terms
+from whatsapp_verifier.signals import programs_changed
+
+from .chat_cache import normalize
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_TOKEN_BUDGET = getattr(settings, 'CHAT_CONTEXT_TOKEN_BUDGET', 350)
+CONTEXT_PROGRAMS = 5
+# Shorter words ("c", "of", "ng") match too many names and index terms to mean anything
+MIN_TERM_LENGTH = 3
+# Edits allowed per character of a word run matched against a program name
+MAX_DISTANCE_RATIO = 0.25
+# Longest description kept in a record, in characters
+DESCRIPTION_CHARS = 240
+
+CONTEXT_HEADER = (
+    "Verified programs from our database (name | agency | sector | level | official link | summary). "
+    "Answer from these records when they are relevant and give the official link; "
+    "say so if they do not cover the question."
+)
+
+_contexts = LRUCache(maxsize=1000, ttl=60 * 60)
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English text)"""
+    return math.ceil(len(text) / 4)
+
+
+def query_terms(query):
+    """The search terms of ``query`` long enough to be worth matching"""
+    return [term for term in search_terms(query) if len(term) >= MIN_TERM_LENGTH]
+
+
+def name_matches(query, limit=2):
+    """
+    Program ids named in ``query``. A question ("how do I apply for npower")
+    names the program among other words, so word runs are tried from the
+    longest down and the closest matches kept. A match needing many edits
+    for the length of the run ("batch" for "bhcpf") is ignored.
+    """
+    terms = query_terms(query)
+    best = {}
+    for size in range(min(len(terms), 4), 0, -1):
+        for start in range(len(terms) - size + 1):
+            run = ' '.join(terms[start:start + size])
+            for match in match_programs(run, limit=1):
+                if match.distance > MAX_DISTANCE_RATIO * len(run.replace(' ', '')):
+                    continue
+                if match.distance < best.get(match.program_id, match.distance + 1):
+                    best[match.program_id] = match.distance
+    return sorted(best, key=best.get)[:limit]
+
+
+def retrieve(query, k=CONTEXT_PROGRAMS):
+    """Up to ``k`` programs relevant to ``query``, best first"""
+    matched_ids = name_matches(query)
+    by_id = FederalProgram.objects.in_bulk(matched_ids) if matched_ids else {}
+    programs = [by_id[program_id] for program_id in matched_ids if program_id in by_id]
+    seen = {program.pk for program in programs}
+
+    terms = query_terms(query)
+    for program in search_programs(' '.join(terms), limit=k) if terms else []:
+        if len(programs) >= k:
+            break
+        if program.pk not in seen:
+            programs.append(program)
+            seen.add(program.pk)
+    return programs
+
+
+def compact_record(program, description_chars=DESCRIPTION_CHARS):
+    description = ' '.join((program.description or '').split()) if description_chars else ''
+    if len(description) > description_chars:
+        description = description[:description_chars].rsplit(' ', 1)[0] + '…'
+    fields = [program.name, program.agency, program.sector, program.level, program.link, description]
+    return ' | '.join(field.strip() for field in fields if field and field.strip())
+
+
+def pack(programs, budget=CONTEXT_TOKEN_BUDGET):
+    """The context block for ``programs``, cut to fit ``budget`` tokens; '' if none fit"""
+    lines = [CONTEXT_HEADER]
+    used = estimate_tokens(CONTEXT_HEADER)
+    for program in programs:
+        record = compact_record(program)
+        cost = estimate_tokens(record) + 1
+        if used + cost > budget:
+            # Drop the summary before dropping the program
+            record = compact_record(program, description_chars=0)
+            cost = estimate_tokens(record) + 1
+            if used + cost > budget:
+                break
+        lines.append(record)
+        used += cost
+    return '\n'.join(lines) if len(lines) > 1 else ''
+
+
+def build_context(query):
+    """Packed program records for ``query`` (cached), or '' when nothing relevant was found"""
+    key = normalize(query)
+    if not key:
+        return ''
+    context = _contexts.get(key)
+    if context is None:
+        try:
+            context = pack(retrieve(query))
+        except Exception:
+            logger.exception("Could not retrieve programs for the chatbot prompt")
+            return ''
+        _contexts.set(key, context)
+    return context
+
+
+def invalidate(**kwargs):
+    _contexts.clear()
+
+
+programs_changed.connect(invalidate, dispatch_uid='chat_context_invalidate')
@@ -0,0 +1,263 @@
+"""
+Clustering of scam reports into waves of the same scam.
+
+Each report's ``reference`` is reduced to canonical keys: ``url:`` and
+``domain:`` for links (through ``canonicalize_url``), ``phone:`` for phone
+numbers in +234 form and ``account:`` for 10-digit bank account numbers.
+A report joins the cluster that already owns one of its keys (the first
+in key order when several clusters do; clusters are never merged). Otherwise
+its description is compared with the clusters' descriptions by MinHash
+over word shingles: the 64-value signature is split into 32 bands of 2
+rows, clusters sharing a band are candidates, and the closest candidate
+with an estimated similarity of at least ``SIMILARITY_THRESHOLD`` wins.
+Failing both, the report starts a new cluster.
+
+``cluster_new_reports`` handles the reports not clustered yet, so the
+``cluster_reports`` command can run it as often as it likes. Every
+assignment bumps the cluster's row in ``ScamClusterHour``, and
+``trending`` ranks clusters from those hourly counts alone.
+"""
+import hashlib
+import logging
+import random
+import re
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from whatsapp_verifier.canonical import canonical_domain, canonicalize_url, url_hash
+from whatsapp_verifier.domain_matcher import KNOWN, match_domain
+from whatsapp_verifier.lru import LRUCache
+
+from .models import ScamCluster, ScamClusterBand, ScamClusterHour, ScamClusterKey, ScamReport
+
+logger = logging.getLogger(__name__)
+
+SHINGLE_SIZE = 3
+NUM_PERMUTATIONS = 64
+BANDS = 32
+ROWS = NUM_PERMUTATIONS // BANDS
+SIMILARITY_THRESHOLD = 0.5
+# Descriptions with fewer shingles are too short to compare
+MIN_SHINGLES = 3
+BATCH_SIZE = 500
+TRENDING_CACHE_TTL = 5 * 60
+
+# Hosts that carry everyone's content, so sharing one says nothing about the scam
+SHARED_HOSTS = {
+    'bit.ly', 'tinyurl.com', 'cutt.ly', 'rb.gy', 'is.gd', 't.co', 'shorturl.at', 'linktr.ee',
+    'wa.me', 'chat.whatsapp.com', 't.me', 'forms.gle', 'docs.google.com', 'sites.google.com',
+    'drive.google.com', 'fb.me', 'm.facebook.com', 'tiktok.com', 'x.com', 'blogspot.com',
+}
+
+_URL_RE = re.compile(
+    r'(?:https?://|www\.)[^\s<>"]+|\b[a-z0-9-]+(?:\.[a-z0-9-]+)*\.[a-z]{2,}(?:/[^\s<>"]*)?',
+    re.IGNORECASE,
+)
+_NUMBER_RE = re.compile(r'(?:\+|\b)\d[\d\s().-]{7,}\d\b')
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_random = random.Random(20240601)
+_PERMUTATIONS = [(_random.randrange(1, _PRIME), _random.randrange(0, _PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+_trending = LRUCache(maxsize=64, ttl=TRENDING_CACHE_TTL)
+
+
+def canonical_phone(text):
+    """``text`` as a +<country><number> phone number, or None"""
+    digits = re.sub(r'\D', '', text)
+    if len(digits) == 11 and digits[0] == '0':
+        return f'+234{digits[1:]}'
+    if len(digits) == 13 and digits.startswith('234'):
+        return f'+{digits}'
+    if text.lstrip().startswith('+') and 8 <= len(digits) <= 15:
+        return f'+{digits}'
+    return None
+
+
+def reference_keys(reference):
+    """Canonical keys found in a report reference, most specific first"""
+    keys = []
+    text = reference or ''
+    for match in _URL_RE.finditer(text):
+        try:
+            url = canonicalize_url(match.group().rstrip('.,;:!?)\'"'))
+        except ValueError:
+            continue
+        keys.append(f'url:{url}' if len(url) <= 250 else f'url#{url_hash(url)}')
+        domain = canonical_domain(url)
+        if domain and domain not in SHARED_HOSTS and match_domain(domain) != KNOWN:
+            keys.append(f'domain:{domain}')
+
+    for match in _NUMBER_RE.finditer(_URL_RE.sub(' ', text)):
+        phone = canonical_phone(match.group())
+        digits = re.sub(r'\D', '', match.group())
+        if phone:
+            keys.append(f'phone:{phone}')
+        elif len(digits) == 10:
+            keys.append(f'account:{digits}')
+    return list(dict.fromkeys(keys))
+
+
+def shingles(text):
+    words = _WORD_RE.findall((text or '').lower())
+    return {' '.join(words[start:start + SHINGLE_SIZE]) for start in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(shingle_set):
+    """MinHash signature of a set of shingles"""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=4).digest(), 'big')
+        for shingle in shingle_set
+    ]
+    return [min((a * value + b) % _PRIME for value in hashes) & _MAX_HASH for a, b in _PERMUTATIONS]
+
+
+def band_values(signature):
+    """One signed 64-bit value per band of ``signature``"""
+    values = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(','.join(map(str, rows)).encode('ascii'), digest_size=8).digest()
+        values.append(int.from_bytes(digest, 'big', signed=True))
+    return values
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    if not first or not second:
+        return 0.0
+    return sum(a == b for a, b in zip(first, second)) / len(first)
+
+
+def description_signature(description):
+    shingle_set = shingles(description)
+    return minhash(shingle_set) if len(shingle_set) >= MIN_SHINGLES else None
+
+
+def _similar_cluster(signature, bands):
+    query = Q()
+    for band, value in enumerate(bands):
+        query |= Q(band=band, value=value)
+    candidate_ids = set(ScamClusterBand.objects.filter(query).values_list('cluster_id', flat=True))
+    if not candidate_ids:
+        return None
+
+    best, best_score = None, SIMILARITY_THRESHOLD
+    for cluster in ScamCluster.objects.filter(pk__in=candidate_ids).order_by('pk'):
+        score = similarity(signature, cluster.signature)
+        if score >= best_score:
+            best, best_score = cluster, score
+    return best
+
+
+def _label(report, keys):
+    if keys:
+        return keys[0].split(':', 1)[-1][:255]
+    return ' '.join((report.description or '').split())[:80] or f'Report {report.pk}'
+
+
+@transaction.atomic
+def assign(report):
+    """Put one report into its cluster (found or new) and count it; returns the cluster"""
+    keys = reference_keys(report.reference)
+    signature = description_signature(report.description)
+    bands = band_values(signature) if signature else []
+    seen_at = report.submitted_at or timezone.now()
+
+    cluster = None
+    if keys:
+        owners = dict(ScamClusterKey.objects.filter(key__in=keys).values_list('key', 'cluster_id'))
+        for key in keys:
+            if key in owners:
+                cluster = ScamCluster.objects.get(pk=owners[key])
+                break
+    if cluster is None and signature:
+        cluster = _similar_cluster(signature, bands)
+    if cluster is None:
+        cluster = ScamCluster.objects.create(
+            label=_label(report, keys), first_seen=seen_at, last_seen=seen_at, signature=signature or [],
+        )
+
+    # Clusters are never merged: keys another cluster already owns stay with
+    # it, and only this report's unowned keys are added to its cluster
+    ScamClusterKey.objects.bulk_create(
+        [ScamClusterKey(key=key, cluster=cluster) for key in keys], ignore_conflicts=True,
+    )
+    ScamClusterBand.objects.bulk_create(
+        [ScamClusterBand(band=band, value=value, cluster=cluster) for band, value in enumerate(bands)],
+        ignore_conflicts=True,
+    )
+    if signature and not cluster.signature:
+        ScamCluster.objects.filter(pk=cluster.pk).update(signature=signature)
+
+    ScamCluster.objects.filter(pk=cluster.pk).update(report_count=F('report_count') + 1)
+    ScamCluster.objects.filter(pk=cluster.pk, last_seen__lt=seen_at).update(last_seen=seen_at)
+    hour = seen_at.replace(minute=0, second=0, microsecond=0)
+    counted = ScamClusterHour.objects.filter(cluster=cluster, hour=hour).update(count=F('count') + 1)
+    if not counted:
+        ScamClusterHour.objects.create(cluster=cluster, hour=hour, count=1)
+
+    ScamReport.objects.filter(pk=report.pk).update(cluster=cluster)
+    return cluster
+
+
+def cluster_new_reports(batch_size=BATCH_SIZE):
+    """Cluster up to ``batch_size`` reports that have no cluster yet; returns how many"""
+    reports = list(
+        ScamReport.objects.filter(cluster__isnull=True)
+        .only('pk', 'reference', 'description', 'submitted_at')
+        .order_by('pk')[:batch_size]
+    )
+    for report in reports:
+        assign(report)
+    if reports:
+        _trending.clear()
+    return len(reports)
+
+
+def trending(hours=24, limit=10):
+    """
+    Clusters with the most reports over the last ``hours`` hours (current
+    hour included), with their count over the hours before for comparison.
+    Read from the hourly counts only, and cached for a few minutes.
+    """
+    current = timezone.now().replace(minute=0, second=0, microsecond=0)
+    cache_key = (current, hours, limit)
+    result = _trending.get(cache_key)
+    if result is not None:
+        return result
+
+    since = current - timedelta(hours=hours - 1)
+    totals = list(
+        ScamClusterHour.objects.filter(hour__gte=since)
+        .values('cluster')
+        .annotate(total=Sum('count'))
+        .order_by('-total', 'cluster')[:limit]
+    )
+    cluster_ids = [row['cluster'] for row in totals]
+    previous = dict(
+        ScamClusterHour.objects.filter(cluster__in=cluster_ids, hour__gte=since - timedelta(hours=hours), hour__lt=since)
+        .values('cluster')
+        .annotate(total=Sum('count'))
+        .values_list('cluster', 'total')
+    )
+    clusters = ScamCluster.objects.in_bulk(cluster_ids)
+    result = [
+        {
+            'cluster': row['cluster'],
+            'label': clusters[row['cluster']].label,
+            'reports': row['total'],
+            'previous_reports': previous.get(row['cluster'], 0),
+            'total_reports': clusters[row['cluster']].report_count,
+            'last_seen': clusters[row['cluster']].last_seen.isoformat(),
+        }
+        for row in totals
+        if row['cluster'] in clusters
+    ]
+    _trending.set(cache_key, result)
+    return result
@@ -1,8 +1,11 @@
 from django import forms
+from django.conf import settings
 
 
 from .models import ScamReport
 
+SCREENSHOT_MAX_BYTES = getattr(settings, 'SCREENSHOT_MAX_BYTES', 15 * 1024 * 1024)
+
 class LinkCheckForm(forms.Form):
     url = forms.URLField(
         label="",
@@ -14,7 +17,32 @@ class LinkCheckForm(forms.Form):
 
 
 
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class ScreenshotsField(forms.FileField):
+    """Any number of image files; cleans to a list"""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('widget', MultipleFileInput(attrs={'accept': 'image/*'}))
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        single_file_clean = super().clean
+        files = data if isinstance(data, (list, tuple)) else [data]
+        cleaned = [single_file_clean(upload, initial) for upload in files if upload]
+        for upload in cleaned:
+            if not (upload.content_type or '').startswith('image/'):
+                raise forms.ValidationError(f"{upload.name} is not an image.")
+            if upload.size > SCREENSHOT_MAX_BYTES:
+                raise forms.ValidationError(f"{upload.name} is larger than {SCREENSHOT_MAX_BYTES // (1024 * 1024)} MB.")
+        return cleaned
+
+
 class ScamReportForm(forms.ModelForm):
+    screenshots = ScreenshotsField(required=False)
+
     class Meta:
         model = ScamReport
         fields = [
@@ -24,7 +52,6 @@ class ScamReportForm(forms.ModelForm):
             'email',
             'other',
             'reference',
-            'screenshots',
             'description',
             'contact',
         ]
@@ -33,4 +60,17 @@ class ScamReportForm(forms.ModelForm):
             'reference': forms.TextInput(attrs={'class': 'form-input w-full', 'placeholder': 'Paste Link / Reference Code'}),
             'description': forms.Textarea(attrs={'class': 'form-textarea w-full', 'placeholder': 'What made you suspicious?'}),
             'contact': forms.TextInput(attrs={'class': 'form-input w-full', 'placeholder': 'Email or Phone (Optional)'}),
-        }
\ No newline at end of file
+        }
+
+
+class ScamReportAPIForm(forms.ModelForm):
+    """One report sent as JSON by the browser extension or a partner"""
+
+    class Meta:
+        model = ScamReport
+        fields = [
+            'initiative_type',
+            'reference',
+            'description',
+            'contact',
+        ]
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from website.clustering import BATCH_SIZE, cluster_new_reports
+
+# Seconds between runs when nothing was left to cluster
+LOOP_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = 'Cluster new scam reports and update the hourly counts behind the trending scams'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Cluster the waiting reports and exit')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            clustered = cluster_new_reports(options['batch_size'])
+            total += clustered
+            if clustered == options['batch_size']:
+                continue
+            if options['once']:
+                self.stdout.write(self.style.SUCCESS(f'Clustered {total} reports'))
+                return
+            time.sleep(LOOP_INTERVAL)
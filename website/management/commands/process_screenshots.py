@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from website.models import Screenshot
+from website.screenshots import process
+
+
+class Command(BaseCommand):
+    help = 'Process screenshots still waiting for the background worker, e.g. after a restart'
+
+    def handle(self, *args, **options):
+        pending = Screenshot.objects.filter(status=Screenshot.STATUS_PENDING).values_list('pk', flat=True)
+        for screenshot_id in pending.iterator():
+            process(screenshot_id)
+        counts = {
+            status: Screenshot.objects.filter(status=status).count()
+            for status, _ in Screenshot.STATUS_CHOICES
+        }
+        self.stdout.write(self.style.SUCCESS(', '.join(f'{count} {status}' for status, count in counts.items())))
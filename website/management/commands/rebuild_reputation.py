@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from website.reputation import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recount the reported links and domains behind the community reputation from all scam reports'
+
+    def handle(self, *args, **options):
+        keys = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Counted reports for {keys} links and domains'))
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:28
+
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+import website.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0002_client_report_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Screenshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('image', models.FileField(blank=True, upload_to=website.models.screenshot_path)),
+                ('thumbnail', models.FileField(blank=True, upload_to=website.models.thumbnail_path)),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('duplicate', 'Near-duplicate'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('dhash', models.CharField(blank=True, max_length=16)),
+                ('dhash_band0', models.PositiveIntegerField(blank=True, db_index=True, null=True)),
+                ('dhash_band1', models.PositiveIntegerField(blank=True, db_index=True, null=True)),
+                ('dhash_band2', models.PositiveIntegerField(blank=True, db_index=True, null=True)),
+                ('dhash_band3', models.PositiveIntegerField(blank=True, db_index=True, null=True)),
+                ('duplicate_of', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='website.screenshot')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='scamreport',
+            name='images',
+            field=models.ManyToManyField(blank=True, related_name='reports', to='website.screenshot'),
+        ),
+    ]
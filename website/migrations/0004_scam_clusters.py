@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:30
+
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0003_screenshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScamCluster',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('label', models.CharField(max_length=255)),
+                ('report_count', models.PositiveIntegerField(default=0)),
+                ('first_seen', models.DateTimeField()),
+                ('last_seen', models.DateTimeField(db_index=True)),
+                ('signature', models.JSONField(blank=True, default=list)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='scamreport',
+            name='cluster',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reports', to='website.scamcluster'),
+        ),
+        migrations.CreateModel(
+            name='ScamClusterKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True)),
+                ('cluster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='keys', to='website.scamcluster')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ScamClusterBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('value', models.BigIntegerField()),
+                ('cluster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bands', to='website.scamcluster')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('band', 'value', 'cluster'), name='unique_cluster_band')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ScamClusterHour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('cluster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hours', to='website.scamcluster')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour', 'cluster'], name='website_sca_hour_fb2bca_idx')],
+                'constraints': [models.UniqueConstraint(fields=('cluster', 'hour'), name='unique_cluster_hour')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:34
+
+import django.utils.timezone
+import model_utils.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0004_scam_clusters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportedLink',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('key', models.CharField(max_length=255, unique=True)),
+                ('report_count', models.PositiveIntegerField(default=0)),
+                ('first_reported', models.DateTimeField()),
+                ('last_reported', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['modified'], name='website_rep_modifie_20b13f_idx')],
+            },
+        ),
+    ]
@@ -1,4 +1,7 @@
+import os
+
 from django.db import models
+from model_utils.models import TimeStampedModel
 
 # Create your models here.
 
@@ -17,10 +20,140 @@ class ScamReport(models.Model):
     email = models.BooleanField(default=False)
     other = models.BooleanField(default=False)
     reference = models.CharField(max_length=255, blank=True, null=True)
+    # Single upload of older reports; new ones link their images below
     screenshots = models.FileField(upload_to='scam_screenshots/', blank=True, null=True)
+    images = models.ManyToManyField('Screenshot', related_name='reports', blank=True)
+    # Filled by the clustering job; reports without one have not been clustered yet
+    cluster = models.ForeignKey('ScamCluster', blank=True, null=True, on_delete=models.SET_NULL, related_name='reports')
     description = models.TextField()
     contact = models.CharField(max_length=150, blank=True, null=True)
+    # Set by API clients so a retried upload does not create the report twice
+    client_report_id = models.CharField(max_length=64, unique=True, blank=True, null=True)
+    # Keyed hash of the submitter's IP address; one reporter counts once towards a link's reputation
+    reporter = models.CharField(max_length=64, blank=True, default='', editable=False)
     submitted_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"{self.initiative_type} - {self.reference or 'No Ref'}"
+
+
+def screenshot_path(instance, filename):
+    """Screenshots are stored once, under their content hash"""
+    extension = os.path.splitext(filename)[1].lower() or '.bin'
+    return f'scam_screenshots/{instance.sha256[:2]}/{instance.sha256}{extension}'
+
+
+def thumbnail_path(instance, filename):
+    return f'scam_screenshots/thumbs/{instance.sha256[:2]}/{instance.sha256}.jpg'
+
+
+class Screenshot(TimeStampedModel):
+    """A unique scam screenshot, shared by every report it was attached to"""
+    STATUS_PENDING = 'pending'
+    STATUS_READY = 'ready'
+    STATUS_DUPLICATE = 'duplicate'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_READY, 'Ready'),
+        (STATUS_DUPLICATE, 'Near-duplicate'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    image = models.FileField(upload_to=screenshot_path, blank=True)
+    thumbnail = models.FileField(upload_to=thumbnail_path, blank=True)
+    size = models.PositiveIntegerField(default=0)
+    width = models.PositiveIntegerField(blank=True, null=True)
+    height = models.PositiveIntegerField(blank=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    # 64-bit difference hash as hex, and its four 16-bit bands for candidate lookups
+    dhash = models.CharField(max_length=16, blank=True)
+    dhash_band0 = models.PositiveIntegerField(blank=True, null=True, db_index=True)
+    dhash_band1 = models.PositiveIntegerField(blank=True, null=True, db_index=True)
+    dhash_band2 = models.PositiveIntegerField(blank=True, null=True, db_index=True)
+    dhash_band3 = models.PositiveIntegerField(blank=True, null=True, db_index=True)
+    # Set on near-duplicates, whose files are dropped in favour of this one
+    duplicate_of = models.ForeignKey('self', blank=True, null=True, on_delete=models.SET_NULL, related_name='duplicates')
+
+    def __str__(self):
+        return f"{self.sha256[:12]} - {self.status}"
+
+
+class ScamCluster(TimeStampedModel):
+    """Reports about the same scam: the same link, phone or account number, or near-identical wording"""
+    label = models.CharField(max_length=255)
+    report_count = models.PositiveIntegerField(default=0)
+    first_seen = models.DateTimeField()
+    last_seen = models.DateTimeField(db_index=True)
+    # MinHash signature of the first description, compared against new ones
+    signature = models.JSONField(default=list, blank=True)
+
+    def __str__(self):
+        return f"{self.label} ({self.report_count})"
+
+
+class ScamClusterKey(models.Model):
+    """A canonical reference key (``url:``, ``domain:``, ``phone:``, ``account:``) owned by a cluster"""
+    key = models.CharField(max_length=255, unique=True)
+    cluster = models.ForeignKey(ScamCluster, on_delete=models.CASCADE, related_name='keys')
+
+    def __str__(self):
+        return self.key
+
+
+class ScamClusterBand(models.Model):
+    """One LSH band of a cluster's description signatures; equal bands make a candidate"""
+    band = models.PositiveSmallIntegerField()
+    value = models.BigIntegerField()
+    cluster = models.ForeignKey(ScamCluster, on_delete=models.CASCADE, related_name='bands')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['band', 'value', 'cluster'], name='unique_cluster_band'),
+        ]
+
+
+class ScamClusterHour(models.Model):
+    """Reports added to a cluster during one hour, for the trending query"""
+    cluster = models.ForeignKey(ScamCluster, on_delete=models.CASCADE, related_name='hours')
+    hour = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cluster', 'hour'], name='unique_cluster_hour'),
+        ]
+        indexes = [
+            models.Index(fields=['hour', 'cluster']),
+        ]
+
+    def __str__(self):
+        return f"{self.cluster_id} @ {self.hour:%Y-%m-%d %H}:00 - {self.count}"
+
+
+class ReportedLink(TimeStampedModel):
+    """How many different reporters named a link (``url:``) or domain (``domain:``)"""
+    key = models.CharField(max_length=255, unique=True)
+    report_count = models.PositiveIntegerField(default=0)
+    first_reported = models.DateTimeField()
+    last_reported = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['modified']),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.report_count})"
+
+
+class ReportedLinkSource(models.Model):
+    """A reporter already counted for a ``ReportedLink`` key"""
+    key = models.CharField(max_length=255)
+    reporter = models.CharField(max_length=64)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['key', 'reporter'], name='unique_reported_link_source'),
+        ]
@@ -0,0 +1,180 @@
+"""
+The initiatives listing: filtered, paginated and cached.
+
+Programs are listed by name, ``PAGE_SIZE`` at a time, with keyset
+pagination: a page is asked for by the ``(name, id)`` of the row it
+follows (``after``) or precedes (``before``), so every page is one
+indexed range scan however deep it is. ``sector``, ``level`` and
+``agency`` filter on exact values, each backed by an index on
+``(field, name, id)``.
+
+Facet counts for each filter are computed over the other selected
+filters, and the rendered programs list is kept per query. Both caches
+are keyed by the dataset version (program count and latest change), so a
+change to the programs makes every entry stale: at once in the process
+that made it, through ``programs_changed``, and within
+``VERSION_CHECK_INTERVAL`` seconds in the others. The same version gives
+the page its ETag and Last-Modified.
+"""
+import base64
+import hashlib
+import json
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlencode
+
+from django.db.models import Count, Max, Q
+from django.template.loader import render_to_string
+
+from whatsapp_verifier.lru import LRUCache
+from whatsapp_verifier.models import FederalProgram
+from whatsapp_verifier.signals import programs_changed
+
+PAGE_SIZE = 20
+FILTERS = ('sector', 'level', 'agency')
+# How often a process checks whether another process changed the programs
+VERSION_CHECK_INTERVAL = 30
+MAX_QUERY_LENGTH = 100
+
+Query = namedtuple('Query', ['sector', 'level', 'agency', 'q', 'after', 'before'])
+Version = namedtuple('Version', ['count', 'modified'])
+
+_version = None
+_checked = 0.0
+_lock = threading.Lock()
+_facets = LRUCache(maxsize=256)
+_fragments = LRUCache(maxsize=512)
+
+
+def dataset_version():
+    """``Version`` of the program table, re-read at most every ``VERSION_CHECK_INTERVAL`` seconds"""
+    global _version, _checked
+    now = time.monotonic()
+    if _version is not None and now - _checked < VERSION_CHECK_INTERVAL:
+        return _version
+    with _lock:
+        version = Version(**FederalProgram.objects.aggregate(count=Count('id'), modified=Max('modified')))
+        _version, _checked = version, time.monotonic()
+    return version
+
+
+def invalidate(**kwargs):
+    global _version
+    with _lock:
+        _version = None
+    _facets.clear()
+    _fragments.clear()
+
+
+def encode_cursor(program):
+    raw = json.dumps([program.name, program.pk], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(value):
+    """``(name, id)`` from a cursor, or None when it is not one"""
+    if not value:
+        return None
+    try:
+        name, pk = json.loads(base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(name, str) or not isinstance(pk, int):
+        return None
+    return name, pk
+
+
+def parse_query(params):
+    """The listing ``Query`` asked for by request GET parameters"""
+    values = {field: params.get(field, '').strip()[:MAX_QUERY_LENGTH] for field in FILTERS + ('q',)}
+    after = decode_cursor(params.get('after', ''))
+    before = None if after else decode_cursor(params.get('before', ''))
+    return Query(after=after, before=before, **values)
+
+
+def filtered(query, exclude=None):
+    """Programs matching the filters and search of ``query``, optionally leaving one filter out"""
+    programs = FederalProgram.objects.all()
+    for field in FILTERS:
+        value = getattr(query, field)
+        if value and field != exclude:
+            programs = programs.filter(**{field: value})
+    if query.q:
+        programs = programs.filter(
+            Q(name__icontains=query.q) | Q(sector__icontains=query.q) | Q(agency__icontains=query.q)
+        )
+    return programs
+
+
+def facets(query, version):
+    """``{field: [(value, count), ...]}``, each counted over the other selected filters"""
+    result = {}
+    for field in FILTERS:
+        others = tuple(getattr(query, other) if other != field else '' for other in FILTERS)
+        key = (version, field, others, query.q)
+        counts = _facets.get(key)
+        if counts is None:
+            counts = list(
+                filtered(query, exclude=field).values_list(field).annotate(count=Count('id')).order_by(field)
+            )
+            _facets.set(key, counts)
+        result[field] = counts
+    return result
+
+
+def page(query):
+    """``(programs, previous_cursor, next_cursor)`` for one page of the listing"""
+    programs = filtered(query)
+    if query.before:
+        name, pk = query.before
+        rows = list(
+            programs.filter(Q(name__lt=name) | Q(name=name, pk__lt=pk)).order_by('-name', '-pk')[:PAGE_SIZE + 1]
+        )
+        has_more = len(rows) > PAGE_SIZE
+        rows = rows[:PAGE_SIZE][::-1]
+        previous_cursor = encode_cursor(rows[0]) if has_more else None
+        next_cursor = encode_cursor(rows[-1]) if rows else None
+        return rows, previous_cursor, next_cursor
+
+    if query.after:
+        name, pk = query.after
+        programs = programs.filter(Q(name__gt=name) | Q(name=name, pk__gt=pk))
+    rows = list(programs.order_by('name', 'pk')[:PAGE_SIZE + 1])
+    has_more = len(rows) > PAGE_SIZE
+    rows = rows[:PAGE_SIZE]
+    previous_cursor = encode_cursor(rows[0]) if query.after and rows else None
+    next_cursor = encode_cursor(rows[-1]) if has_more else None
+    return rows, previous_cursor, next_cursor
+
+
+def total(query, facet_counts):
+    """How many programs match ``query``, from its sector facet"""
+    return sum(count for sector, count in facet_counts['sector'] if not query.sector or sector == query.sector)
+
+
+def render_listing(query, version):
+    """The rendered programs list and pager for ``query``, cached per dataset version"""
+    key = (version, query)
+    html = _fragments.get(key)
+    if html is not None:
+        return html
+
+    programs, previous_cursor, next_cursor = page(query)
+    filters = {field: getattr(query, field) for field in FILTERS + ('q',) if getattr(query, field)}
+    html = render_to_string('website/initiatives_list.html', {
+        'programs': programs,
+        'previous_query': urlencode({**filters, 'before': previous_cursor}) if previous_cursor else None,
+        'next_query': urlencode({**filters, 'after': next_cursor}) if next_cursor else None,
+        'filtered': bool(filters),
+    })
+    _fragments.set(key, html)
+    return html
+
+
+def etag(query, version):
+    raw = json.dumps([version.count, version.modified.isoformat() if version.modified else None, query])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+
+programs_changed.connect(invalidate, dispatch_uid='program_listing_invalidate')
@@ -0,0 +1,175 @@
+"""
+Scam reports sent as JSON by the browser extension and partners.
+
+``/api/report-scam/bulk/`` takes a JSON array, or an NDJSON stream (one
+report per line) when sent as ``application/x-ndjson``, so a client coming
+back online can upload its whole queue at once. Each item is validated on
+its own and the valid ones are inserted ``CHUNK_SIZE`` at a time with
+``bulk_create``; the response has one result per item. ``bulk_create``
+sends no ``post_save``, so the new reports are counted into the link
+reputation here.
+
+Items may carry a ``client_report_id``. A report already stored under that
+id is answered as a duplicate instead of being inserted again, so a client
+can resend a batch whose response it never received.
+"""
+import json
+
+from django.conf import settings
+
+from . import reputation
+from .forms import ScamReportAPIForm
+from .models import ScamReport
+
+PLATFORMS = ('whatsapp', 'facebook', 'email', 'other')
+NDJSON_CONTENT_TYPES = {'application/x-ndjson', 'application/ndjson', 'application/jsonl'}
+CHUNK_SIZE = 200
+# Reports read from one request; the rest are left for the client to resend
+MAX_REPORTS = getattr(settings, 'SCAM_REPORT_BULK_MAX', 1000)
+CLIENT_REPORT_ID_MAX_LENGTH = ScamReport._meta.get_field('client_report_id').max_length
+
+CREATED = 'created'
+DUPLICATE = 'duplicate'
+INVALID = 'invalid'
+
+
+class PayloadError(ValueError):
+    """The request body as a whole cannot be read"""
+
+
+def parse_items(request):
+    """
+    ``(item, error)`` for each report in the request body. NDJSON is read
+    line by line; a malformed line is an error for that item only.
+    """
+    if request.content_type in NDJSON_CONTENT_TYPES:
+        return _ndjson_items(request)
+    try:
+        items = json.loads(request.body)
+    except (UnicodeDecodeError, ValueError) as e:
+        raise PayloadError(f"Invalid JSON: {e}")
+    if not isinstance(items, list):
+        raise PayloadError("Expected a JSON array of reports")
+    return ((item, None) for item in items)
+
+
+def _ndjson_items(request):
+    for line in request:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line), None
+        except (UnicodeDecodeError, ValueError) as e:
+            yield None, f"Invalid JSON: {e}"
+
+
+def clean_item(item, reporter=''):
+    """An unsaved ``ScamReport`` for ``item`` and None, or None and the validation errors"""
+    if not isinstance(item, dict):
+        return None, {'__all__': ['Expected a JSON object']}
+
+    form = ScamReportAPIForm(data={field: item.get(field) for field in ScamReportAPIForm._meta.fields})
+    errors = {} if form.is_valid() else {field: list(messages) for field, messages in form.errors.items()}
+
+    platforms = item.get('platform') or []
+    if isinstance(platforms, str):
+        platforms = [platform.strip() for platform in platforms.split(',') if platform.strip()]
+    if not isinstance(platforms, list) or any(platform not in PLATFORMS for platform in platforms):
+        errors['platform'] = [f"Expected a list of: {', '.join(PLATFORMS)}"]
+
+    client_report_id = item.get('client_report_id')
+    if client_report_id is not None and (
+        not isinstance(client_report_id, str)
+        or not client_report_id.strip()
+        or len(client_report_id) > CLIENT_REPORT_ID_MAX_LENGTH
+    ):
+        errors['client_report_id'] = [f"Expected a string of at most {CLIENT_REPORT_ID_MAX_LENGTH} characters"]
+
+    if errors:
+        return None, errors
+
+    report = form.save(commit=False)
+    for platform in PLATFORMS:
+        setattr(report, platform, platform in platforms)
+    report.client_report_id = client_report_id.strip() if client_report_id else None
+    report.reporter = reporter
+    return report, None
+
+
+def ingest(items, limit=MAX_REPORTS, reporter=''):
+    """
+    Validate and store ``(item, error)`` pairs sent by ``reporter`` (see
+    ``reputation.reporter_id``). Returns the per-item results and whether
+    reading stopped at ``limit``.
+    """
+    results = []
+    chunk = []
+    for index, (item, error) in enumerate(items):
+        if index >= limit:
+            _insert(chunk)
+            return results, True
+        report, errors = (None, {'__all__': [error]}) if error else clean_item(item, reporter)
+        if report is None:
+            results.append({'index': index, 'status': INVALID, 'errors': errors})
+            continue
+        result = {'index': index, 'client_report_id': report.client_report_id}
+        results.append(result)
+        chunk.append((result, report))
+        if len(chunk) >= CHUNK_SIZE:
+            _insert(chunk)
+            chunk = []
+    _insert(chunk)
+    return results, False
+
+
+def _insert(chunk):
+    """Insert one chunk of valid reports, skipping those already stored under their client id"""
+    if not chunk:
+        return
+    client_ids = {report.client_report_id for _, report in chunk if report.client_report_id}
+    stored = ScamReport.objects.in_bulk(client_ids, field_name='client_report_id') if client_ids else {}
+
+    keyed = []
+    anonymous = []
+    claimed = set(stored)
+    for result, report in chunk:
+        client_id = report.client_report_id
+        if client_id is None:
+            anonymous.append((result, report))
+        elif client_id in claimed:
+            result['status'] = DUPLICATE
+        else:
+            claimed.add(client_id)
+            keyed.append((result, report))
+
+    ScamReport.objects.bulk_create([report for _, report in anonymous], batch_size=CHUNK_SIZE)
+    for result, report in anonymous:
+        result.update(status=CREATED, id=report.pk)
+
+    inserted = [report for _, report in anonymous]
+    if keyed:
+        # A concurrent retry of the same batch may insert some of these first
+        ScamReport.objects.bulk_create([report for _, report in keyed], batch_size=CHUNK_SIZE, ignore_conflicts=True)
+        # ignore_conflicts leaves the primary keys unset, so read them back
+        stored = ScamReport.objects.in_bulk(client_ids, field_name='client_report_id')
+        for result, report in keyed:
+            row = stored.get(report.client_report_id)
+            # Our row carries the submission time set on our object by bulk_create
+            if row is not None and row.submitted_at == report.submitted_at and row.reporter == report.reporter:
+                report.pk = row.pk
+                result['status'] = CREATED
+                inserted.append(report)
+            else:
+                result['status'] = DUPLICATE
+    for result, report in chunk:
+        if report.client_report_id in stored:
+            result['id'] = stored[report.client_report_id].pk
+    reputation.record_reports(inserted)
+
+
+def summary(results, truncated):
+    counts = {status: 0 for status in (CREATED, DUPLICATE, INVALID)}
+    for result in results:
+        counts[result['status']] += 1
+    return {'status': 'success', **counts, 'truncated': truncated, 'results': results}
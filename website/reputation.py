@@ -0,0 +1,248 @@
+"""
+Community reputation of links, built from scam reports.
+
+Every report's ``reference`` is reduced to canonical ``url:`` and
+``domain:`` keys (see ``clustering.reference_keys``). ``ReportedLink`` keeps,
+per key, how many different reporters named it and when the latest did. A
+reporter is a keyed hash of the submitter's IP address
+(``ScamReport.reporter``), and ``ReportedLinkSource`` remembers who was
+already counted, so repeating a report, alone or many times in one bulk
+upload, cannot push a link over ``MIN_REPORTS``. Saving a report updates
+the rows straight away; bulk-created reports are recorded by
+``report_ingest``.
+
+The link checkers look links up in an in-process dict, so a check costs
+two dict lookups and no external call. The dict is loaded once and then
+refreshed with the rows changed since, at most every
+``RELOAD_CHECK_INTERVAL`` seconds, so every web process sees new reports
+shortly after they are made. Government and well-known domains are never
+flagged: reports often quote the official site they impersonate.
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+from whatsapp_verifier.canonical import canonical_domain, canonicalize_url, url_hash
+from whatsapp_verifier.domain_matcher import match_domain
+
+from .clustering import reference_keys
+from .models import ReportedLink, ReportedLinkSource, ScamReport
+from .utils import client_ip
+
+logger = logging.getLogger(__name__)
+
+# Different reporters needed before a link is flagged, and how long a report counts
+MIN_REPORTS = getattr(settings, 'REPUTATION_MIN_REPORTS', 3)
+REPORT_WINDOW = timedelta(days=getattr(settings, 'REPUTATION_WINDOW_DAYS', 90))
+RELOAD_CHECK_INTERVAL = 30
+# Rows re-read before the last seen change, for writes committed out of order
+RELOAD_OVERLAP = timedelta(seconds=5)
+
+# ``matched`` is the reported link or domain the checked link was found under
+ReputationHit = namedtuple('ReputationHit', ['url', 'matched', 'report_count', 'last_reported'])
+
+_index = None
+_watermark = None
+_checked = 0.0
+_lock = threading.Lock()
+
+
+def link_keys(reference):
+    """The ``url:`` and ``domain:`` keys of a reference that may be flagged"""
+    return [
+        key for key in reference_keys(reference)
+        if key.startswith(('url:', 'url#', 'domain:')) and match_domain(_domain_of(key)) is None
+    ]
+
+
+def _domain_of(key):
+    kind, _, value = key.partition(':')
+    if kind == 'domain':
+        return value
+    return canonical_domain(value) if kind == 'url' else ''
+
+
+def reporter_id(request):
+    """The ``ScamReport.reporter`` of a request: a keyed hash of its client address"""
+    address = client_ip(request)
+    return salted_hmac('website.reputation.reporter', address).hexdigest()[:32] if address else ''
+
+
+def _reporter(report):
+    # Reports made without a request (admin, shell) each count on their own
+    return report.reporter or (f'report:{report.pk}' if report.pk else '')
+
+
+def record(keys, reporter, reported_at=None):
+    """Count ``reporter`` against each of ``keys`` it was not already counted for"""
+    reported_at = reported_at or timezone.now()
+    now = timezone.now()
+    for key in keys:
+        try:
+            with transaction.atomic():
+                ReportedLinkSource.objects.create(key=key, reporter=reporter)
+        except IntegrityError:
+            continue
+
+        updated = ReportedLink.objects.filter(key=key).update(
+            report_count=F('report_count') + 1,
+            last_reported=Greatest('last_reported', reported_at),
+            modified=now,
+        )
+        if updated:
+            continue
+        try:
+            with transaction.atomic():
+                ReportedLink.objects.create(
+                    key=key, report_count=1, first_reported=reported_at, last_reported=reported_at,
+                )
+        except IntegrityError:
+            # Created by a concurrent report
+            ReportedLink.objects.filter(key=key).update(
+                report_count=F('report_count') + 1,
+                last_reported=Greatest('last_reported', reported_at),
+                modified=now,
+            )
+    # This process sees its own reports without waiting for a reload
+    _apply(ReportedLink.objects.filter(key__in=keys))
+
+
+def record_reports(reports):
+    for report in reports:
+        keys = link_keys(report.reference)
+        reporter = _reporter(report)
+        if keys and reporter:
+            record(keys, reporter, report.submitted_at)
+
+
+def record_report(sender, instance, created, raw=False, **kwargs):
+    """``post_save`` receiver for ``ScamReport``"""
+    if created and not raw:
+        record_reports([instance])
+
+
+def rebuild():
+    """Recount every report from scratch; returns the number of keys"""
+    counts = {}
+    sources = set()
+    reports = ScamReport.objects.exclude(reference__isnull=True).exclude(reference='') \
+        .only('pk', 'reference', 'reporter', 'submitted_at')
+    for report in reports.iterator():
+        reporter = _reporter(report)
+        for key in link_keys(report.reference):
+            if (key, reporter) in sources:
+                continue
+            sources.add((key, reporter))
+            count, first, last = counts.get(key, (0, report.submitted_at, report.submitted_at))
+            counts[key] = (count + 1, min(first, report.submitted_at), max(last, report.submitted_at))
+
+    with transaction.atomic():
+        ReportedLinkSource.objects.all().delete()
+        ReportedLinkSource.objects.bulk_create(
+            [ReportedLinkSource(key=key, reporter=reporter) for key, reporter in sources], batch_size=1000,
+        )
+        ReportedLink.objects.all().delete()
+        ReportedLink.objects.bulk_create(
+            [
+                ReportedLink(key=key, report_count=count, first_reported=first, last_reported=last)
+                for key, (count, first, last) in counts.items()
+            ],
+            batch_size=1000,
+        )
+    reset()
+    return len(counts)
+
+
+def _apply(rows):
+    global _index, _watermark
+    rows = list(rows.values_list('key', 'report_count', 'last_reported', 'modified'))
+    with _lock:
+        if _index is None:
+            return
+        for key, count, last_reported, modified in rows:
+            _index[key] = (count, last_reported)
+            if _watermark is None or modified > _watermark:
+                _watermark = modified
+
+
+def get_index():
+    """The process-wide ``{key: (report_count, last_reported)}``, refreshed with recent changes"""
+    global _index, _watermark, _checked
+    now = time.monotonic()
+    if _index is not None and now - _checked < RELOAD_CHECK_INTERVAL:
+        return _index
+
+    with _lock:
+        _checked = now
+        if _index is None:
+            rows = ReportedLink.objects.all()
+            _index = {}
+        else:
+            rows = ReportedLink.objects.filter(modified__gte=_watermark - RELOAD_OVERLAP) if _watermark else ReportedLink.objects.all()
+        try:
+            for key, count, last_reported, modified in rows.values_list('key', 'report_count', 'last_reported', 'modified'):
+                _index[key] = (count, last_reported)
+                if _watermark is None or modified > _watermark:
+                    _watermark = modified
+        except Exception:
+            logger.exception("Could not refresh the link reputation index")
+    return _index
+
+
+def reset():
+    """Drop the in-process index; the next lookup loads it again"""
+    global _index, _watermark
+    with _lock:
+        _index = None
+        _watermark = None
+
+
+def check_url(url):
+    """``ReputationHit`` when ``url`` or its domain was reported by enough people recently enough, otherwise None"""
+    try:
+        canonical = canonicalize_url(url)
+    except ValueError:
+        return None
+    domain = canonical_domain(canonical)
+    if not domain or match_domain(domain) is not None:
+        return None
+
+    index = get_index()
+    url_key = f'url:{canonical}' if len(canonical) <= 250 else f'url#{url_hash(canonical)}'
+    recent = timezone.now() - REPORT_WINDOW
+    for key, matched in ((url_key, canonical), (f'domain:{domain}', domain)):
+        entry = index.get(key)
+        if entry is not None and entry[0] >= MIN_REPORTS and entry[1] >= recent:
+            return ReputationHit(canonical, matched, entry[0], entry[1])
+    return None
+
+
+def hit_as_result(hit):
+    """Shape a reputation hit like the ``safe_browsing`` result of the website checker"""
+    return {
+        "safe": False,
+        "primary_threat": "scam",
+        "threat_types": {
+            'phishing': 0, 'malware': 0, 'spam': 0, 'scam': 1, 'suspicious': 0, 'other_malicious': 0,
+        },
+        "threat_details": [
+            {
+                'engine': 'Community reports',
+                'type': 'Scam/Fraud',
+                'result': f"Reported by {hit.report_count} people, last on {hit.last_reported:%Y-%m-%d}: {hit.matched}",
+            },
+        ],
+        "total_threats": 1,
+        "scan_date": None,
+        "reputation": None,
+        "url": hit.url,
+    }
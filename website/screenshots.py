@@ -0,0 +1,208 @@
+"""
+Screenshot uploads for scam reports.
+
+``HashingUploadHandler`` streams each uploaded file to a temporary file in
+chunks, computing its SHA-256 on the way, so a large phone photo is never
+held in memory. ``store`` then keeps one ``Screenshot`` per distinct file:
+an upload whose hash is already known just links the existing row.
+
+Decoding, re-encoding and thumbnailing happen on a background worker
+(``process``). The worker also computes a 64-bit difference hash (dHash) of
+the image; a screenshot within ``NEAR_DUPLICATE_DISTANCE`` bits of one
+already stored (the same flyer re-saved, resized or recompressed) hands
+its reports to that one and drops its own files. Candidates are found
+through the four 16-bit bands of the hash: two hashes that differ in at
+most three bits share at least one band exactly.
+"""
+import hashlib
+import io
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from whatsapp_verifier.workers import KeyedWorkerPool
+
+from .models import Screenshot
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 64 * 1024
+# Longest side of the stored image and of its thumbnail, in pixels
+MAX_IMAGE_SIDE = getattr(settings, 'SCREENSHOT_MAX_SIDE', 1600)
+THUMBNAIL_SIDE = 320
+JPEG_QUALITY = 85
+NEAR_DUPLICATE_DISTANCE = 3
+BANDS = 4
+BAND_BITS = 16
+# Pending screenshots older than this were left behind by a restart
+STALE_PENDING_AFTER = timedelta(minutes=5)
+
+# One worker per process, so near-identical uploads handled by the same
+# process cannot miss each other. Uploads processed at the same moment by
+# two web processes may both be kept; that only costs a missed dedupe.
+screenshot_pool = KeyedWorkerPool('screenshots', size=1)
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """Stream each file to a temporary file on disk, hashing it as chunks arrive"""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.sha256 = self.hasher.hexdigest()
+        return uploaded
+
+
+def file_sha256(uploaded):
+    """The SHA-256 of an upload, from the handler when it computed one"""
+    digest = getattr(uploaded, 'sha256', None)
+    if digest is None:
+        hasher = hashlib.sha256()
+        for chunk in uploaded.chunks(HASH_CHUNK_SIZE):
+            hasher.update(chunk)
+        digest = hasher.hexdigest()
+        uploaded.seek(0)
+    return digest
+
+
+def _canonical(screenshot):
+    return screenshot.duplicate_of or screenshot
+
+
+def store(uploaded):
+    """The ``Screenshot`` for an uploaded file, stored now unless an identical file already is"""
+    digest = file_sha256(uploaded)
+    existing = Screenshot.objects.select_related('duplicate_of').filter(sha256=digest).first()
+    if existing is not None:
+        return _canonical(existing)
+
+    screenshot = Screenshot(sha256=digest, size=uploaded.size)
+    # Moves the temporary file into place rather than copying it
+    screenshot.image.save(uploaded.name, uploaded, save=False)
+    try:
+        with transaction.atomic():
+            screenshot.save()
+    except IntegrityError:
+        # The same file arrived in a concurrent request
+        screenshot.image.delete(save=False)
+        return _canonical(Screenshot.objects.select_related('duplicate_of').get(sha256=digest))
+
+    transaction.on_commit(lambda: enqueue(screenshot.pk))
+    return screenshot
+
+
+def enqueue(screenshot_id):
+    """Queue a screenshot for processing, recovering leftovers the first time"""
+    if screenshot_pool.start():
+        recover_pending()
+    screenshot_pool.submit('screenshots', process, screenshot_id)
+
+
+def recover_pending():
+    """Requeue screenshots left pending by a restarted or crashed worker"""
+    stale = Screenshot.objects.filter(
+        status=Screenshot.STATUS_PENDING, created__lt=timezone.now() - STALE_PENDING_AFTER,
+    ).values_list('pk', flat=True)
+    for screenshot_id in stale:
+        screenshot_pool.submit('screenshots', process, screenshot_id)
+
+
+def dhash(image, size=8):
+    """64-bit difference hash: whether each pixel is brighter than its right neighbour"""
+    from PIL import Image
+
+    pixels = image.convert('L').resize((size + 1, size), Image.Resampling.LANCZOS).tobytes()
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            offset = row * (size + 1) + col
+            bits = (bits << 1) | (pixels[offset] > pixels[offset + 1])
+    return bits
+
+
+def bands(value):
+    return [(value >> (BAND_BITS * index)) & ((1 << BAND_BITS) - 1) for index in range(BANDS)]
+
+
+def find_near_duplicate(value, exclude=None):
+    """The stored screenshot whose hash is closest to ``value`` within the threshold, or None"""
+    query = Q()
+    for index, band in enumerate(bands(value)):
+        query |= Q(**{f'dhash_band{index}': band})
+    candidates = Screenshot.objects.filter(query, status=Screenshot.STATUS_READY).exclude(pk=exclude)
+
+    best, best_distance = None, NEAR_DUPLICATE_DISTANCE + 1
+    for candidate in candidates.only('pk', 'dhash').order_by('pk'):
+        distance = bin(int(candidate.dhash, 16) ^ value).count('1')
+        if distance < best_distance:
+            best, best_distance = candidate, distance
+    return best
+
+
+def _encode_jpeg(image, max_side):
+    """A JPEG copy of ``image`` no larger than ``max_side``, and its dimensions"""
+    copy = image.copy()
+    copy.thumbnail((max_side, max_side))
+    if copy.mode != 'RGB':
+        copy = copy.convert('RGB')
+    buffer = io.BytesIO()
+    copy.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+    return ContentFile(buffer.getvalue()), copy.size
+
+
+def process(screenshot_id):
+    """Hash, deduplicate, re-encode and thumbnail one uploaded screenshot"""
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    screenshot = Screenshot.objects.filter(pk=screenshot_id, status=Screenshot.STATUS_PENDING).first()
+    if screenshot is None:
+        return
+
+    try:
+        with screenshot.image.open('rb') as source:
+            image = ImageOps.exif_transpose(Image.open(source))
+            image.load()
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+        logger.warning("Screenshot %s is not a readable image: %s", screenshot.sha256, e)
+        Screenshot.objects.filter(pk=screenshot.pk).update(status=Screenshot.STATUS_FAILED)
+        return
+
+    value = dhash(image)
+    screenshot.dhash = f'{value:016x}'
+    for index, band in enumerate(bands(value)):
+        setattr(screenshot, f'dhash_band{index}', band)
+
+    canonical = find_near_duplicate(value, exclude=screenshot.pk)
+    if canonical is not None:
+        with transaction.atomic():
+            canonical.reports.add(*screenshot.reports.all())
+            screenshot.reports.clear()
+            screenshot.duplicate_of = canonical
+            screenshot.status = Screenshot.STATUS_DUPLICATE
+            screenshot.image.delete(save=False)
+            screenshot.save()
+        logger.info("Screenshot %s is a near-duplicate of %s", screenshot.sha256[:12], canonical.sha256[:12])
+        return
+
+    # Re-encoded copies drop metadata such as GPS position, and most of the size
+    encoded, (screenshot.width, screenshot.height) = _encode_jpeg(image, MAX_IMAGE_SIDE)
+    thumbnail, _ = _encode_jpeg(image, THUMBNAIL_SIDE)
+    screenshot.image.delete(save=False)
+    screenshot.image.save('image.jpg', encoded, save=False)
+    screenshot.thumbnail.save('thumbnail.jpg', thumbnail, save=False)
+    screenshot.size = screenshot.image.size
+    screenshot.status = Screenshot.STATUS_READY
+    screenshot.save()
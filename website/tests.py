@@ -1,3 +1,108 @@
+import json
+from unittest import mock
+
 from django.test import TestCase
+from django.urls import reverse
+
+from . import report_ingest, reputation
+from .models import ReportedLink, ScamReport
+
+
+def report_item(**fields):
+    return {'initiative_type': 'other', 'reference': 'free-grant-portal.xyz', 'description': 'Asked for a fee', **fields}
+
+
+class BulkReportTests(TestCase):
+    def post_bulk(self, items, **extra):
+        return self.client.post(
+            reverse('api_report_scam_bulk'), json.dumps(items), content_type='application/json', **extra,
+        ).json()
+
+    def test_resubmitted_batch_is_not_stored_twice(self):
+        items = [report_item(client_report_id='a'), report_item(client_report_id='b')]
+        first = self.post_bulk(items)
+        second = self.post_bulk(items)
+
+        self.assertEqual((first['created'], first['duplicate']), (2, 0))
+        self.assertEqual((second['created'], second['duplicate']), (0, 2))
+        self.assertEqual(ScamReport.objects.count(), 2)
+        self.assertEqual([item['id'] for item in first['results']], [item['id'] for item in second['results']])
+
+    def test_repeated_client_id_within_a_batch(self):
+        result = self.post_bulk([report_item(client_report_id='a'), report_item(client_report_id='a')])
+        self.assertEqual([item['status'] for item in result['results']], ['created', 'duplicate'])
+        self.assertEqual(ScamReport.objects.count(), 1)
+
+    def test_invalid_items_are_reported_individually(self):
+        result = self.post_bulk([report_item(), report_item(initiative_type='nope'), 'not an object'])
+        self.assertEqual([item['status'] for item in result['results']], ['created', 'invalid', 'invalid'])
+
+    def test_report_inserted_by_a_concurrent_retry_is_a_duplicate(self):
+        # Another request stores the report between our lookup and our insert
+        ScamReport.objects.create(client_report_id='a', reporter='someone-else', **report_item())
+        in_bulk = ScamReport.objects.in_bulk
+        calls = []
+
+        def racing_in_bulk(*args, **kwargs):
+            calls.append(args)
+            return {} if len(calls) == 1 else in_bulk(*args, **kwargs)
+
+        with mock.patch.object(ScamReport.objects, 'in_bulk', side_effect=racing_in_bulk):
+            results, _ = report_ingest.ingest([(report_item(client_report_id='a'), None)], reporter='me')
+
+        self.assertEqual(results[0]['status'], report_ingest.DUPLICATE)
+        self.assertEqual(results[0]['id'], ScamReport.objects.get(client_report_id='a').pk)
+        self.assertEqual(ScamReport.objects.count(), 1)
+
+
+class ReputationTests(TestCase):
+    def setUp(self):
+        reputation.reset()
+
+    def post_report(self, address, **fields):
+        return self.client.post(
+            reverse('api_report_scam'), json.dumps(report_item(**fields)), content_type='application/json',
+            HTTP_X_FORWARDED_FOR=address,
+        )
+
+    def count(self, key='domain:free-grant-portal.xyz'):
+        return ReportedLink.objects.filter(key=key).values_list('report_count', flat=True).first()
+
+    def test_repeats_from_one_reporter_count_once(self):
+        for _ in range(reputation.MIN_REPORTS):
+            self.post_report('198.51.100.1')
+        self.assertEqual(self.count(), 1)
+        self.assertIsNone(reputation.check_url('https://free-grant-portal.xyz/apply'))
+
+    def test_one_bulk_upload_counts_once(self):
+        self.client.post(
+            reverse('api_report_scam_bulk'), json.dumps([report_item()] * 3), content_type='application/json',
+            HTTP_X_FORWARDED_FOR='198.51.100.1',
+        )
+        self.assertEqual(ScamReport.objects.count(), 3)
+        self.assertEqual(self.count(), 1)
+
+    def test_spoofed_forwarded_entries_are_ignored(self):
+        for spoofed in ('203.0.113.1', '203.0.113.2', '203.0.113.3'):
+            self.post_report(f'{spoofed}, 198.51.100.1')
+        self.assertEqual(self.count(), 1)
+
+    def test_distinct_reporters_flag_the_link(self):
+        for index in range(reputation.MIN_REPORTS):
+            self.post_report(f'198.51.100.{index + 1}')
+        hit = reputation.check_url('https://free-grant-portal.xyz/apply')
+        self.assertIsNotNone(hit)
+        self.assertEqual((hit.matched, hit.report_count), ('free-grant-portal.xyz', reputation.MIN_REPORTS))
+
+    def test_government_domains_are_never_flagged(self):
+        for index in range(reputation.MIN_REPORTS):
+            self.post_report(f'198.51.100.{index + 1}', reference='https://nasims.gov.ng/apply')
+        self.assertFalse(ReportedLink.objects.exists())
+        self.assertIsNone(reputation.check_url('https://nasims.gov.ng/apply'))
 
-# Create your tests here.
+    def test_rebuild_counts_distinct_reporters(self):
+        for address in ('198.51.100.1', '198.51.100.1', '198.51.100.2'):
+            self.post_report(address)
+        ReportedLink.objects.all().delete()
+        reputation.rebuild()
+        self.assertEqual(self.count(), 2)
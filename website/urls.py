@@ -9,6 +9,9 @@ urlpatterns = [
     path("initiatives/", views.initiatives, name="initiatives"),
     path("resources/", views.resources, name="resources"),
     path("chatbot/", views.chatbot, name="chatbot"),
+    path("chatbot/stream/", views.chatbot_stream, name="chatbot_stream"),
     path("api/report-scam/", views.api_report_scam, name="api_report_scam"),
+    path("api/report-scam/bulk/", views.api_report_scam_bulk, name="api_report_scam_bulk"),
+    path("api/trending-scams/", views.api_trending_scams, name="api_trending_scams"),
     
 ]
@@ -1,31 +1,16 @@
-import requests
-from decouple import config
-from urllib.parse import urlparse
 import logging
-import base64
 from django.conf import settings
+from whatsapp_verifier import virustotal
+from whatsapp_verifier.canonical import canonical_domain
 
 logger = logging.getLogger(__name__)
 
-# Google Safe Browsing API key
-VIRUSTOTAL_API_KEY = config("VIRUSTOTAL_API_KEY", default="")
 
 def check_url_with_virustotal(url: str):
     """
-    Submit a URL to VirusTotal and return the scan results.
+    Look up a URL on VirusTotal and return the raw report.
     """
-    headers = {
-        "x-apikey": settings.VIRUSTOTAL_API_KEY
-    }
-
-    # Encode URL for lookup (strip '=' padding)
-    url_id = base64.urlsafe_b64encode(url.encode()).decode().strip("=")
-
-    # Query VirusTotal
-    response = requests.get(
-        f"https://www.virustotal.com/api/v3/urls{url}",
-        headers=headers
-    )
+    response = virustotal.get_url_report(url)
 
     if response.status_code == 200:
         return response.json()
@@ -40,12 +25,17 @@ def extract_domain(url: str) -> str:
     Example:
         https://www.nirsal.gov.ng/programs/loan -> nirsal.gov.ng
     """
-    try:
-        parsed = urlparse(url)
-        domain = parsed.netloc.lower()
-        # Strip leading "www."
-        if domain.startswith("www."):
-            domain = domain[4:]
-        return domain
-    except Exception:
-        return url.lower()
\ No newline at end of file
+    return canonical_domain(url) or url.lower()
+
+
+def client_ip(request) -> str:
+    """
+    The address the request came from. Behind ``TRUSTED_PROXY_COUNT``
+    proxies it is the entry they added to X-Forwarded-For; anything to its
+    left was sent by the client and cannot be trusted.
+    """
+    proxies = getattr(settings, 'TRUSTED_PROXY_COUNT', 0)
+    forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if part.strip()]
+    if proxies and len(forwarded) >= proxies:
+        return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
@@ -1,22 +1,22 @@
-import requests
+import json
+import logging
+
+import httpx
+from asgiref.sync import sync_to_async
 from decouple import config
-from whatsapp_verifier.models import FederalProgram
+from scmprv.http_client import get_client
+from whatsapp_verifier.search import search_programs
 
-OPENROUTER_API_KEY = config("OPENROUTER_API_KEY")
+from .chat_context import build_context
 
+logger = logging.getLogger(__name__)
 
-def query_openrouter(message, language="en"):
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    
-    # Updated headers for OpenRouter
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://safecheck.up.railway.app/",
-        "X-Title": "GDS Verified Schemes Chatbot",
-    }
+OPENROUTER_API_KEY = config("OPENROUTER_API_KEY")
 
-    system_prompt = f"""
+OPENROUTER_URL = config("OPENROUTER_URL", default="https://openrouter.ai/api/v1/chat/completions")
+OPENROUTER_MODEL = "x-ai/grok-4-fast"  # add :online to enable OpenRouter web-search plugin
+
+SYSTEM_PROMPT = """
     Your name is Ana.
 You are the GDS Verified Schemes chatbot for Nigeria.
 You were built to assist Nigerian citizens with information about government schemes and programs.
@@ -46,6 +46,19 @@ RESPONSE FORMATTING:
 - Avoid bullet points, numbered lists, bold, or italic formatting
     """
 
+
+def openrouter_request(message, stream=False):
+    """
+    Headers and payload of a chat completion request for ``message``,
+    grounded in the program records retrieved for it.
+    """
+    headers = {
+        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+        "Content-Type": "application/json",
+        "HTTP-Referer": "https://safecheck.up.railway.app/",
+        "X-Title": "GDS Verified Schemes Chatbot",
+    }
+
     # payload = {
     #     "model": "openai/gpt-4o-mini",
     #     "messages": [
@@ -56,58 +69,110 @@ RESPONSE FORMATTING:
     #     "temperature": 0.7,  # Add temperature for consistency
     # }
 
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    context = build_context(message)
+    if context:
+        messages.append({"role": "system", "content": context})
+    messages.append({"role": "user", "content": message})
+
     payload = {
-        "model": "x-ai/grok-4-fast",  # add :online to enable OpenRouter web-search plugin
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": message},
-        ],
+        "model": OPENROUTER_MODEL,
+        "messages": messages,
         "max_tokens": 500,
         "temperature": 0.7,
     }
+    if stream:
+        payload["stream"] = True
+    return headers, payload
+
+
+def openrouter_error(status_code, text=""):
+    """User-facing message for a failed OpenRouter response"""
+    if status_code == 401:
+        return "⚠️ Error: Invalid OpenRouter API key. Please check your configuration."
+    elif status_code == 402:
+        return "⚠️ Error: Insufficient credits in OpenRouter account."
+    elif status_code == 429:
+        return "⚠️ Error: Rate limit exceeded. Please try again later."
+    return f"⚠️ OpenRouter Error {status_code}: {text}"
 
 
+async def aquery_openrouter(message):
+    """The reply to ``message``, or a "⚠️" error message"""
     try:
         # Debug: Check if API key exists
         if not OPENROUTER_API_KEY:
             return "⚠️ Error: OpenRouter API key not configured"
-        
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
-        
-        # Debug logging
-        print(f"OpenRouter Response Status: {response.status_code}")
-        print(f"OpenRouter Response: {response.text}")
-        
+
+        # Retrieving the program context reads the database
+        headers, payload = await sync_to_async(openrouter_request)(message)
+        response = await get_client().post(OPENROUTER_URL, headers=headers, json=payload, timeout=30)
+
+        logger.debug("OpenRouter response %s: %s", response.status_code, response.text[:500])
+
         if response.status_code == 200:
             data = response.json()
             return data["choices"][0]["message"]["content"]
-        elif response.status_code == 401:
-            return "⚠️ Error: Invalid OpenRouter API key. Please check your configuration."
-        elif response.status_code == 402:
-            return "⚠️ Error: Insufficient credits in OpenRouter account."
-        elif response.status_code == 429:
-            return "⚠️ Error: Rate limit exceeded. Please try again later."
         else:
-            return f"⚠️ OpenRouter Error {response.status_code}: {response.text}"
-            
-    except requests.exceptions.Timeout:
+            return openrouter_error(response.status_code, response.text)
+
+    except httpx.TimeoutException:
         return "⚠️ Error: Request timed out. Please try again."
-    except requests.exceptions.ConnectionError:
+    except httpx.TransportError:
         return "⚠️ Error: Connection failed. Please check your internet connection."
     except Exception as e:
         return f"⚠️ Error: {str(e)}"
 
 
+async def astream_openrouter(message):
+    """
+    Yield the reply to ``message`` piece by piece as OpenRouter generates it.
+
+    Uses the server-sent events stream of the chat completions API. Errors
+    are yielded as a single message, like ``aquery_openrouter`` returns them.
+    """
+    if not OPENROUTER_API_KEY:
+        yield "⚠️ Error: OpenRouter API key not configured"
+        return
+
+    try:
+        headers, payload = await sync_to_async(openrouter_request)(message, stream=True)
+        # The read timeout applies between chunks, not to the whole reply
+        timeout = httpx.Timeout(30, connect=5)
+        async with get_client().stream("POST", OPENROUTER_URL, headers=headers, json=payload, timeout=timeout) as response:
+            logger.debug("OpenRouter stream response %s", response.status_code)
+            if response.status_code != 200:
+                await response.aread()
+                yield openrouter_error(response.status_code, response.text)
+                return
+
+            async for line in response.aiter_lines():
+                # Blank lines separate events; ": ..." lines are keep-alive comments
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    return
+                chunk = json.loads(data)
+                if "error" in chunk:
+                    yield f"⚠️ Error: {chunk['error'].get('message', 'generation failed')}"
+                    return
+                choices = chunk.get("choices") or [{}]
+                content = (choices[0].get("delta") or {}).get("content")
+                if content:
+                    yield content
+
+    except httpx.TimeoutException:
+        yield "⚠️ Error: Request timed out. Please try again."
+    except httpx.TransportError:
+        yield "⚠️ Error: Connection failed. Please check your internet connection."
+    except Exception as e:
+        yield f"⚠️ Error: {str(e)}"
+
+
 def search_programs_in_db(query):
     """
     Search for relevant programs in the FederalProgram database.
-    Matches against name, description, or agency.
+    Ranked full-text match against name, agency, sector and description.
     """
-    results = FederalProgram.objects.filter(
-        name__icontains=query
-    ) | FederalProgram.objects.filter(
-        description__icontains=query
-    ) | FederalProgram.objects.filter(
-        agency__icontains=query
-    )
-    return results[:5]
\ No newline at end of file
+    return search_programs(query, limit=5)
@@ -1,160 +1,129 @@
-from django.shortcuts import render
-from .forms import LinkCheckForm
-import base64
-from django.http import HttpResponse
-from django.views.decorators.csrf import csrf_exempt
-from .utils import check_url_with_virustotal, extract_domain
-from whatsapp_verifier.models import FederalProgram
-from .utils_chatbot import query_openrouter, search_programs_in_db
-from django.shortcuts import render, redirect
-from django.contrib import messages
-from django.http import JsonResponse
-from .models import ScamReport 
+import asyncio
 import json
-from django.conf import settings
-from .forms import ScamReportForm
-import requests
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.db import close_old_connections, transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import redirect, render
+from django.urls import reverse
+from django.utils.html import escape, format_html
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import condition
+from whatsapp_verifier.blocklist import check_url as check_blocklist, hit_as_result as blocklist_hit_as_result
+from whatsapp_verifier.models import FederalProgram
+from whatsapp_verifier.verdicts import lookup_verdict, verdict_as_result
+
+from . import chat_cache, clustering, program_listing, report_ingest, reputation, safe_browsing, screenshots
+from .forms import LinkCheckForm, ScamReportForm
+from .utils import extract_domain
+from .utils_chatbot import aquery_openrouter, astream_openrouter, search_programs_in_db
 # Create your views here.
 
 
 @csrf_exempt
 def api_report_scam(request):
     if request.method == "POST":
-        data = json.loads(request.body)
-
-        ScamReport.objects.create(
-            initiative_type=data.get("initiative_type"),
-            reference=data.get("reference"),
-            description=data.get("description"),
-            contact=data.get("contact"),
-            platforms=",".join(data.get("platform", []))
-        )
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
 
-        return JsonResponse({"status": "success"})
+        results, _ = report_ingest.ingest([(data, None)], reporter=reputation.reporter_id(request))
+        result = results[0]
+        if result["status"] == report_ingest.INVALID:
+            return JsonResponse({"error": "Invalid report", "errors": result["errors"]}, status=400)
+
+        return JsonResponse({
+            "status": "success",
+            "id": result.get("id"),
+            "duplicate": result["status"] == report_ingest.DUPLICATE,
+        })
     
     return JsonResponse({"error": "Invalid request"}, status=400)
 
 
+@csrf_exempt
+def api_report_scam_bulk(request):
+    """
+    Store many reports at once: a JSON array, or NDJSON sent as
+    ``application/x-ndjson``. Answers with one result per item (see
+    ``report_ingest``); resending items with the same ``client_report_id``
+    does not duplicate them.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid request"}, status=400)
+
+    try:
+        items = report_ingest.parse_items(request)
+        results, truncated = report_ingest.ingest(items, reporter=reputation.reporter_id(request))
+    except report_ingest.PayloadError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse(report_ingest.summary(results, truncated))
+
+
 def landing_page(request):
     return render(request, "website/landing.html")
 
-def verify_link(request):
-    result = None
-    form = LinkCheckForm(request.POST or None)
+def check_virustotal(url):
+    """The ``safe_browsing`` result for ``url``: local blocklist and community reports first, then the shared verdict store"""
+    try:
+        hit = check_blocklist(url)
+        if hit is not None:
+            return blocklist_hit_as_result(hit)
 
-    if request.method == "POST" and form.is_valid():
-        original_url = form.cleaned_data["url"]
+        reported = reputation.check_url(url)
+        if reported is not None:
+            return reputation.hit_as_result(reported)
 
-        # --- VirusTotal check (inline) ---
-        try:
-            headers = {
-                "x-apikey": settings.VIRUSTOTAL_API_KEY
+        verdict, status_code, vt_response = lookup_verdict(url, timeout=10)
+        if verdict is not None:
+            return verdict_as_result(verdict)
+        elif status_code == 429:
+            return {
+                "error": "Our VirusTotal quota is busy right now. Please try again in a minute.",
+                "safe": None
             }
-            
-            # Encode URL for VirusTotal API
-            url_id = base64.urlsafe_b64encode(original_url.encode()).decode().strip("=")
-            
-            # Correct VirusTotal API endpoint
-            vt_response = requests.get(
-                f"https://www.virustotal.com/api/v3/urls/{url_id}",
-                headers=headers
-            )
-            
-            if vt_response.status_code == 200:
-                vt_data = vt_response.json()
-                
-                # Extract detailed scan results
-                attributes = vt_data.get('data', {}).get('attributes', {})
-                stats = attributes.get('last_analysis_stats', {})
-                results = attributes.get('last_analysis_results', {})
-                
-                malicious = stats.get('malicious', 0)
-                suspicious = stats.get('suspicious', 0)
-                
-                vt_safe = malicious == 0 and suspicious == 0
-                
-                # Categorize threats by type
-                threat_types = {
-                    'phishing': 0,
-                    'malware': 0,
-                    'spam': 0,
-                    'scam': 0,
-                    'suspicious': 0,
-                    'other_malicious': 0
-                }
-                
-                threat_details = []
-                
-                for engine, result in results.items():
-                    category = result.get('category', '').lower()
-                    result_text = result.get('result', '').lower()
-                    
-                    if category in ['malicious', 'suspicious']:
-                        # Categorize by threat type
-                        if 'phishing' in result_text or 'phish' in result_text:
-                            threat_types['phishing'] += 1
-                            threat_details.append({'engine': engine, 'type': 'Phishing', 'result': result.get('result', 'Phishing detected')})
-                        elif 'malware' in result_text or 'trojan' in result_text or 'virus' in result_text:
-                            threat_types['malware'] += 1
-                            threat_details.append({'engine': engine, 'type': 'Malware', 'result': result.get('result', 'Malware detected')})
-                        elif 'spam' in result_text:
-                            threat_types['spam'] += 1
-                            threat_details.append({'engine': engine, 'type': 'Spam', 'result': result.get('result', 'Spam detected')})
-                        elif 'scam' in result_text or 'fraud' in result_text:
-                            threat_types['scam'] += 1
-                            threat_details.append({'engine': engine, 'type': 'Scam/Fraud', 'result': result.get('result', 'Scam detected')})
-                        elif category == 'suspicious':
-                            threat_types['suspicious'] += 1
-                            threat_details.append({'engine': engine, 'type': 'Suspicious', 'result': result.get('result', 'Suspicious activity')})
-                        else:
-                            threat_types['other_malicious'] += 1
-                            threat_details.append({'engine': engine, 'type': 'Other Threat', 'result': result.get('result', 'Threat detected')})
-                
-                # Determine primary threat type
-                primary_threat = None
-                if threat_types['phishing'] > 0:
-                    primary_threat = 'phishing'
-                elif threat_types['malware'] > 0:
-                    primary_threat = 'malware'
-                elif threat_types['scam'] > 0:
-                    primary_threat = 'scam'
-                elif threat_types['spam'] > 0:
-                    primary_threat = 'spam'
-                elif threat_types['suspicious'] > 0:
-                    primary_threat = 'suspicious'
-                elif threat_types['other_malicious'] > 0:
-                    primary_threat = 'other'
-                
-                vt_result = {
-                    "safe": vt_safe,
-                    "primary_threat": primary_threat,
-                    "threat_types": threat_types,
-                    "threat_details": threat_details,
-                    "total_threats": sum(threat_types.values()),
-                    "scan_date": attributes.get('last_analysis_date'),
-                    "reputation": attributes.get('reputation', 0),
-                    "url": attributes.get('url', original_url)
-                }
-            else:
-                vt_result = {
-                    "error": f"VirusTotal API error {vt_response.status_code}",
-                    "details": vt_response.text,
-                    "safe": None
-                }
-        except Exception as e:
-            vt_result = {
-                "error": f"Error checking with VirusTotal: {str(e)}",
+        else:
+            return {
+                "error": f"VirusTotal API error {status_code}",
+                "details": vt_response.text if vt_response is not None else "",
                 "safe": None
             }
+    except Exception as e:
+        return {
+            "error": f"Error checking with VirusTotal: {str(e)}",
+            "safe": None
+        }
+    finally:
+        # Runs on a pool thread, whose connection no request cycle closes
+        close_old_connections()
+
+
+async def verify_link(request):
+    result = None
+    form = LinkCheckForm(request.POST or None)
+
+    if request.method == "POST" and form.is_valid():
+        original_url = form.cleaned_data["url"]
 
         # Extract domain from input
         domain = extract_domain(original_url)
 
-        # Match domain against FederalProgram.link field
-        program = FederalProgram.objects.filter(link__icontains=domain).first()
+        # The VirusTotal check can wait on the quota for seconds, so it gets a
+        # thread of its own while the program lookup and Safe Browsing proceed
+        vt_result, threats, program = await asyncio.gather(
+            sync_to_async(check_virustotal, thread_sensitive=False)(original_url),
+            safe_browsing.lookup(original_url),
+            # Match domain against FederalProgram.link field
+            FederalProgram.objects.filter(link__icontains=domain).afirst(),
+        )
 
         result = {
-            "safe_browsing": vt_result,  # Changed from "virustotal" to match template
+            "safe_browsing": safe_browsing.merge(vt_result, threats, original_url),  # Changed from "virustotal" to match template
             "program": program,
         }
 
@@ -163,11 +132,26 @@ def verify_link(request):
         "result": result,
     })
 
+@csrf_exempt
 def report_scam(request):
+    # Stream uploads to disk and hash them as they arrive; this has to be
+    # set before CSRF middleware reads the body, hence the inner view
+    request.upload_handlers = [screenshots.HashingUploadHandler(request)]
+    return _report_scam(request)
+
+
+@csrf_protect
+def _report_scam(request):
     if request.method == 'POST':
         form = ScamReportForm(request.POST, request.FILES)
         if form.is_valid():
-            form.save()
+            # Committed together, so the background worker sees the links
+            with transaction.atomic():
+                report = form.save(commit=False)
+                report.reporter = reputation.reporter_id(request)
+                report.save()
+                form.save_m2m()
+                report.images.add(*{screenshots.store(upload).pk for upload in form.cleaned_data['screenshots']})
             # ✅ Redirect to thank-you page after saving
             return redirect('thank_you')
         else:
@@ -177,54 +161,160 @@ def report_scam(request):
     
     return render(request, 'website/report_scam.html', {'form': form})
 
+@cache_control(max_age=clustering.TRENDING_CACHE_TTL, public=True)
+def api_trending_scams(request):
+    """Scam clusters with the most reports lately (``?hours=24&limit=10``)"""
+    try:
+        hours = min(max(int(request.GET.get("hours", 24)), 1), 24 * 7)
+        limit = min(max(int(request.GET.get("limit", 10)), 1), 50)
+    except ValueError:
+        return JsonResponse({"error": "hours and limit must be integers"}, status=400)
+    return JsonResponse({"hours": hours, "results": clustering.trending(hours=hours, limit=limit)})
+
+
 def thank_you(request):
     return render(request, 'website/thank_you.html')
 
+def _initiatives_etag(request):
+    return program_listing.etag(program_listing.parse_query(request.GET), program_listing.dataset_version())
+
+def _initiatives_last_modified(request):
+    return program_listing.dataset_version().modified
+
+@cache_control(max_age=0, must_revalidate=True)
+@condition(etag_func=_initiatives_etag, last_modified_func=_initiatives_last_modified)
 def initiatives(request):
-    programs = FederalProgram.objects.all().order_by('name')
-    return render(request, "website/initiatives.html", {"programs": programs})
+    query = program_listing.parse_query(request.GET)
+    version = program_listing.dataset_version()
+    facets = program_listing.facets(query, version)
+    return render(request, "website/initiatives.html", {
+        "query": query,
+        "facets": facets,
+        "total": program_listing.total(query, facets),
+        "listing": program_listing.render_listing(query, version),
+    })
 
 def resources(request):
     return render(request, "website/resources.html")
 
 
+def programs_html(programs):
+    """The "related programs" part of a chatbot reply"""
+    if not programs:
+        return "<p class='text-gray-600 text-sm'>ℹ️ No direct matches in the database.</p>"
+    html = "<p class='font-semibold mb-1'>✅ Related programs:</p>"
+    for p in programs:
+        html += format_html(
+            "<div class='mb-2 text-sm'><strong>{}</strong> ({})<br>{}</div>",
+            p.name, p.agency, p.description or "",
+        )
+    return html
+
+
+def sse_event(event, data):
+    """One server-sent event; ``data`` is JSON encoded so it stays on one line"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 @csrf_exempt
-def chatbot(request):
+async def chatbot(request):
     if request.method == "POST":
         user_message = request.POST.get("message", "")
 
         # User bubble
-        user_html = f"""
+        user_html = format_html("""
         <div class="flex justify-end mb-2">
             <div class="bg-green-600 text-white p-3 rounded-2xl max-w-xs shadow text-sm">
-                {user_message}
+                {}
             </div>
         </div>
-        """
+        """, user_message)
 
-        # DB search
-        programs = search_programs_in_db(user_message)
-        db_reply = ""
-        if programs.exists():
-            db_reply += "<p class='font-semibold mb-1'>✅ Related programs:</p>"
-            for p in programs:
-                db_reply += f"<div class='mb-2 text-sm'><strong>{p.name}</strong> ({p.agency})<br>{p.description}</div>"
-        else:
-            db_reply = "<p class='text-gray-600 text-sm'>ℹ️ No direct matches in the database.</p>"
+        if request.POST.get("stream"):
+            # Empty bot bubble; the page fills it from chatbot_stream
+            bot_html = format_html("""
+        <div class="flex justify-start mb-4" data-chat-stream="{}">
+            <div class="bg-gray-200 text-gray-900 p-3 rounded-2xl max-w-xs shadow text-sm">
+                <div data-chat-programs></div>
+                <div class="mt-2 text-gray-800 whitespace-pre-line" data-chat-reply></div>
+            </div>
+        </div>
+        """, f"{reverse('chatbot_stream')}?{urlencode({'message': user_message})}")
+            return HttpResponse(user_html + bot_html)
 
-        # AI reply
-        ai_reply = query_openrouter(user_message)
+        # DB search and AI reply (reused for repeated questions) side by side
+        programs, ai_reply = await asyncio.gather(
+            sync_to_async(search_programs_in_db)(user_message),
+            cached_ai_reply(user_message),
+        )
+        db_reply = programs_html(programs)
 
         # Bot bubble
         bot_html = f"""
         <div class="flex justify-start mb-4">
             <div class="bg-gray-200 text-gray-900 p-3 rounded-2xl max-w-xs shadow text-sm">
                 {db_reply}
-                <div class="mt-2 text-gray-800">{ai_reply}</div>
+                <div class="mt-2 text-gray-800">{escape(ai_reply)}</div>
             </div>
         </div>
         """
 
         return HttpResponse(user_html + bot_html)
 
-    return render(request, "website/chatbot.html")
\ No newline at end of file
+    return render(request, "website/chatbot.html")
+
+
+async def cached_ai_reply(user_message):
+    """The AI reply to ``user_message``, from the chat cache when it was asked before"""
+    answer = chat_cache.get(user_message)
+    if answer is None:
+        answer = await aquery_openrouter(user_message)
+        chat_cache.put(user_message, answer)
+    return answer
+
+
+async def chatbot_stream(request):
+    """
+    Server-sent events for one chatbot question.
+
+    The database matches go out as soon as the lookup finishes ("programs"),
+    then the AI reply follows token by token ("token") until "done". The
+    lookup runs while OpenRouter starts generating.
+    """
+    user_message = request.GET.get("message", "").strip()
+
+    async def events():
+        cached = chat_cache.get(user_message)
+        tokens = asyncio.Queue()
+
+        async def receive():
+            async for token in astream_openrouter(user_message):
+                await tokens.put(token)
+            await tokens.put(None)
+
+        # Start the request to OpenRouter before the database lookup
+        receiver = asyncio.ensure_future(receive()) if cached is None else None
+        try:
+            programs = await sync_to_async(search_programs_in_db)(user_message)
+            yield sse_event("programs", programs_html(programs))
+            if receiver is None:
+                yield sse_event("token", cached)
+            else:
+                reply = []
+                while (token := await tokens.get()) is not None:
+                    reply.append(token)
+                    yield sse_event("token", token)
+                # An error can follow a partial reply; only complete replies are reused
+                if not any(token.startswith("⚠️") for token in reply):
+                    chat_cache.put(user_message, "".join(reply))
+            yield sse_event("done", "")
+        finally:
+            # The client went away before the reply was complete
+            if receiver is not None:
+                receiver.cancel()
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stop proxies from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
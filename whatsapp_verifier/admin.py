@@ -1,6 +1,6 @@
 
 from django.contrib import admin
-from .models import FederalProgram, WhatsAppSession
+from .models import FederalProgram, WhatsAppSession, InboundMessage, URLVerdict, PendingAnalysis, AnalysisSubscriber, TranslationMemo, MessageTemplate, ProgramImport, MessageStatusEvent, DeliveryLatencyRollup
 
 # Register your models here.
 
@@ -14,4 +14,76 @@ class FederalProgramAdmin(admin.ModelAdmin):
 @admin.register(WhatsAppSession)
 class WhatsAppSessionAdmin(admin.ModelAdmin):
     list_display = ('phone_number', 'current_step', 'language', 'created')
-    readonly_fields = ('created', 'modified')
\ No newline at end of file
+    readonly_fields = ('version', 'created', 'modified')
+
+    def save_model(self, request, obj, form, change):
+        # Make the bot's pending writes notice the edit
+        if change:
+            obj.version += 1
+        super().save_model(request, obj, form, change)
+
+@admin.register(InboundMessage)
+class InboundMessageAdmin(admin.ModelAdmin):
+    list_display = ('phone_number', 'status', 'created', 'processed_at')
+    search_fields = ('phone_number', 'message_sid')
+    list_filter = ('status',)
+    readonly_fields = ('created', 'modified')
+
+
+@admin.register(URLVerdict)
+class URLVerdictAdmin(admin.ModelAdmin):
+    list_display = ('url', 'verdict', 'primary_threat', 'scan_date', 'expires_at')
+    search_fields = ('url',)
+    list_filter = ('verdict',)
+    readonly_fields = ('created', 'modified')
+
+
+class AnalysisSubscriberInline(admin.TabularInline):
+    model = AnalysisSubscriber
+    extra = 0
+    readonly_fields = ('phone_number', 'notified_at')
+
+
+@admin.register(PendingAnalysis)
+class PendingAnalysisAdmin(admin.ModelAdmin):
+    list_display = ('url', 'status', 'attempts', 'next_poll_at', 'created')
+    search_fields = ('url', 'analysis_id')
+    list_filter = ('status',)
+    readonly_fields = ('created', 'modified')
+    inlines = [AnalysisSubscriberInline]
+
+
+@admin.register(TranslationMemo)
+class TranslationMemoAdmin(admin.ModelAdmin):
+    list_display = ('source_text', 'language', 'translated_text', 'modified')
+    search_fields = ('source_text', 'translated_text')
+    list_filter = ('language',)
+    readonly_fields = ('source_hash', 'created', 'modified')
+
+
+@admin.register(MessageTemplate)
+class MessageTemplateAdmin(admin.ModelAdmin):
+    list_display = ('key', 'language', 'text', 'modified')
+    search_fields = ('key', 'text')
+    list_filter = ('language',)
+    readonly_fields = ('source_hash', 'created', 'modified')
+
+
+@admin.register(ProgramImport)
+class ProgramImportAdmin(admin.ModelAdmin):
+    list_display = ('source', 'created', 'inserted', 'updated', 'deleted')
+    readonly_fields = ('source', 'sha256', 'inserted', 'updated', 'deleted', 'created', 'modified')
+
+
+@admin.register(MessageStatusEvent)
+class MessageStatusEventAdmin(admin.ModelAdmin):
+    list_display = ('message_sid', 'status', 'phone_number', 'error_code', 'recorded_at')
+    search_fields = ('message_sid', 'phone_number')
+    list_filter = ('status',)
+    readonly_fields = ('message_sid', 'status', 'phone_number', 'error_code', 'inbound_at', 'recorded_at')
+
+
+@admin.register(DeliveryLatencyRollup)
+class DeliveryLatencyRollupAdmin(admin.ModelAdmin):
+    list_display = ('hour', 'sent', 'delivered', 'failed', 'queue_p50', 'delivered_p50', 'delivered_p90', 'delivered_p99')
+    readonly_fields = ('created', 'modified')
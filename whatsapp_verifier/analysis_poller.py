@@ -0,0 +1,205 @@
+"""
+Follow-up for links VirusTotal had never seen.
+
+When a lookup returns 404 the link is submitted and every WhatsApp user
+who asked about it is recorded as a subscriber of one ``PendingAnalysis``
+row per canonical URL. A background thread polls due analyses with
+backoff (at background priority on the quota scheduler), stores the
+verdict when it is ready and pushes the result to each subscriber.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+from . import sessions, virustotal, vt_scheduler
+from .canonical import canonicalize_url, url_hash
+from .models import AnalysisSubscriber, PendingAnalysis, URLVerdict
+from .verdicts import get_cached_verdict, store_analysis_verdict, store_verdict
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait before each poll; the last value repeats until MAX_ATTEMPTS
+BACKOFF = [20, 20, 30, 60, 120, 240]
+MAX_ATTEMPTS = 12
+# How long a worker owns a claimed row before another may poll it
+CLAIM_LEASE = timedelta(minutes=2)
+POLL_LOOP_INTERVAL = 5
+BATCH_SIZE = 20
+
+_poller_thread = None
+_poller_lock = threading.Lock()
+
+
+def _backoff(attempts):
+    return timedelta(seconds=BACKOFF[min(attempts, len(BACKOFF) - 1)])
+
+
+def watch_analysis(url, phone_number, analysis_id=''):
+    """Send ``phone_number`` the verdict for ``url`` once VirusTotal finishes it"""
+    url = canonicalize_url(url)
+    analysis, created = PendingAnalysis.objects.get_or_create(
+        url_hash=url_hash(url),
+        defaults={
+            'url': url,
+            'analysis_id': analysis_id,
+            'next_poll_at': timezone.now() + _backoff(0),
+        },
+    )
+    if not created and analysis.status != PendingAnalysis.STATUS_POLLING:
+        # An earlier analysis of this link finished or expired; start over
+        PendingAnalysis.objects.filter(pk=analysis.pk).update(
+            status=PendingAnalysis.STATUS_POLLING,
+            analysis_id=analysis_id or analysis.analysis_id,
+            attempts=0,
+            next_poll_at=timezone.now() + _backoff(0),
+            modified=timezone.now(),
+        )
+    elif analysis_id and not analysis.analysis_id:
+        PendingAnalysis.objects.filter(pk=analysis.pk).update(analysis_id=analysis_id)
+
+    subscriber, created = AnalysisSubscriber.objects.get_or_create(analysis=analysis, phone_number=phone_number)
+    if not created and subscriber.notified_at is not None:
+        # Notified about an earlier run of this link; wait for this one too
+        AnalysisSubscriber.objects.filter(pk=subscriber.pk).update(notified_at=None)
+
+    start_poller()
+    return analysis
+
+
+def _claim(analysis):
+    """Take a short lease on ``analysis`` so only one worker polls it"""
+    return PendingAnalysis.objects.filter(
+        pk=analysis.pk,
+        status=PendingAnalysis.STATUS_POLLING,
+        next_poll_at=analysis.next_poll_at,
+    ).update(next_poll_at=timezone.now() + CLAIM_LEASE, modified=timezone.now())
+
+
+def _fetch_verdict(analysis):
+    """Ask VirusTotal once; returns the stored URLVerdict or None if not ready"""
+    if analysis.analysis_id:
+        response = virustotal.get_analysis(analysis.analysis_id)
+        if response.status_code == 200:
+            attributes = (response.json().get('data') or {}).get('attributes') or {}
+            if attributes.get('status') == 'completed':
+                return store_analysis_verdict(analysis.url, attributes)
+            return None
+    else:
+        response = virustotal.get_url_report(analysis.url)
+        if response.status_code == 200:
+            attributes = (response.json().get('data') or {}).get('attributes') or {}
+            if attributes.get('last_analysis_stats') and attributes.get('last_analysis_date'):
+                return store_verdict(analysis.url, attributes)
+            return None
+
+    if response.status_code == 429:
+        vt_scheduler.drain()
+    logger.warning("Polling %s returned %s", analysis.url, response.status_code)
+    return None
+
+
+def poll_analysis(analysis):
+    """Poll one claimed analysis and notify its subscribers when done"""
+    def call():
+        verdict = _fetch_verdict(analysis)
+        return verdict, verdict is not None
+
+    def replay(ready):
+        return get_cached_verdict(analysis.url) if ready else None
+
+    try:
+        verdict = vt_scheduler.run(
+            f"analysis:{analysis.url_hash}", call, replay,
+            priority=vt_scheduler.BACKGROUND, timeout=60,
+        )
+    except vt_scheduler.VirusTotalBusy:
+        verdict = None
+    except Exception:
+        logger.exception("Error polling analysis for %s", analysis.url)
+        verdict = None
+
+    # A pending placeholder means VirusTotal has not finished yet
+    if verdict is not None and verdict.verdict != URLVerdict.VERDICT_PENDING:
+        PendingAnalysis.objects.filter(pk=analysis.pk).update(
+            status=PendingAnalysis.STATUS_DONE, modified=timezone.now()
+        )
+        notify_subscribers(analysis, verdict)
+        return True
+
+    attempts = analysis.attempts + 1
+    if attempts >= MAX_ATTEMPTS:
+        PendingAnalysis.objects.filter(pk=analysis.pk).update(
+            status=PendingAnalysis.STATUS_EXPIRED, attempts=attempts, modified=timezone.now()
+        )
+        notify_subscribers(analysis, None)
+        return False
+
+    PendingAnalysis.objects.filter(pk=analysis.pk).update(
+        attempts=attempts,
+        next_poll_at=timezone.now() + _backoff(attempts),
+        modified=timezone.now(),
+    )
+    return False
+
+
+def notify_subscribers(analysis, verdict):
+    """Send the finished verdict (or a give-up notice) to everyone waiting"""
+    from .bot import send_whatsapp_message
+    from .utils import basic_url_safety_check, format_verdict_message
+
+    subscribers = AnalysisSubscriber.objects.filter(analysis=analysis, notified_at__isnull=True)
+    for subscriber in subscribers:
+        # Only users who still have a conversation with the bot get a push
+        if not sessions.exists(subscriber.phone_number):
+            continue
+
+        claimed = AnalysisSubscriber.objects.filter(pk=subscriber.pk, notified_at__isnull=True).update(
+            notified_at=timezone.now()
+        )
+        if not claimed:
+            continue
+
+        if verdict is not None:
+            message = f"🔔 RESULT FOR {analysis.url}\n\n{format_verdict_message(verdict, basic_url_safety_check(analysis.url))}"
+        else:
+            message = f"⌛ VirusTotal is taking too long to analyse {analysis.url}.\n\nPlease try verifying it again later."
+        send_whatsapp_message(subscriber.phone_number, message)
+
+
+def poll_due_analyses(limit=BATCH_SIZE):
+    """Poll every analysis whose next poll time has passed; returns how many"""
+    due = PendingAnalysis.objects.filter(
+        status=PendingAnalysis.STATUS_POLLING, next_poll_at__lte=timezone.now()
+    ).order_by('next_poll_at')[:limit]
+
+    polled = 0
+    for analysis in due:
+        if _claim(analysis):
+            poll_analysis(analysis)
+            polled += 1
+    return polled
+
+
+def _poll_forever():
+    while True:
+        close_old_connections()
+        try:
+            poll_due_analyses()
+        except Exception:
+            logger.exception("Analysis poller iteration failed")
+        finally:
+            close_old_connections()
+        time.sleep(POLL_LOOP_INTERVAL)
+
+
+def start_poller():
+    """Start the background polling thread for this process (idempotent)"""
+    global _poller_thread
+    with _poller_lock:
+        if _poller_thread is None:
+            _poller_thread = threading.Thread(target=_poll_forever, name='vt-analysis-poller', daemon=True)
+            _poller_thread.start()
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class WhatsappVerifierConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'whatsapp_verifier'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        from . import signals
+
+        post_migrate.connect(signals.restore_search_triggers, sender=self, dispatch_uid='restore_search_triggers')
@@ -0,0 +1,298 @@
+"""
+Offline index of known-bad domains and URLs.
+
+Feed files in ``BLOCKLIST_FEED_DIR`` hold one domain or URL per line
+(``#`` starts a comment). Each entry is stored as a 64-bit hash in a
+sorted ``array`` and a Bloom filter sits in front of it, so the common
+case of a link that is not listed is answered without a binary search.
+
+The index is written to ``BLOCKLIST_INDEX_PATH`` by the
+``rebuild_blocklist`` command, which only parses feed files that are new
+since the last build. Running processes pick up a rebuilt index the next
+time they look something up after the file changes.
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from heapq import merge
+
+from django.conf import settings
+
+from .canonical import canonicalize_url, normalize_host
+from .domain_matcher import extract_host
+
+logger = logging.getLogger(__name__)
+
+FEED_DIR = getattr(settings, 'BLOCKLIST_FEED_DIR', os.path.join(settings.BASE_DIR, 'blocklists'))
+INDEX_PATH = getattr(settings, 'BLOCKLIST_INDEX_PATH', os.path.join(settings.BASE_DIR, 'blocklist.idx'))
+FEED_SUFFIXES = ('.txt', '.csv', '.list')
+
+# Bloom filter sizing: ~10 bits and 7 probes per entry give ~1% false positives
+BITS_PER_ENTRY = 10
+BLOOM_HASHES = 7
+MIN_CAPACITY = 1 << 16
+# How often a running process checks whether the index file was rebuilt
+RELOAD_CHECK_INTERVAL = 30
+
+_MAGIC = b'BLKIDX1\n'
+
+# ``matched`` is the listed domain or URL the link was found under
+BlocklistHit = namedtuple('BlocklistHit', ['url', 'matched'])
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _url_key(url):
+    # The scheme is left out so http and https variants of a link match
+    return canonicalize_url(url).split('://', 1)[1]
+
+
+def entry_key(entry):
+    """Index key for a feed entry: ``d:<host>`` for domains, ``u:<url>`` for URLs"""
+    entry = entry.strip()
+    if not entry:
+        return None
+    if '://' in entry or '/' in entry or '?' in entry:
+        try:
+            return 'u:' + _url_key(entry)
+        except ValueError:
+            return None
+    host = normalize_host(entry)
+    if host.startswith('*.'):
+        host = host[2:]
+    return 'd:' + host if '.' in host else None
+
+
+def read_feed(path):
+    """Yield the index keys of one feed file"""
+    with open(path, encoding='utf-8', errors='replace') as feed:
+        for line in feed:
+            entry = line.split('#', 1)[0].split(',', 1)[0].strip()
+            key = entry_key(entry)
+            if key is not None:
+                yield key
+
+
+def feed_files(feed_dir=None):
+    """``{name: (size, mtime)}`` for every feed file in ``feed_dir``"""
+    feed_dir = feed_dir or FEED_DIR
+    if not os.path.isdir(feed_dir):
+        return {}
+    feeds = {}
+    for name in sorted(os.listdir(feed_dir)):
+        path = os.path.join(feed_dir, name)
+        if name.endswith(FEED_SUFFIXES) and os.path.isfile(path):
+            stat = os.stat(path)
+            feeds[name] = (stat.st_size, int(stat.st_mtime))
+    return feeds
+
+
+class BlocklistIndex:
+    """Sorted 64-bit entry hashes with a Bloom filter in front"""
+
+    def __init__(self, hashes=None, bloom=None, bloom_bits=0, feeds=None, url_entries=0):
+        self.hashes = hashes if hashes is not None else array('Q')
+        self.feeds = feeds or {}
+        # Links are only canonicalised for lookup when URL entries exist
+        self.url_entries = url_entries
+        if bloom is None:
+            self._build_bloom(self._capacity_for(len(self.hashes)))
+        else:
+            self.bloom, self.bloom_bits = bloom, bloom_bits
+
+    def __len__(self):
+        return len(self.hashes)
+
+    @staticmethod
+    def _capacity_for(count):
+        return max(MIN_CAPACITY, 2 * count)
+
+    def _set_bits(self, hashes):
+        bloom, bits = self.bloom, self.bloom_bits
+        for h in hashes:
+            h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+            for i in range(BLOOM_HASHES):
+                bit = (h1 + i * h2) % bits
+                bloom[bit >> 3] |= 1 << (bit & 7)
+
+    def _build_bloom(self, capacity):
+        self.bloom_bits = capacity * BITS_PER_ENTRY
+        self.bloom = bytearray(math.ceil(self.bloom_bits / 8))
+        self._set_bits(self.hashes)
+
+    def contains_hash(self, h):
+        # Double hashing: probe i is h1 + i * h2, most misses stop at the first
+        bloom, bits = self.bloom, self.bloom_bits
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        for i in range(BLOOM_HASHES):
+            bit = (h1 + i * h2) % bits
+            if not bloom[bit >> 3] & (1 << (bit & 7)):
+                return False
+        hashes = self.hashes
+        i = bisect_left(hashes, h)
+        return i < len(hashes) and hashes[i] == h
+
+    def __contains__(self, key):
+        return self.contains_hash(_hash(key))
+
+    def add(self, keys):
+        """Merge ``keys`` into the index; returns how many were new"""
+        hashed = {_hash(key): key for key in keys}
+        new = sorted(h for h in hashed if not self.contains_hash(h))
+        if not new:
+            return 0
+        self.url_entries += sum(1 for h in new if hashed[h].startswith('u:'))
+
+        self.hashes = array('Q', merge(self.hashes, new))
+        if len(self.hashes) * BITS_PER_ENTRY > self.bloom_bits:
+            # Over capacity; resize so the false positive rate stays low
+            self._build_bloom(self._capacity_for(len(self.hashes)))
+        else:
+            self._set_bits(new)
+        return len(new)
+
+    def lookup(self, url):
+        """Return a ``BlocklistHit`` when ``url`` or one of its parent domains is listed"""
+        host = extract_host(url or '')
+        if not host:
+            return None
+
+        domain = host
+        while '.' in domain:
+            if self.contains_hash(_hash('d:' + domain)):
+                return BlocklistHit(url, domain)
+            domain = domain[domain.find('.') + 1:]
+
+        if not self.url_entries:
+            return None
+        try:
+            key = _url_key(url)
+        except ValueError:
+            return None
+        if self.contains_hash(_hash('u:' + key)):
+            return BlocklistHit(url, key)
+        return None
+
+    def save(self, path=None):
+        """Write the index atomically to ``path``"""
+        path = path or INDEX_PATH
+        header = json.dumps({
+            'count': len(self.hashes),
+            'bloom_bits': self.bloom_bits,
+            'feeds': self.feeds,
+            'url_entries': self.url_entries,
+        }).encode('utf-8')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_MAGIC)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            self.hashes.tofile(f)
+            f.write(self.bloom)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=None):
+        """Read an index written by ``save``; an empty index if there is none"""
+        path = path or INDEX_PATH
+        if not os.path.exists(path):
+            return cls()
+        with open(path, 'rb') as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{path} is not a blocklist index")
+            (header_len,) = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(header_len))
+            hashes = array('Q')
+            hashes.fromfile(f, header['count'])
+            bloom = bytearray(f.read())
+        return cls(hashes, bloom, header['bloom_bits'], header['feeds'], header.get('url_entries', 0))
+
+
+def rebuild(feed_dir=None, path=None, full=False):
+    """
+    Bring the saved index up to date with the feed directory.
+
+    Only feed files added since the last build are parsed. A full rebuild
+    happens when ``full`` is set or a previously indexed file changed or
+    disappeared, since entries cannot be attributed back to their file.
+    Returns ``(index, parsed_feed_names, full)``.
+    """
+    feed_dir = feed_dir or FEED_DIR
+    current = feed_files(feed_dir)
+    index = BlocklistIndex() if full else BlocklistIndex.load(path)
+
+    changed = [name for name, info in index.feeds.items() if tuple(info) != current.get(name)]
+    if changed:
+        logger.info("Blocklist feeds changed or removed (%s); rebuilding from scratch", ', '.join(changed))
+        index, full = BlocklistIndex(), True
+
+    parsed = [name for name in current if name not in index.feeds]
+    for name in parsed:
+        added = index.add(read_feed(os.path.join(feed_dir, name)))
+        index.feeds[name] = list(current[name])
+        logger.info("Blocklist feed %s: %d new entries", name, added)
+
+    index.save(path)
+    return index, parsed, full
+
+
+_index = None
+_index_mtime = None
+_index_checked = 0.0
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """The process-wide index, reloaded when the file on disk was rebuilt"""
+    global _index, _index_mtime, _index_checked
+    now = time.monotonic()
+    if _index is not None and now - _index_checked < RELOAD_CHECK_INTERVAL:
+        return _index
+
+    with _index_lock:
+        _index_checked = now
+        try:
+            mtime = os.stat(INDEX_PATH).st_mtime
+        except OSError:
+            mtime = None
+        if _index is None or mtime != _index_mtime:
+            try:
+                _index = BlocklistIndex.load(INDEX_PATH)
+            except (OSError, ValueError, KeyError):
+                logger.exception("Could not load blocklist index %s", INDEX_PATH)
+                _index = _index or BlocklistIndex()
+            _index_mtime = mtime
+    return _index
+
+
+def check_url(url):
+    """``BlocklistHit`` if ``url`` is on a local blocklist, otherwise None"""
+    return get_index().lookup(url)
+
+
+def hit_as_result(hit):
+    """Shape a blocklist hit like the ``safe_browsing`` result of the website checker"""
+    return {
+        "safe": False,
+        "primary_threat": "scam",
+        "threat_types": {
+            'phishing': 0, 'malware': 0, 'spam': 0, 'scam': 1, 'suspicious': 0, 'other_malicious': 0,
+        },
+        "threat_details": [
+            {'engine': 'Local blocklist', 'type': 'Scam/Fraud', 'result': f"Listed: {hit.matched}"},
+        ],
+        "total_threats": 1,
+        "scan_date": None,
+        "reputation": None,
+        "url": hit.url,
+    }
@@ -0,0 +1,245 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from . import outbound, sessions
+from .analysis_poller import start_poller
+from .messages import LANGUAGE_NAMES, render
+from .models import InboundMessage
+from .program_matcher import get_matcher
+from .utils import verify_link_virustotal, get_program_info
+from .workers import KeyedWorkerPool
+
+logger = logging.getLogger(__name__)
+
+# Messages stuck in "processing" longer than this are assumed orphaned by a
+# crashed worker and are picked up again.
+STALE_PROCESSING_AFTER = timedelta(minutes=5)
+
+inbound_pool = KeyedWorkerPool(
+    'whatsapp-inbound',
+    size=getattr(settings, 'WHATSAPP_WORKER_THREADS', 4),
+)
+
+
+def send_whatsapp_message(to_number, message):
+    """
+    Queue ``message`` for ``to_number``; the outbound workers deliver it and
+    log the messages Twilio did not take.
+    """
+    outbound.queue_message(to_number, message)
+    return True
+
+
+def get_main_menu_message(language='en'):
+    """Main menu for the bot"""
+    return render('main_menu', language)
+
+
+def enqueue_inbound_message(phone_number):
+    """Schedule processing of the pending messages from ``phone_number``"""
+    if not inbound_pool.started:
+        inbound_pool.start()
+        recover_inbound_messages()
+        start_poller()
+        # Build the program name index before the first lookup needs it
+        get_matcher()
+    inbound_pool.submit(phone_number, process_inbound_messages, phone_number)
+
+
+def recover_inbound_messages():
+    """Requeue messages left behind by a restarted or crashed worker"""
+    stale_before = timezone.now() - STALE_PROCESSING_AFTER
+    InboundMessage.objects.filter(
+        status=InboundMessage.STATUS_PROCESSING, modified__lt=stale_before
+    ).update(status=InboundMessage.STATUS_PENDING, modified=timezone.now())
+
+    phone_numbers = (
+        InboundMessage.objects.filter(status=InboundMessage.STATUS_PENDING)
+        .values_list('phone_number', flat=True)
+        .distinct()
+    )
+    for phone_number in phone_numbers:
+        inbound_pool.submit(phone_number, process_inbound_messages, phone_number)
+
+
+def _claim_next_message(phone_number):
+    """
+    Atomically claim the oldest pending message for ``phone_number``.
+
+    A message is only claimed while no other message from the same number
+    is being processed, so turns stay in order even when several web
+    workers receive messages from the same user.
+    """
+    busy = InboundMessage.objects.filter(
+        phone_number=OuterRef('phone_number'),
+        status=InboundMessage.STATUS_PROCESSING,
+    )
+    while True:
+        message = (
+            InboundMessage.objects.filter(phone_number=phone_number, status=InboundMessage.STATUS_PENDING)
+            .order_by('id')
+            .first()
+        )
+        if message is None:
+            return None
+
+        claimed = (
+            InboundMessage.objects.filter(pk=message.pk, status=InboundMessage.STATUS_PENDING)
+            .exclude(Exists(busy))
+            .update(status=InboundMessage.STATUS_PROCESSING, modified=timezone.now())
+        )
+        if claimed:
+            return message
+        if InboundMessage.objects.filter(phone_number=phone_number, status=InboundMessage.STATUS_PROCESSING).exists():
+            # Another worker owns this conversation and will drain it
+            return None
+
+
+def process_inbound_messages(phone_number):
+    """Run the conversation state machine for every pending message in order"""
+    while True:
+        message = _claim_next_message(phone_number)
+        if message is None:
+            return
+
+        status, error = InboundMessage.STATUS_DONE, ''
+        try:
+            # Replies of one turn go out together, merged where they fit
+            with outbound.hold(message.phone_number, inbound_at=message.created):
+                handle_message(message.phone_number, message.body)
+        except Exception as e:
+            logger.exception("Failed to process inbound message %s", message.pk)
+            status, error = InboundMessage.STATUS_FAILED, str(e)
+
+        InboundMessage.objects.filter(pk=message.pk).update(
+            status=status, error=error, processed_at=timezone.now(), modified=timezone.now()
+        )
+
+
+def handle_message(from_number, message_body):
+    """Advance the conversation for ``from_number`` and send the replies"""
+    message_body = message_body.strip().lower()
+    session = None
+
+    try:
+        session = sessions.load(from_number)
+
+        # Handle language selection
+        if message_body in ['english', 'igbo', 'hausa', 'yoruba', 'en', 'ig', 'ha', 'yo']:
+            lang_map = {'english': 'en', 'igbo': 'ig', 'hausa': 'ha', 'yoruba': 'yo',
+                       'en': 'en', 'ig': 'ig', 'ha': 'ha', 'yo': 'yo'}
+            session.language = lang_map[message_body]
+            session.current_step = 'main_menu'
+            sessions.save(session)
+            send_whatsapp_message(from_number, render('language_set', session.language, language_name=LANGUAGE_NAMES[session.language]))
+            send_whatsapp_message(from_number, get_main_menu_message(session.language))
+            return
+
+        # Handle "menu" command from any state
+        if message_body == 'menu':
+            session.current_step = 'main_menu'
+            sessions.save(session)
+            send_whatsapp_message(from_number, get_main_menu_message(session.language))
+            return
+
+        # Handle main menu options
+        if session.current_step == 'main_menu':
+            if message_body in ['1', 'verify', 'verify link', 'link']:
+                session.current_step = 'awaiting_link'
+                sessions.save(session)
+                send_whatsapp_message(from_number, render('link_prompt', session.language))
+
+            elif message_body in ['2', 'info', 'information', 'program']:
+                session.current_step = 'awaiting_program'
+                sessions.save(session)
+                send_whatsapp_message(from_number, render('program_prompt', session.language))
+
+            elif message_body in ['3', 'language', 'change language']:
+                session.current_step = 'awaiting_language'
+                sessions.save(session)
+                send_whatsapp_message(from_number, render('language_picker', session.language))
+
+            else:
+                # Show main menu for any other message
+                send_whatsapp_message(from_number, get_main_menu_message(session.language))
+
+        # Handle link verification
+        elif session.current_step == 'awaiting_link':
+            # Send immediate acknowledgment
+            send_whatsapp_message(from_number, render('link_analyzing', session.language))
+            # The check can take a while; don't hold the acknowledgment back
+            outbound.flush(from_number)
+
+            # Process the link analysis
+            result = verify_link_virustotal(message_body, phone_number=from_number)
+
+            # Send the result
+            send_whatsapp_message(from_number, result)
+
+            # Offer next steps
+            send_whatsapp_message(from_number, render('link_next_steps', session.language))
+
+            # Stay in link mode for quick follow-up
+            session.current_step = 'awaiting_link_followup'
+            sessions.save(session)
+
+        # Handle link verification follow-up
+        elif session.current_step == 'awaiting_link_followup':
+            if message_body in ['1', 'another', 'verify']:
+                session.current_step = 'awaiting_link'
+                sessions.save(session)
+                send_whatsapp_message(from_number, render('link_prompt_next', session.language))
+            elif message_body in ['2', 'info', 'program']:
+                session.current_step = 'awaiting_program'
+                sessions.save(session)
+                send_whatsapp_message(from_number, render('program_prompt_short', session.language))
+            elif message_body in ['3', 'menu']:
+                session.current_step = 'main_menu'
+                sessions.save(session)
+                send_whatsapp_message(from_number, get_main_menu_message(session.language))
+            else:
+                session.current_step = 'main_menu'
+                sessions.save(session)
+                send_whatsapp_message(from_number, get_main_menu_message(session.language))
+
+        # Handle program information request
+        elif session.current_step == 'awaiting_program':
+            # Send processing message
+            send_whatsapp_message(from_number, render('program_searching', session.language))
+
+            result = get_program_info(message_body, session.language)
+            send_whatsapp_message(from_number, result)
+
+            # Return to main menu
+            session.current_step = 'main_menu'
+            sessions.save(session)
+            send_whatsapp_message(from_number, get_main_menu_message(session.language))
+
+        # Handle language change
+        elif session.current_step == 'awaiting_language':
+            lang_options = {'1': 'en', '2': 'ig', '3': 'ha', '4': 'yo'}
+            if message_body in lang_options:
+                session.language = lang_options[message_body]
+                session.current_step = 'main_menu'
+                sessions.save(session)
+                send_whatsapp_message(from_number, render('language_set', session.language, language_name=LANGUAGE_NAMES[session.language]))
+                send_whatsapp_message(from_number, get_main_menu_message(session.language))
+            else:
+                send_whatsapp_message(from_number, render('invalid_language', session.language))
+                send_whatsapp_message(from_number, render('language_picker', session.language))
+
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        # Reset session on error
+        try:
+            session.current_step = 'main_menu'
+            sessions.save(session)
+            send_whatsapp_message(from_number, render('error_reset', session.language))
+            send_whatsapp_message(from_number, get_main_menu_message(session.language))
+        except:
+            pass
+        raise
@@ -0,0 +1,116 @@
+"""
+Canonical URL handling.
+
+Every link checker (website, WhatsApp bot, caches, VirusTotal client) keys
+URLs through ``canonicalize_url`` so the same link always maps to the same
+cache entry and VirusTotal identifier.
+"""
+import base64
+import hashlib
+from urllib.parse import parse_qsl, quote, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Query parameters that only identify the campaign or click, not the page
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'gbraid', 'wbraid', 'msclkid', 'yclid',
+    'igshid', 'mc_cid', 'mc_eid', '_ga', '_gl', 'ref_src', 'si',
+}
+TRACKING_PREFIXES = ('utm_',)
+
+_PATH_SAFE = "/%:@!$&'()*+,;=-._~"
+
+
+def _is_tracking_param(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def normalize_host(host):
+    """Lowercase ``host``, drop a trailing dot and convert it to IDNA (punycode)"""
+    host = host.strip().rstrip('.').lower()
+    if not host or host.isascii():
+        # ASCII hosts are already in their IDNA form
+        return host
+    try:
+        return host.encode('idna').decode('ascii')
+    except UnicodeError:
+        # Labels the idna codec rejects (e.g. too long) are kept as typed
+        return host
+
+
+def canonicalize_url(url):
+    """
+    Return the canonical form of ``url``.
+
+    - a missing scheme defaults to https, scheme and host are lowercased
+    - internationalised hosts are converted to punycode
+    - credentials, default ports and fragments are dropped
+    - a trailing slash on the path is removed
+    - tracking parameters (utm_*, fbclid, ...) are dropped and the rest sorted
+
+    Raises ``ValueError`` when the input has no usable host.
+    """
+    url = (url or '').strip()
+    if '://' not in url:
+        url = 'https://' + url.lstrip('/')
+
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS:
+        raise ValueError(f"Unsupported URL scheme: {parts.scheme}")
+
+    host = normalize_host(parts.hostname or '')
+    if not host:
+        raise ValueError(f"URL has no host: {url}")
+
+    try:
+        port = parts.port
+    except ValueError:
+        raise ValueError(f"Invalid port in URL: {url}")
+
+    netloc = host
+    if ':' in host:
+        # IPv6 literal
+        netloc = f'[{host}]'
+    if port and port != DEFAULT_PORTS[scheme]:
+        netloc = f'{netloc}:{port}'
+
+    path = quote(parts.path, safe=_PATH_SAFE).rstrip('/')
+
+    query = ''
+    if parts.query:
+        query_pairs = [
+            (name, value)
+            for name, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not _is_tracking_param(name)
+        ]
+        query = urlencode(sorted(query_pairs))
+
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+def canonical_host(url):
+    """Canonical host name of ``url`` (empty string when it cannot be parsed)"""
+    try:
+        return urlsplit(canonicalize_url(url)).hostname or ''
+    except ValueError:
+        return ''
+
+
+def canonical_domain(url):
+    """Canonical host of ``url`` without a leading ``www.``"""
+    host = canonical_host(url)
+    if host.startswith('www.'):
+        host = host[4:]
+    return host
+
+
+def url_hash(url):
+    """SHA-256 hex digest of the canonical URL"""
+    return hashlib.sha256(canonicalize_url(url).encode('utf-8')).hexdigest()
+
+
+def vt_url_id(url):
+    """VirusTotal URL identifier: unpadded url-safe base64 of the canonical URL"""
+    return base64.urlsafe_b64encode(canonicalize_url(url).encode('utf-8')).decode('ascii').rstrip('=')
@@ -0,0 +1,198 @@
+"""
+Delivery tracking for outbound WhatsApp messages.
+
+Every reply Twilio accepts and every status callback it sends afterwards
+(sent, delivered, read, failed, ...) becomes one ``MessageStatusEvent``
+row. Events are appended, never updated: ``record`` buffers them in memory
+and a background thread writes each batch with a single ``bulk_create``,
+so a burst of callbacks costs a handful of inserts rather than a write per
+request.
+
+``rollup`` turns the events of each hour into a ``DeliveryLatencyRollup``:
+how many replies were sent, delivered and failed, and percentiles of the
+time from the user's message to Twilio accepting the reply (our queueing)
+and to the reply being delivered (our queueing plus Twilio's).
+"""
+import atexit
+import logging
+import math
+import threading
+from datetime import timedelta
+
+from django.db import close_old_connections, DatabaseError
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import DeliveryLatencyRollup, MessageStatusEvent
+
+logger = logging.getLogger(__name__)
+
+# Seconds between background writes, and the batch size that triggers one early
+FLUSH_INTERVAL = 1.0
+FLUSH_BATCH_SIZE = 500
+# Events kept in memory while the database is unavailable
+MAX_BUFFERED = 20000
+
+ACCEPTED_STATUSES = {'accepted', 'queued'}
+DELIVERED_STATUSES = {'delivered', 'read'}
+FAILED_STATUSES = {'failed', 'undelivered'}
+
+_buffer = []
+_buffer_lock = threading.Lock()
+_flush_wanted = threading.Event()
+_flusher = None
+
+
+def record(message_sid, status, phone_number='', error_code='', inbound_at=None):
+    """Queue one status event for the next batched write"""
+    event = MessageStatusEvent(
+        message_sid=message_sid,
+        status=(status or '').lower(),
+        phone_number=phone_number or '',
+        error_code=error_code or '',
+        inbound_at=inbound_at,
+        recorded_at=timezone.now(),
+    )
+    with _buffer_lock:
+        if len(_buffer) >= MAX_BUFFERED:
+            logger.warning("Delivery event buffer full; dropping %s %s", message_sid, status)
+            return
+        _buffer.append(event)
+        full = len(_buffer) >= FLUSH_BATCH_SIZE
+    _start_flusher()
+    if full:
+        _flush_wanted.set()
+
+
+def flush():
+    """Write the buffered events; returns how many were written"""
+    global _buffer
+    with _buffer_lock:
+        events, _buffer = _buffer, []
+    if not events:
+        return 0
+    try:
+        MessageStatusEvent.objects.bulk_create(events, batch_size=FLUSH_BATCH_SIZE)
+    except DatabaseError:
+        logger.exception("Could not write %d delivery events; will retry", len(events))
+        with _buffer_lock:
+            _buffer = (events + _buffer)[-MAX_BUFFERED:]
+        return 0
+    return len(events)
+
+
+def _run_flusher():
+    while True:
+        _flush_wanted.wait(FLUSH_INTERVAL)
+        _flush_wanted.clear()
+        close_old_connections()
+        try:
+            flush()
+        finally:
+            close_old_connections()
+
+
+def _start_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
+    with _buffer_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_run_flusher, name='delivery-events', daemon=True)
+            _flusher.start()
+            atexit.register(flush)
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def _outcomes(sids):
+    """``{sid: (first delivered time, failed)}`` for the given message SIDs"""
+    outcomes = {}
+    sids = list(sids)
+    for start in range(0, len(sids), 500):
+        events = (
+            MessageStatusEvent.objects.filter(message_sid__in=sids[start:start + 500])
+            .filter(status__in=DELIVERED_STATUSES | FAILED_STATUSES)
+            .order_by('recorded_at')
+            .values_list('message_sid', 'status', 'recorded_at')
+        )
+        for sid, status, recorded_at in events:
+            delivered_at, failed = outcomes.get(sid, (None, False))
+            if status in DELIVERED_STATUSES and delivered_at is None:
+                delivered_at = recorded_at
+            if status in FAILED_STATUSES:
+                failed = True
+            outcomes[sid] = (delivered_at, failed)
+    return outcomes
+
+
+def _accepted(hour):
+    """
+    ``{sid: (accepted at, inbound_at)}`` for the messages first accepted
+    during ``hour``. A later ``queued`` status callback for the same SID
+    carries no ``inbound_at`` and must not replace the send-time event.
+    """
+    end = hour + timedelta(hours=1)
+    sids = MessageStatusEvent.objects.filter(
+        status__in=ACCEPTED_STATUSES, recorded_at__gte=hour, recorded_at__lt=end,
+    ).values('message_sid')
+    rows = (
+        MessageStatusEvent.objects.filter(status__in=ACCEPTED_STATUSES, message_sid__in=sids)
+        .values('message_sid')
+        .annotate(accepted_at=Min('recorded_at'), inbound_at=Max('inbound_at'))
+        .values_list('message_sid', 'accepted_at', 'inbound_at')
+    )
+    return {
+        sid: (accepted_at, inbound_at)
+        for sid, accepted_at, inbound_at in rows
+        if hour <= accepted_at < end
+    }
+
+
+def rollup_hour(hour):
+    """Compute and store the rollup for the replies accepted during ``hour``; None if there were none"""
+    accepted = _accepted(hour)
+    if not accepted:
+        return None
+    outcomes = _outcomes(accepted)
+
+    queue_latency = []
+    delivered_latency = []
+    delivered = failed = 0
+    for sid, (accepted_at, inbound_at) in accepted.items():
+        delivered_at, has_failed = outcomes.get(sid, (None, False))
+        delivered += delivered_at is not None
+        failed += has_failed and delivered_at is None
+        if inbound_at is None:
+            # Pushes not answering a message (e.g. analysis results) have no latency
+            continue
+        queue_latency.append((accepted_at - inbound_at).total_seconds())
+        if delivered_at is not None:
+            delivered_latency.append((delivered_at - inbound_at).total_seconds())
+
+    queue_latency.sort()
+    delivered_latency.sort()
+    values = {
+        'sent': len(accepted),
+        'delivered': delivered,
+        'failed': failed,
+        'queue_p50': percentile(queue_latency, 0.5),
+        'queue_p90': percentile(queue_latency, 0.9),
+        'delivered_p50': percentile(delivered_latency, 0.5),
+        'delivered_p90': percentile(delivered_latency, 0.9),
+        'delivered_p99': percentile(delivered_latency, 0.99),
+    }
+    hour_rollup, _ = DeliveryLatencyRollup.objects.update_or_create(hour=hour, defaults=values)
+    return hour_rollup
+
+
+def rollup(hours=24):
+    """Recompute the rollups of the last ``hours`` hours, current hour included"""
+    current = timezone.now().replace(minute=0, second=0, microsecond=0)
+    rollups = (rollup_hour(current - timedelta(hours=offset)) for offset in reversed(range(hours)))
+    return [hour_rollup for hour_rollup in rollups if hour_rollup is not None]
@@ -0,0 +1,119 @@
+"""
+Offline classification of links by domain and URL shape.
+
+The allow lists are compiled once at import time into a hashed set of
+domain suffixes, so a host matches a listed domain only on a label
+boundary: ``portal.cbn.gov.ng`` matches ``gov.ng`` but
+``evilgov.ng.attacker.com`` and ``notgoogle.com`` do not. Keyword and
+domain-shape heuristics are each a single precompiled regex.
+
+Only the host is extracted from each link (no full canonicalisation), so
+a check costs a few microseconds.
+"""
+import re
+from collections import namedtuple
+
+from .canonical import DEFAULT_PORTS, normalize_host
+
+# Known safe Nigerian government domains
+SAFE_NG_DOMAINS = (
+    'gov.ng', 'n-sip.gov.ng', 'statehouse.gov.ng', 'cbn.gov.ng',
+    'ncdc.gov.ng', 'nphcda.gov.ng', 'nysc.gov.ng', 'nddc.gov.ng',
+    'tetfund.gov.ng', 'boi.ng', 'rea.gov.ng', 'npc.gov.ng',
+)
+
+# Generally safe global domains
+SAFE_GLOBAL_DOMAINS = (
+    'google.com', 'github.com', 'wikipedia.org', 'microsoft.com',
+    'apple.com', 'facebook.com', 'instagram.com', 'twitter.com',
+    'youtube.com', 'whatsapp.com', 'linkedin.com',
+)
+
+# Words commonly used in phishing links, in reporting order
+SUSPICIOUS_KEYWORDS = (
+    'login', 'password', 'bank', 'verify', 'secure', 'account', 'pay', 'update', 'confirm',
+)
+
+GOVERNMENT = 'government'
+KNOWN = 'known'
+SUSPICIOUS_KEYWORDS_FOUND = 'suspicious_keywords'
+SUSPICIOUS_DOMAIN = 'suspicious_domain'
+UNKNOWN = 'unknown'
+INVALID = 'invalid'
+
+# ``keywords`` is only filled for SUSPICIOUS_KEYWORDS_FOUND
+Classification = namedtuple('Classification', ['category', 'url', 'domain', 'keywords'])
+
+_SUFFIX_CATEGORIES = {domain: KNOWN for domain in SAFE_GLOBAL_DOMAINS}
+_SUFFIX_CATEGORIES.update({domain: GOVERNMENT for domain in SAFE_NG_DOMAINS})
+
+_KEYWORD_RE = re.compile('|'.join(map(re.escape, SUSPICIOUS_KEYWORDS)))
+
+_SUSPICIOUS_DOMAIN_RE = re.compile(r'xn--|\.\.|--')
+
+_NETLOC_END_RE = re.compile(r'[/?#\\]')
+
+
+def match_domain(host):
+    """Category of the longest listed suffix of ``host``, or None"""
+    while True:
+        category = _SUFFIX_CATEGORIES.get(host)
+        if category is not None:
+            return category
+        dot = host.find('.')
+        if dot < 0:
+            return None
+        host = host[dot + 1:]
+
+
+def find_keywords(url):
+    """Suspicious keywords contained in ``url`` (lowercased), in list order"""
+    # One regex pass rules out the common case of no keyword at all
+    if _KEYWORD_RE.search(url) is None:
+        return []
+    return [keyword for keyword in SUSPICIOUS_KEYWORDS if keyword in url]
+
+
+def extract_host(url):
+    """
+    Normalised host of ``url`` as ``canonicalize_url`` would produce it.
+
+    Returns an empty string for unsupported schemes or a missing host.
+    """
+    url = url.strip()
+    scheme, sep, rest = url.partition('://')
+    if not sep:
+        scheme, rest = 'https', url.lstrip('/')
+    if scheme.lower() not in DEFAULT_PORTS:
+        return ''
+
+    netloc = _NETLOC_END_RE.split(rest, 1)[0].rpartition('@')[2]
+    if netloc.startswith('['):
+        # IPv6 literal
+        return netloc[1:netloc.find(']')].lower() if ']' in netloc else ''
+    return normalize_host(netloc.partition(':')[0])
+
+
+def classify_url(url):
+    """Classify one link without any network call"""
+    domain = extract_host(url or '')
+    if not domain:
+        return Classification(INVALID, url, '', [])
+
+    category = match_domain(domain)
+    if category is not None:
+        return Classification(category, url, domain, [])
+
+    keywords = find_keywords(url.lower())
+    if keywords:
+        return Classification(SUSPICIOUS_KEYWORDS_FOUND, url, domain, keywords)
+
+    if _SUSPICIOUS_DOMAIN_RE.search(domain):
+        return Classification(SUSPICIOUS_DOMAIN, url, domain, [])
+
+    return Classification(UNKNOWN, url, domain, [])
+
+
+def classify_urls(urls):
+    """Classify a batch of links; returns one ``Classification`` per input"""
+    return [classify_url(url) for url in urls]
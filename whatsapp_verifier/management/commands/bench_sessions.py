@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from whatsapp_verifier import sessions
+from whatsapp_verifier.models import WhatsAppSession
+
+# Steps a typical conversation moves through, one per inbound message
+CONVERSATION = [
+    'main_menu', 'awaiting_program', 'main_menu', 'main_menu', 'awaiting_link',
+    'awaiting_link_followup', 'awaiting_link', 'awaiting_link_followup', 'main_menu',
+    'awaiting_language', 'main_menu', 'main_menu',
+]
+
+
+def legacy_turn(phone_number, step):
+    """Session handling of ``handle_message`` before the session store"""
+    session, created = WhatsAppSession.objects.get_or_create(phone_number=phone_number)
+    session.current_step = step
+    session.save()
+
+
+def store_turn(phone_number, step):
+    session = sessions.load(phone_number)
+    session.current_step = step
+    sessions.save(session)
+
+
+class Command(BaseCommand):
+    help = 'Compare database queries per WhatsApp turn with and without the session store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--turns', type=int, default=1200)
+        parser.add_argument('--phone', default='+0000000000', help='Throwaway number used for the run')
+
+    def handle(self, *args, **options):
+        phone_number = options['phone']
+        for label, turn in (('get_or_create + save()', legacy_turn), ('session store', store_turn)):
+            WhatsAppSession.objects.filter(phone_number=phone_number).delete()
+            queries = 0
+            started = time.perf_counter()
+            for i in range(options['turns']):
+                with CaptureQueriesContext(connection) as captured:
+                    turn(phone_number, CONVERSATION[i % len(CONVERSATION)])
+                queries += len(captured)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{label:<24} {queries / options['turns']:5.2f} queries/turn  "
+                f"{elapsed / options['turns'] * 1000:6.3f} ms/turn"
+            )
+
+        WhatsAppSession.objects.filter(phone_number=phone_number).delete()
@@ -0,0 +1,79 @@
+import random
+import time
+from urllib.parse import urlparse
+
+from django.core.management.base import BaseCommand
+
+from whatsapp_verifier import domain_matcher
+
+
+def legacy_classify(url):
+    """The substring-scan checks ``basic_url_safety_check`` used before ``domain_matcher``"""
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    domain = urlparse(url).netloc.lower()
+
+    safe_ng_domains = list(domain_matcher.SAFE_NG_DOMAINS)
+    safe_global_domains = list(domain_matcher.SAFE_GLOBAL_DOMAINS)
+    if any(safe_domain in domain for safe_domain in safe_ng_domains):
+        return domain_matcher.GOVERNMENT
+    if any(safe_domain in domain for safe_domain in safe_global_domains):
+        return domain_matcher.KNOWN
+
+    suspicious_keywords = list(domain_matcher.SUSPICIOUS_KEYWORDS)
+    if [kw for kw in suspicious_keywords if kw in url.lower()]:
+        return domain_matcher.SUSPICIOUS_KEYWORDS_FOUND
+    if any(char in domain for char in ['xn--', '..', '--']):
+        return domain_matcher.SUSPICIOUS_DOMAIN
+    return domain_matcher.UNKNOWN
+
+
+def sample_urls(count, seed):
+    """A mix of listed, look-alike, phishing-style and random links"""
+    rng = random.Random(seed)
+    listed = domain_matcher.SAFE_NG_DOMAINS + domain_matcher.SAFE_GLOBAL_DOMAINS
+    words = ['portal', 'grant', 'npower', 'loan', 'news', 'shop', 'cash', 'relief', 'apply', 'info']
+    tlds = ['com', 'ng', 'com.ng', 'org', 'net', 'xyz', 'top']
+    paths = ['', '/', '/apply', '/login', '/account/verify', '/news/2024/grant', '/pay?ref=123']
+
+    urls = []
+    for _ in range(count):
+        kind = rng.random()
+        domain = rng.choice(listed)
+        if kind < 0.2:
+            host = domain
+        elif kind < 0.35:
+            host = f"{rng.choice(words)}.{domain}"
+        elif kind < 0.5:
+            # Look-alikes the old substring scan accepted
+            host = rng.choice([f"not{domain}", f"{domain}.{rng.choice(words)}.{rng.choice(tlds)}"])
+        else:
+            host = f"{rng.choice(words)}-{rng.choice(words)}{rng.randint(1, 999)}.{rng.choice(tlds)}"
+        urls.append(f"{rng.choice(['https://', 'http://', ''])}{host}{rng.choice(paths)}")
+    return urls
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the offline URL safety check against the previous substring implementation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        urls = sample_urls(options['count'], options['seed'])
+
+        start = time.perf_counter()
+        legacy = [legacy_classify(url) for url in urls]
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        compiled = domain_matcher.classify_urls(urls)
+        compiled_time = time.perf_counter() - start
+
+        changed = sum(1 for old, new in zip(legacy, compiled) if old != new.category)
+        per_url = 1e6 / len(urls)
+        self.stdout.write(f"URLs:     {len(urls)}")
+        self.stdout.write(f"legacy:   {legacy_time:.3f}s ({legacy_time * per_url:.2f} µs/URL)")
+        self.stdout.write(f"compiled: {compiled_time:.3f}s ({compiled_time * per_url:.2f} µs/URL)")
+        self.stdout.write(f"different categories: {changed} (look-alike domains no longer trusted)")
@@ -0,0 +1,92 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter so nothing is already imported
+CHILD = """
+import json, os, sys, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', %(settings)r)
+import django
+django.setup()
+setup = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls = time.perf_counter()
+from django.test import Client
+status = Client().get(%(path)r).status_code
+done = time.perf_counter()
+print(json.dumps({
+    'setup_ms': (setup - started) * 1000,
+    'urls_ms': (urls - setup) * 1000,
+    'first_request_ms': (done - started) * 1000,
+    'status': status,
+}))
+"""
+
+
+def parse_importtime(stderr):
+    """Self import time in ms per top-level package, from ``-X importtime`` output"""
+    totals = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, _, name = line[len('import time:'):].split('|')
+            totals[name.strip().split('.')[0]] += int(self_us) / 1000
+        except ValueError:
+            continue
+    return totals
+
+
+class Command(BaseCommand):
+    help = 'Measure import time per package and time to first request in a fresh process'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/', help='URL requested as the first request')
+        parser.add_argument('--top', type=int, default=15, help='Packages to list')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+        parser.add_argument(
+            '--max-first-request-ms', type=float,
+            help='Fail when the first request takes longer than this (for CI)',
+        )
+
+    def handle(self, *args, **options):
+        code = CHILD % {'settings': os.environ.get('DJANGO_SETTINGS_MODULE', 'scmprv.settings'), 'path': options['path']}
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            capture_output=True, text=True, cwd=settings.BASE_DIR,
+        )
+        if result.returncode != 0:
+            raise CommandError(f'Boot failed:\n{result.stderr[-2000:]}')
+
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        imports = parse_importtime(result.stderr)
+        apps = {app.split('.')[0] for app in settings.INSTALLED_APPS if not app.startswith('django.')}
+        ranked = sorted(imports.items(), key=lambda item: item[1], reverse=True)
+
+        if options['json']:
+            self.stdout.write(json.dumps({**timings, 'imports_ms': dict(ranked)}, indent=2))
+        else:
+            self.stdout.write(f"django.setup():      {timings['setup_ms']:8.1f} ms")
+            self.stdout.write(f"URLconf and views:   {timings['urls_ms']:8.1f} ms")
+            self.stdout.write(
+                f"First request:       {timings['first_request_ms']:8.1f} ms "
+                f"(GET {options['path']} -> {timings['status']})"
+            )
+            self.stdout.write(f"Imports:             {sum(imports.values()):8.1f} ms\n")
+            for name, ms in ranked[:options['top']]:
+                marker = '*' if name in apps else ' '
+                self.stdout.write(f"  {marker} {name:<28} {ms:8.1f} ms")
+            self.stdout.write("  (* installed app)")
+
+        limit = options['max_first_request_ms']
+        if limit is not None and timings['first_request_ms'] > limit:
+            raise CommandError(
+                f"First request took {timings['first_request_ms']:.0f} ms, over the {limit:.0f} ms budget"
+            )
@@ -0,0 +1,122 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+
+from whatsapp_verifier import messages
+from whatsapp_verifier.models import MessageTemplate
+from whatsapp_verifier.translation import TranslationUnavailable, translate_many
+
+LETTER_RE = re.compile(r'[^\W\d_]')
+# Stand-in for a placeholder while its line is machine translated
+TOKEN = '[{}]'
+TOKEN_RE = re.compile(r'\[(\d+)\]')
+
+
+def protect(line):
+    """Replace the placeholders of ``line`` by numbered tokens; returns (text, names)"""
+    names = messages.PLACEHOLDER_RE.findall(line)
+    parts = messages.PLACEHOLDER_RE.split(line)
+    text = ''.join(TOKEN.format(i // 2) if i % 2 else part for i, part in enumerate(parts))
+    return text, names
+
+
+def restore(translated, names):
+    """Put the placeholders back, or None if the translation lost or duplicated a token"""
+    found = TOKEN_RE.findall(translated)
+    if sorted(found) != [str(i) for i in range(len(names))]:
+        return None
+    return TOKEN_RE.sub(lambda match: names[int(match.group(1))], translated)
+
+
+def translate_lines(lines, language):
+    """
+    Translate template lines, keeping placeholders and surrounding whitespace.
+
+    Lines whose placeholder tokens do not survive translation are translated
+    again piece by piece around the placeholders.
+    """
+    jobs = []
+    for line in lines:
+        core = line.strip()
+        if LETTER_RE.search(messages.PLACEHOLDER_RE.sub('', core)):
+            lead = line[:len(line) - len(line.lstrip())]
+            trail = line[len(line.rstrip()):]
+            jobs.append((lead, core, trail))
+        else:
+            jobs.append(None)
+
+    protected = [protect(job[1]) for job in jobs if job is not None]
+    results = iter(translate_many([text for text, _ in protected], language, strict=True))
+    output, retry = [], []
+    for line, job in zip(lines, jobs):
+        if job is None:
+            output.append(line)
+            continue
+        lead, core, trail = job
+        text, names = protect(core)
+        restored = restore(next(results), names)
+        if restored is None:
+            retry.append((len(output), lead, core, trail))
+        output.append(lead + (restored or '') + trail)
+
+    if retry:
+        pieces = [
+            [piece for piece in messages.PLACEHOLDER_RE.split(core)]
+            for _, _, core, _ in retry
+        ]
+        texts = [piece for parts in pieces for piece in parts[::2] if LETTER_RE.search(piece)]
+        translated = iter(translate_many([text.strip() for text in texts], language, strict=True))
+        for (index, lead, _, trail), parts in zip(retry, pieces):
+            rebuilt = []
+            for i, piece in enumerate(parts):
+                if i % 2 == 0 and LETTER_RE.search(piece):
+                    head = piece[:len(piece) - len(piece.lstrip())]
+                    tail = piece[len(piece.rstrip()):]
+                    rebuilt.append(head + next(translated) + tail)
+                else:
+                    rebuilt.append(piece)
+            output[index] = lead + ''.join(rebuilt) + trail
+    return output
+
+
+class Command(BaseCommand):
+    help = 'Translate the WhatsApp bot message templates into every supported language'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--language', action='append', choices=messages.LANGUAGES[1:],
+                            help='Only build this language (repeatable)')
+        parser.add_argument('--force', action='store_true', help='Re-translate templates that are up to date')
+
+    def handle(self, *args, **options):
+        languages = options['language'] or messages.LANGUAGES[1:]
+        existing = {
+            (key, language): digest
+            for key, language, digest in MessageTemplate.objects.values_list('key', 'language', 'source_hash')
+        }
+
+        for language in languages:
+            keys = [
+                key for key in messages.TEMPLATES
+                if options['force'] or existing.get((key, language)) != messages.source_hash(key)
+            ]
+            if not keys:
+                self.stdout.write(f"{language}: up to date")
+                continue
+
+            lines = {key: messages.TEMPLATES[key].split('\n') for key in keys}
+            try:
+                translated = iter(translate_lines([line for key in keys for line in lines[key]], language))
+            except TranslationUnavailable as e:
+                raise CommandError(f"{language}: {e}")
+
+            for key in keys:
+                text = '\n'.join(next(translated) for _ in lines[key])
+                MessageTemplate.objects.update_or_create(
+                    key=key, language=language,
+                    defaults={'text': text, 'source_hash': messages.source_hash(key)},
+                )
+            self.stdout.write(self.style.SUCCESS(f"{language}: {len(keys)} template(s) translated"))
+
+        removed, _ = MessageTemplate.objects.exclude(key__in=list(messages.TEMPLATES)).delete()
+        if removed:
+            self.stdout.write(f"Removed {removed} template(s) no longer in the catalog")
@@ -1,31 +1,169 @@
-from django.core.management.base import BaseCommand
-from whatsapp_verifier.models import FederalProgram
-import pandas as pd
+import csv
+import hashlib
 import os
 
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from whatsapp_verifier.models import FederalProgram, ProgramImport
+from whatsapp_verifier.search import optimize_index
+from whatsapp_verifier.signals import programs_changed
+
+COLUMNS = ('name', 'sector', 'level', 'agency', 'link', 'description')
+REQUIRED_COLUMNS = ('name', 'sector', 'level', 'agency', 'link')
+
+
+def read_rows(path):
+    """Yield ``(header, values)`` rows of an .xlsx or .csv file, one at a time"""
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            for values in reader:
+                yield header, values
+        return
+
+    from openpyxl import load_workbook
+
+    # Read-only mode streams the sheet instead of loading it whole
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, ())
+        for values in rows:
+            yield header, values
+    finally:
+        workbook.close()
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def clean(value):
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
 class Command(BaseCommand):
     help = 'Import federal programs from Excel file'
-    
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file', default='nigeria_federal_programs_comprehensive.xlsx',
+            help='Spreadsheet (.xlsx) or CSV file with one program per row',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Import even if the file is unchanged since the last import',
+        )
+
     def handle(self, *args, **options):
-        excel_path = 'nigeria_federal_programs_comprehensive.xlsx'
-        
+        path = options['file']
+        if not os.path.exists(path):
+            self.stdout.write(self.style.ERROR(f'Error importing programs: {path} not found'))
+            return
+
+        sha256 = file_sha256(path)
+        source = os.path.basename(path)
+        if not options['force'] and self.unchanged(source, sha256):
+            self.stdout.write(f'{source} is unchanged since the last import; skipping')
+            return
+
         try:
-            df = pd.read_excel(excel_path)
-            FederalProgram.objects.all().delete()
-            
-            for index, row in df.iterrows():
-                FederalProgram.objects.create(
-                    name=row['name'],
-                    sector=row['sector'],
-                    level=row['level'],
-                    agency=row['agency'],
-                    link=row['link']
+            with transaction.atomic():
+                inserted, updated, deleted = self.import_file(path, options['batch_size'])
+                ProgramImport.objects.create(
+                    source=source, sha256=sha256, inserted=inserted, updated=updated, deleted=deleted,
                 )
-            
-            self.stdout.write(
-                self.style.SUCCESS(f'Successfully imported {len(df)} federal programs')
-            )
         except Exception as e:
             self.stdout.write(
                 self.style.ERROR(f'Error importing programs: {e}')
-            )
\ No newline at end of file
+            )
+            return
+
+        # The search index follows the table through triggers; compact it
+        optimize_index()
+        programs_changed.send(sender=FederalProgram)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully imported federal programs: '
+                f'{inserted} inserted, {updated} updated, {deleted} deleted'
+            )
+        )
+
+    def unchanged(self, source, sha256):
+        """Whether the last import of ``source`` had this content and its programs are still there"""
+        last = ProgramImport.objects.filter(source=source).first()
+        return last is not None and last.sha256 == sha256 and FederalProgram.objects.exists()
+
+    def import_file(self, path, batch_size):
+        """
+        Upsert every row by program name, then delete programs the file no
+        longer lists. Rows are read and written in batches, so memory stays
+        flat however long the file is.
+        """
+        started = timezone.now()
+        inserted = updated = 0
+        columns = None
+        batch = {}
+
+        with transaction.atomic():
+            for header, values in read_rows(path):
+                if columns is None:
+                    columns = self.map_columns(header)
+                row = {field: clean(values[i]) if i < len(values) else '' for field, i in columns.items()}
+                if not row['name']:
+                    continue
+                # A name repeated in the file keeps its last row
+                batch[row['name']] = row
+                if len(batch) >= batch_size:
+                    added, changed = self.write_batch(batch, columns, started)
+                    inserted, updated = inserted + added, updated + changed
+                    batch = {}
+
+            if batch:
+                added, changed = self.write_batch(batch, columns, started)
+                inserted, updated = inserted + added, updated + changed
+
+            if columns is None:
+                raise ValueError(f'{path} has no rows')
+
+            # Rows this run did not touch are gone from the file
+            deleted, _ = FederalProgram.objects.filter(
+                Q(last_imported__isnull=True) | ~Q(last_imported=started)
+            ).delete()
+
+        return inserted, updated, deleted
+
+    def map_columns(self, header):
+        positions = {clean(name).lower(): i for i, name in enumerate(header) if name is not None}
+        missing = [name for name in REQUIRED_COLUMNS if name not in positions]
+        if missing:
+            raise ValueError(f"missing column(s): {', '.join(missing)}")
+        return {name: positions[name] for name in COLUMNS if name in positions}
+
+    def write_batch(self, batch, columns, started):
+        """Upsert one batch; returns ``(inserted, updated)``"""
+        existing = FederalProgram.objects.filter(name__in=list(batch)).count()
+        programs = [
+            FederalProgram(last_imported=started, created=started, modified=started, **row)
+            for row in batch.values()
+        ]
+        update_fields = [name for name in columns if name != 'name'] + ['last_imported', 'modified']
+        FederalProgram.objects.bulk_create(
+            programs,
+            update_conflicts=True,
+            unique_fields=['name'],
+            update_fields=update_fields,
+        )
+        return len(programs) - existing, existing
@@ -0,0 +1,178 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from whatsapp_verifier.delivery import percentile
+
+# How each server is started; {port} and {workers} are filled in
+SERVERS = {
+    'wsgi': ['gunicorn', 'scmprv.wsgi', '--bind', '127.0.0.1:{port}', '--workers', '{workers}'],
+    'asgi': [
+        'gunicorn', 'scmprv.asgi:application', '-k', 'uvicorn_worker.UvicornWorker',
+        '--bind', '127.0.0.1:{port}', '--workers', '{workers}',
+    ],
+}
+STARTUP_TIMEOUT = 30
+
+
+def start_openrouter_stub(port, latency):
+    """A chat completions endpoint that answers every request after ``latency`` seconds"""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            time.sleep(latency)
+            data = json.dumps({'choices': [{'message': {'content': 'Stub reply.'}}]}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def wait_for_port(port, process):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f"Server exited with status {process.returncode}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f"Server did not listen on port {port} within {STARTUP_TIMEOUT}s")
+
+
+async def run_load(url, method, form, requests, concurrency):
+    """Send ``requests`` requests with ``concurrency`` in flight; latencies in seconds and error count"""
+    latencies = []
+    errors = 0
+    counter = iter(range(requests))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        async def user():
+            nonlocal errors
+            for n in counter:
+                data = {key: value.replace('{n}', str(n)) for key, value in form.items()} or None
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, url, data=data)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return sorted(latencies), errors, elapsed
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test a view under the gunicorn sync (WSGI) and uvicorn (ASGI) setups and compare '
+        'throughput and latency. OpenRouter is replaced by a local stub with fixed latency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/chatbot/', help='Path to request')
+        parser.add_argument('--method', default='POST')
+        parser.add_argument(
+            '--data', action='append', default=[], metavar='KEY=VALUE',
+            help='Form field to send; {n} is replaced by the request number (default: a unique chatbot question)',
+        )
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--servers', nargs='+', choices=sorted(SERVERS), default=['wsgi', 'asgi'])
+        parser.add_argument('--workers', type=int, default=1, help='Server worker processes')
+        parser.add_argument('--port', type=int, default=8801)
+        parser.add_argument('--stub-port', type=int, default=8802)
+        parser.add_argument('--stub-latency', type=float, default=0.5, help='Seconds the OpenRouter stub takes')
+        parser.add_argument('--url', help='Test an already running server at this base URL instead')
+
+    def handle(self, *args, **options):
+        form = dict(item.split('=', 1) for item in options['data'])
+        if not form and options['path'] == '/chatbot/':
+            # Unique questions, so the answer cache does not hide the upstream call
+            form = {'message': 'how do I apply for npower batch {n}'}
+
+        if options['url']:
+            self.report(options['url'], self.load(options['url'].rstrip('/') + options['path'], form, options))
+            return
+
+        stub = start_openrouter_stub(options['stub_port'], options['stub_latency'])
+        env = dict(
+            os.environ,
+            OPENROUTER_URL=f"http://127.0.0.1:{options['stub_port']}/api/v1/chat/completions",
+            OPENROUTER_API_KEY=os.environ.get('OPENROUTER_API_KEY') or 'load-test',
+        )
+        results = {}
+        try:
+            for name in options['servers']:
+                command = [
+                    part.format(port=options['port'], workers=options['workers']) for part in SERVERS[name]
+                ]
+                process = subprocess.Popen(
+                    command, cwd=settings.BASE_DIR, env=env,
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                )
+                try:
+                    wait_for_port(options['port'], process)
+                    base_url = f"http://127.0.0.1:{options['port']}"
+                    results[name] = self.load(base_url + options['path'], form, options)
+                finally:
+                    process.terminate()
+                    process.wait(timeout=STARTUP_TIMEOUT)
+                self.report(name, results[name])
+        finally:
+            stub.shutdown()
+
+        if len(results) > 1:
+            baseline = results[options['servers'][0]]
+            for name in options['servers'][1:]:
+                self.stdout.write(
+                    f"{name} vs {options['servers'][0]}: "
+                    f"{results[name]['rps'] / baseline['rps']:.1f}x throughput, "
+                    f"p90 {results[name]['p90']:.0f} ms vs {baseline['p90']:.0f} ms"
+                )
+
+    def load(self, url, form, options):
+        self.stdout.write(
+            f"{options['method']} {url}: {options['requests']} requests, {options['concurrency']} concurrent"
+        )
+        latencies, errors, elapsed = asyncio.run(
+            run_load(url, options['method'], form, options['requests'], options['concurrency'])
+        )
+        return {
+            'rps': len(latencies) / elapsed,
+            'errors': errors,
+            'p50': percentile(latencies, 0.5) * 1000,
+            'p90': percentile(latencies, 0.9) * 1000,
+            'p99': percentile(latencies, 0.99) * 1000,
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"  {name}: {result['rps']:.1f} req/s, p50 {result['p50']:.0f} ms, "
+            f"p90 {result['p90']:.0f} ms, p99 {result['p99']:.0f} ms, {result['errors']} errors"
+        )
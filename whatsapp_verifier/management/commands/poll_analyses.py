@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from whatsapp_verifier.analysis_poller import POLL_LOOP_INTERVAL, poll_due_analyses
+
+
+class Command(BaseCommand):
+    help = 'Poll pending VirusTotal analyses and notify waiting WhatsApp users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Poll the due analyses once and exit')
+
+    def handle(self, *args, **options):
+        while True:
+            polled = poll_due_analyses()
+            if options['once']:
+                self.stdout.write(self.style.SUCCESS(f'Polled {polled} pending analyses'))
+                return
+            time.sleep(POLL_LOOP_INTERVAL)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from whatsapp_verifier import blocklist
+
+
+class Command(BaseCommand):
+    help = 'Add new blocklist feed files to the offline known-bad link index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--feed-dir', default=None, help=f'Feed directory (default: {blocklist.FEED_DIR})')
+        parser.add_argument('--full', action='store_true', help='Re-read every feed instead of only new ones')
+
+    def handle(self, *args, **options):
+        index, parsed, full = blocklist.rebuild(options['feed_dir'], full=options['full'])
+        mode = 'Rebuilt' if full else 'Updated'
+        self.stdout.write(self.style.SUCCESS(
+            f"{mode} blocklist index: {len(parsed)} feed(s) read, {len(index)} entries total"
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from whatsapp_verifier.delivery import flush, rollup
+
+
+def seconds(value):
+    return '-' if value is None else f'{value:.1f}s'
+
+
+class Command(BaseCommand):
+    help = 'Roll up WhatsApp delivery events into hourly counts and latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Hours to (re)compute, current hour included')
+
+    def handle(self, *args, **options):
+        flush()
+        rollups = rollup(options['hours'])
+        if not rollups:
+            self.stdout.write('No replies sent in that window')
+            return
+
+        self.stdout.write(f"{'hour':<17} {'sent':>6} {'deliv':>6} {'fail':>5} {'queue p50':>10} {'deliv p50':>10} {'p90':>8} {'p99':>8}")
+        for row in rollups:
+            self.stdout.write(
+                f"{row.hour:%Y-%m-%d %H:00} {row.sent:>6} {row.delivered:>6} {row.failed:>5} "
+                f"{seconds(row.queue_p50):>10} {seconds(row.delivered_p50):>10} "
+                f"{seconds(row.delivered_p90):>8} {seconds(row.delivered_p99):>8}"
+            )
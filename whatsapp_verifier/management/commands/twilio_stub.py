@@ -0,0 +1,101 @@
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import requests
+from django.core.management.base import BaseCommand
+
+MESSAGES_PATH = re.compile(r'^/2010-04-01/Accounts/(?P<sid>[^/]+)/Messages\.json$')
+
+
+class Command(BaseCommand):
+    help = (
+        'Run a local stand-in for the Twilio Messages endpoint. '
+        'Point the bot at it with TWILIO_API_BASE_URL=http://127.0.0.1:<port>'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.05, help='Seconds each request takes')
+        parser.add_argument('--fail-rate', type=float, default=0.0, help='Share of requests answered with 503')
+        parser.add_argument(
+            '--deliver-after', type=float, default=1.0,
+            help='Seconds until a message is reported delivered to its StatusCallback',
+        )
+
+    def handle(self, *args, **options):
+        stdout = self.stdout
+        lock = threading.Lock()
+        counts = {'accepted': 0, 'failed': 0}
+
+        def report_status(url, sid, to):
+            """POST 'sent' then 'delivered' callbacks the way Twilio does"""
+            def post(status):
+                try:
+                    requests.post(url, data={'MessageSid': sid, 'MessageStatus': status, 'To': to}, timeout=5)
+                except requests.RequestException as e:
+                    stdout.write(f"Status callback to {url} failed: {e}")
+
+            delay = options['deliver_after']
+            threading.Timer(delay / 2, post, ['sent']).start()
+            threading.Timer(delay, post, ['delivered']).start()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                match = MESSAGES_PATH.match(self.path)
+                if match is None:
+                    return self.reply(404, {'code': 20404, 'message': 'Not found'})
+
+                time.sleep(options['latency'])
+                if random.random() < options['fail_rate']:
+                    with lock:
+                        counts['failed'] += 1
+                    return self.reply(503, {'code': 20503, 'message': 'Service unavailable'})
+
+                form = {key: values[0] for key, values in parse_qs(body.decode('utf-8')).items()}
+                sid = f'SM{uuid.uuid4().hex}'
+                if form.get('StatusCallback'):
+                    report_status(form['StatusCallback'], sid, form.get('To', ''))
+                with lock:
+                    counts['accepted'] += 1
+                    total = counts['accepted']
+                stdout.write(f"#{total} {form.get('To', '')} ({len(form.get('Body', ''))} chars)")
+                for line in form.get('Body', '').splitlines():
+                    stdout.write(f"    {line}")
+                self.reply(201, {
+                    'sid': sid,
+                    'account_sid': match['sid'],
+                    'from': form.get('From'),
+                    'to': form.get('To'),
+                    'body': form.get('Body'),
+                    'status': 'queued',
+                })
+
+            def reply(self, status, payload):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', options['port']), Handler)
+        self.stdout.write(f"Twilio stub listening on http://127.0.0.1:{options['port']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Accepted {counts['accepted']} messages, failed {counts['failed']} requests")
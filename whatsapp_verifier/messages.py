@@ -0,0 +1,146 @@
+"""
+Catalog of the WhatsApp bot's fixed messages.
+
+``TEMPLATES`` holds the English text of every message, with ``{name}``
+placeholders for dynamic values (program names, links, commands). The
+``build_message_catalog`` command translates the text around the
+placeholders offline and stores the results as ``MessageTemplate`` rows.
+At runtime the catalog is read once into memory and replies are produced
+with plain string substitution, so sending a message never waits for a
+translation and dynamic values are never translated.
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+
+from django.db import DatabaseError
+from django.db.models import Count, Max
+
+from .models import MessageTemplate
+
+logger = logging.getLogger(__name__)
+
+LANGUAGES = ('en', 'ig', 'ha', 'yo')
+LANGUAGE_NAMES = {'en': 'English', 'ig': 'Igbo', 'ha': 'Hausa', 'yo': 'Yoruba'}
+
+TEMPLATES = {
+    'main_menu': (
+        "Welcome to Federal Programs Info Service! 📊\n\n"
+        "What would you like to do?\n"
+        "1. 🔗 Verify a link safety\n"
+        "2. ℹ️ Get program information\n"
+        "3. 🌐 Change language\n\n"
+        "Reply with 1, 2, or 3"
+    ),
+    'language_set': "✅ Language set to {language_name}! 🌍",
+    'language_picker': "🌐 Choose your language:\n\n{languages}\n\nType '{menu}' to go back",
+    'invalid_language': "❌ Invalid choice. Please select 1, 2, 3, or 4",
+    'link_prompt': "🔗 Please paste the link you want to verify:\n\nExample: {example_url}\n\nType '{menu}' to go back",
+    'link_prompt_next': "🔗 Please paste the next link you want to verify:",
+    'link_analyzing': "⏳ Analyzing your link... Please wait a moment.",
+    'link_next_steps': (
+        "What would you like to do next?\n\n"
+        "1. Verify another link\n"
+        "2. Get program info\n"
+        "3. Main menu\n\n"
+        "Or type '{menu}' for main menu"
+    ),
+    'program_prompt': "ℹ️ Please enter the program name:\n\nExamples:\n{examples}\n\nType '{menu}' to go back",
+    'program_prompt_short': "ℹ️ Please enter the program name:",
+    'program_searching': "🔍 Searching for program information...",
+    'program_found': "✅ PROGRAM FOUND\n\n📋 Name: {name}\n🏢 Sector: {sector}\n🔗 Official Link: {link}",
+    'program_description': "\n📝 Description: {description}",
+    'program_not_found': (
+        "❌ PROGRAM NOT FOUND\n\n"
+        "'{query}' was not found in our database.{did_you_mean}\n\n"
+        "💡 Tips:\n"
+        "• Check spelling\n"
+        "• Try shorter name (e.g., '{short_name}' instead of '{long_name}')\n"
+        "• Contact relevant ministry directly\n\n"
+        "🏛️ Common Programs:\n{common_programs}"
+    ),
+    'did_you_mean': "\n\n🤔 Did you mean:\n{suggestions}",
+    'program_error': "⚠️ Error retrieving information for '{query}'. Please try again or contact support.",
+    'error_reset': "❌ An error occurred. Returning to main menu.",
+}
+
+# Values filled in when the caller does not pass them
+DEFAULTS = {
+    'menu': 'menu',
+    'example_url': 'https://google.com',
+    'languages': "1. English\n2. Igbo\n3. Hausa\n4. Yoruba",
+    'examples': "- N-Power\n- Anchor Borrowers\n- Conditional Cash Transfer",
+    'short_name': 'N-Power',
+    'long_name': 'N-Power Program',
+    'common_programs': "• N-Power\n• Anchor Borrowers\n• TraderMoni\n• MarketMoni\n• Conditional Cash Transfer",
+    'did_you_mean': '',
+}
+
+# How often a process checks whether the catalog was rebuilt
+VERSION_CHECK_INTERVAL = 300
+
+PLACEHOLDER_RE = re.compile(r'(\{[a-z_]+\})')
+
+_catalog = None
+_version = None
+_checked = 0.0
+_lock = threading.Lock()
+
+
+def source_hash(key):
+    return hashlib.sha256(TEMPLATES[key].encode('utf-8')).hexdigest()
+
+
+def placeholders(text):
+    return set(PLACEHOLDER_RE.findall(text))
+
+
+def _table_version():
+    return tuple(MessageTemplate.objects.aggregate(count=Count('id'), modified=Max('modified')).values())
+
+
+def _load():
+    """``{(key, language): text}`` for every translation still matching its English source"""
+    current = {key: source_hash(key) for key in TEMPLATES}
+    catalog = {}
+    for key, language, text, digest in MessageTemplate.objects.values_list('key', 'language', 'text', 'source_hash'):
+        # Stale or hand-broken templates fall back to English
+        if current.get(key) == digest and placeholders(text) == placeholders(TEMPLATES[key]):
+            catalog[(key, language)] = text
+    return catalog
+
+
+def get_catalog():
+    """The in-memory catalog, reloaded when ``build_message_catalog`` changed it"""
+    global _catalog, _version, _checked
+    now = time.monotonic()
+    if _catalog is not None and now - _checked < VERSION_CHECK_INTERVAL:
+        return _catalog
+
+    with _lock:
+        _checked = now
+        try:
+            version = _table_version()
+            if _catalog is None or version != _version:
+                _catalog = _load()
+                _version = version
+        except DatabaseError:
+            logger.exception("Could not load the message catalog")
+            if _catalog is None:
+                _catalog = {}
+        return _catalog
+
+
+def render(key, language='en', **params):
+    """The message ``key`` in ``language`` (English if not translated) with ``params`` filled in"""
+    values = {**DEFAULTS, **params}
+    if language != 'en':
+        translated = get_catalog().get((key, language))
+        if translated is not None:
+            try:
+                return translated.format_map(values)
+            except (KeyError, ValueError, IndexError):
+                logger.warning("Broken %s translation of message %s; using English", language, key)
+    return TEMPLATES[key].format_map(values)
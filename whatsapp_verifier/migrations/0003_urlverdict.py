@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:50
+
+import django.utils.timezone
+import model_utils.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp_verifier', '0002_inboundmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='URLVerdict',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('url_hash', models.CharField(max_length=64, unique=True)),
+                ('url', models.TextField()),
+                ('verdict', models.CharField(choices=[('malicious', 'Malicious'), ('suspicious', 'Suspicious'), ('harmless', 'Harmless'), ('undetected', 'Undetected'), ('pending', 'Pending analysis')], max_length=20)),
+                ('stats', models.JSONField(blank=True, default=dict)),
+                ('threat_types', models.JSONField(blank=True, default=dict)),
+                ('threat_details', models.JSONField(blank=True, default=list)),
+                ('primary_threat', models.CharField(blank=True, max_length=20, null=True)),
+                ('reputation', models.IntegerField(default=0)),
+                ('scan_date', models.DateTimeField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'URL Verdict',
+                'verbose_name_plural': 'URL Verdicts',
+            },
+        ),
+    ]
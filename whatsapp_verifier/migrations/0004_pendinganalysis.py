@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:54
+
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp_verifier', '0003_urlverdict'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('url_hash', models.CharField(max_length=64, unique=True)),
+                ('url', models.TextField()),
+                ('analysis_id', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('polling', 'Polling'), ('done', 'Done'), ('expired', 'Expired')], default='polling', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_poll_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Pending Analysis',
+                'verbose_name_plural': 'Pending Analyses',
+            },
+        ),
+        migrations.CreateModel(
+            name='AnalysisSubscriber',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone_number', models.CharField(max_length=20)),
+                ('notified_at', models.DateTimeField(blank=True, null=True)),
+                ('analysis', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subscribers', to='whatsapp_verifier.pendinganalysis')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('analysis', 'phone_number'), name='unique_analysis_subscriber')],
+            },
+        ),
+    ]
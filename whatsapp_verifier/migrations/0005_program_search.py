@@ -0,0 +1,85 @@
+from django.db import migrations
+
+FTS_TABLE = 'whatsapp_verifier_federalprogram_fts'
+PROGRAM_TABLE = 'whatsapp_verifier_federalprogram'
+FTS_COLUMNS = 'name, agency, sector, description'
+
+PG_DOCUMENT = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(agency, '')), 'B') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(sector, '')), 'C') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(description, '')), 'D')"
+)
+
+
+def sqlite_has_fts5(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if cursor.fetchone()[0]:
+            return True
+        # Some builds ship FTS5 without reporting the compile option
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+            cursor.execute("DROP TABLE temp.fts5_probe")
+            return True
+        except Exception:
+            return False
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        if not sqlite_has_fts5(schema_editor):
+            return
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({FTS_COLUMNS}, "
+            f"content='{PROGRAM_TABLE}', content_rowid='id', tokenize='porter unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {PROGRAM_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, {FTS_COLUMNS}) "
+            f"VALUES (new.id, new.name, new.agency, new.sector, new.description); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {PROGRAM_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {FTS_COLUMNS}) "
+            f"VALUES ('delete', old.id, old.name, old.agency, old.sector, old.description); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {PROGRAM_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {FTS_COLUMNS}) "
+            f"VALUES ('delete', old.id, old.name, old.agency, old.sector, old.description); "
+            f"INSERT INTO {FTS_TABLE}(rowid, {FTS_COLUMNS}) "
+            f"VALUES (new.id, new.name, new.agency, new.sector, new.description); END"
+        )
+        schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    elif vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            f"CREATE INDEX federalprogram_search_idx ON {PROGRAM_TABLE} USING GIN (({PG_DOCUMENT}))"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX federalprogram_name_trgm_idx ON {PROGRAM_TABLE} USING GIN (name gin_trgm_ops)"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS federalprogram_search_idx")
+        schema_editor.execute("DROP INDEX IF EXISTS federalprogram_name_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp_verifier', '0004_pendinganalysis'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
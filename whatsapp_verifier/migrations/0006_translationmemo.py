@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:02
+
+import django.utils.timezone
+import model_utils.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp_verifier', '0005_program_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranslationMemo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('source_hash', models.CharField(max_length=64)),
+                ('language', models.CharField(max_length=10)),
+                ('source_text', models.TextField()),
+                ('translated_text', models.TextField()),
+            ],
+            options={
+                'verbose_name': 'Translation Memo',
+                'verbose_name_plural': 'Translation Memos',
+                'constraints': [models.UniqueConstraint(fields=('source_hash', 'language'), name='unique_translation_memo')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:03
+
+import django.utils.timezone
+import model_utils.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp_verifier', '0006_translationmemo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('key', models.CharField(max_length=50)),
+                ('language', models.CharField(max_length=10)),
+                ('text', models.TextField()),
+                ('source_hash', models.CharField(max_length=64)),
+            ],
+            options={
+                'verbose_name': 'Message Template',
+                'verbose_name_plural': 'Message Templates',
+                'constraints': [models.UniqueConstraint(fields=('key', 'language'), name='unique_message_template')],
+            },
+        ),
+    ]
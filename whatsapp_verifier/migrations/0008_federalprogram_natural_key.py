@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:05
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def drop_duplicate_names(apps, schema_editor):
+    """Keep the oldest program of each name so the name can become unique"""
+    FederalProgram = apps.get_model('whatsapp_verifier', 'FederalProgram')
+    duplicates = (
+        FederalProgram.objects.values('name')
+        .annotate(count=Count('id'), keep=Min('id'))
+        .filter(count__gt=1)
+    )
+    for row in duplicates:
+        FederalProgram.objects.filter(name=row['name']).exclude(id=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp_verifier', '0007_messagetemplate'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_names, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='federalprogram',
+            name='last_imported',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='federalprogram',
+            name='name',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+    ]
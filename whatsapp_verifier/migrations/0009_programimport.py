@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:10
+
+import django.utils.timezone
+import model_utils.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp_verifier', '0008_federalprogram_natural_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgramImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('source', models.CharField(max_length=255)),
+                ('sha256', models.CharField(max_length=64)),
+                ('inserted', models.PositiveIntegerField(default=0)),
+                ('updated', models.PositiveIntegerField(default=0)),
+                ('deleted', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Program Import',
+                'verbose_name_plural': 'Program Imports',
+                'ordering': ['-created'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp_verifier', '0009_programimport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='whatsappsession',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:15
+
+import django.utils.timezone
+import model_utils.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp_verifier', '0010_whatsappsession_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryLatencyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('hour', models.DateTimeField(unique=True)),
+                ('sent', models.PositiveIntegerField(default=0)),
+                ('delivered', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('queue_p50', models.FloatField(blank=True, null=True)),
+                ('queue_p90', models.FloatField(blank=True, null=True)),
+                ('delivered_p50', models.FloatField(blank=True, null=True)),
+                ('delivered_p90', models.FloatField(blank=True, null=True)),
+                ('delivered_p99', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Delivery Latency Rollup',
+                'verbose_name_plural': 'Delivery Latency Rollups',
+                'ordering': ['-hour'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MessageStatusEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message_sid', models.CharField(max_length=64)),
+                ('status', models.CharField(max_length=20)),
+                ('phone_number', models.CharField(blank=True, max_length=20)),
+                ('error_code', models.CharField(blank=True, max_length=10)),
+                ('inbound_at', models.DateTimeField(blank=True, null=True)),
+                ('recorded_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Message Status Event',
+                'verbose_name_plural': 'Message Status Events',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['message_sid', 'status'], name='whatsapp_ve_message_3029a6_idx'), models.Index(fields=['status', 'recorded_at'], name='whatsapp_ve_status_21a7ac_idx')],
+            },
+        ),
+    ]
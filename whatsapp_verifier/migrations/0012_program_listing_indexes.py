@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp_verifier', '0011_delivery_tracking'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='federalprogram',
+            index=models.Index(fields=['sector', 'name', 'id'], name='whatsapp_ve_sector_7a22e7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='federalprogram',
+            index=models.Index(fields=['level', 'name', 'id'], name='whatsapp_ve_level_21410c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='federalprogram',
+            index=models.Index(fields=['agency', 'name', 'id'], name='whatsapp_ve_agency_3010e9_idx'),
+        ),
+    ]
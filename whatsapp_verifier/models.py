@@ -6,16 +6,24 @@ from model_utils.models import TimeStampedModel
 
 
 class FederalProgram(TimeStampedModel):
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, unique=True)
     sector = models.CharField(max_length=255)
     level = models.CharField(max_length=100)
     agency = models.CharField(max_length=255)
     link = models.URLField()
     description = models.TextField(blank=True, null=True)
+    # Start of the import_programs run that last saw this program
+    last_imported = models.DateTimeField(blank=True, null=True, editable=False)
     
     class Meta:
         verbose_name = "Federal Program"
         verbose_name_plural = "Federal Programs"
+        # Filters of the initiatives listing, in its (name, id) order
+        indexes = [
+            models.Index(fields=['sector', 'name', 'id']),
+            models.Index(fields=['level', 'name', 'id']),
+            models.Index(fields=['agency', 'name', 'id']),
+        ]
         
     def __str__(self):
         return self.name
@@ -25,6 +33,212 @@ class WhatsAppSession(TimeStampedModel):
     current_step = models.CharField(max_length=50, default='main_menu')
     language = models.CharField(max_length=10, default='en')
     temp_data = models.JSONField(default=dict, blank=True)
+    # Bumped on every write so concurrent updates are detected
+    version = models.PositiveIntegerField(default=0, editable=False)
     
     def __str__(self):
-        return f"{self.phone_number} - {self.current_step}"
\ No newline at end of file
+        return f"{self.phone_number} - {self.current_step}"
+
+class InboundMessage(TimeStampedModel):
+    """Raw WhatsApp message persisted by the webhook before it is processed"""
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    message_sid = models.CharField(max_length=64, unique=True, blank=True, null=True)
+    phone_number = models.CharField(max_length=20)
+    body = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    processed_at = models.DateTimeField(blank=True, null=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['phone_number', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.phone_number} - {self.status}"
+
+
+class URLVerdict(TimeStampedModel):
+    """Last known VirusTotal verdict for a canonical URL"""
+    VERDICT_MALICIOUS = 'malicious'
+    VERDICT_SUSPICIOUS = 'suspicious'
+    VERDICT_HARMLESS = 'harmless'
+    VERDICT_UNDETECTED = 'undetected'
+    VERDICT_PENDING = 'pending'
+    VERDICT_CHOICES = [
+        (VERDICT_MALICIOUS, 'Malicious'),
+        (VERDICT_SUSPICIOUS, 'Suspicious'),
+        (VERDICT_HARMLESS, 'Harmless'),
+        (VERDICT_UNDETECTED, 'Undetected'),
+        (VERDICT_PENDING, 'Pending analysis'),
+    ]
+
+    url_hash = models.CharField(max_length=64, unique=True)
+    url = models.TextField()
+    verdict = models.CharField(max_length=20, choices=VERDICT_CHOICES)
+    stats = models.JSONField(default=dict, blank=True)
+    threat_types = models.JSONField(default=dict, blank=True)
+    threat_details = models.JSONField(default=list, blank=True)
+    primary_threat = models.CharField(max_length=20, blank=True, null=True)
+    reputation = models.IntegerField(default=0)
+    scan_date = models.DateTimeField(blank=True, null=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = "URL Verdict"
+        verbose_name_plural = "URL Verdicts"
+
+    def __str__(self):
+        return f"{self.url} - {self.verdict}"
+
+
+class PendingAnalysis(TimeStampedModel):
+    """URL submitted to VirusTotal whose analysis is still being polled"""
+    STATUS_POLLING = 'polling'
+    STATUS_DONE = 'done'
+    STATUS_EXPIRED = 'expired'
+    STATUS_CHOICES = [
+        (STATUS_POLLING, 'Polling'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_EXPIRED, 'Expired'),
+    ]
+
+    url_hash = models.CharField(max_length=64, unique=True)
+    url = models.TextField()
+    analysis_id = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_POLLING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_poll_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = "Pending Analysis"
+        verbose_name_plural = "Pending Analyses"
+
+    def __str__(self):
+        return f"{self.url} - {self.status}"
+
+
+class AnalysisSubscriber(models.Model):
+    """WhatsApp user waiting for the result of a pending analysis"""
+    analysis = models.ForeignKey(PendingAnalysis, on_delete=models.CASCADE, related_name='subscribers')
+    phone_number = models.CharField(max_length=20)
+    notified_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['analysis', 'phone_number'], name='unique_analysis_subscriber'),
+        ]
+
+    def __str__(self):
+        return f"{self.phone_number} - {self.analysis.url}"
+
+
+class TranslationMemo(TimeStampedModel):
+    """Machine translation of a source text, reused for every later request"""
+    source_hash = models.CharField(max_length=64)
+    language = models.CharField(max_length=10)
+    source_text = models.TextField()
+    translated_text = models.TextField()
+
+    class Meta:
+        verbose_name = "Translation Memo"
+        verbose_name_plural = "Translation Memos"
+        constraints = [
+            models.UniqueConstraint(fields=['source_hash', 'language'], name='unique_translation_memo'),
+        ]
+
+    def __str__(self):
+        return f"[{self.language}] {self.source_text[:50]}"
+
+
+class MessageTemplate(TimeStampedModel):
+    """Translated bot message template, built offline by ``build_message_catalog``"""
+    key = models.CharField(max_length=50)
+    language = models.CharField(max_length=10)
+    text = models.TextField()
+    # Hash of the English template this was translated from
+    source_hash = models.CharField(max_length=64)
+
+    class Meta:
+        verbose_name = "Message Template"
+        verbose_name_plural = "Message Templates"
+        constraints = [
+            models.UniqueConstraint(fields=['key', 'language'], name='unique_message_template'),
+        ]
+
+    def __str__(self):
+        return f"[{self.language}] {self.key}"
+
+
+class ProgramImport(TimeStampedModel):
+    """A completed ``import_programs`` run, used to skip re-importing an unchanged file"""
+    source = models.CharField(max_length=255)
+    sha256 = models.CharField(max_length=64)
+    inserted = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Program Import"
+        verbose_name_plural = "Program Imports"
+        ordering = ['-created']
+
+    def __str__(self):
+        return f"{self.source} ({self.sha256[:12]})"
+
+
+class MessageStatusEvent(models.Model):
+    """One delivery-status transition of an outbound WhatsApp message; rows are never updated"""
+    message_sid = models.CharField(max_length=64)
+    status = models.CharField(max_length=20)
+    phone_number = models.CharField(max_length=20, blank=True)
+    error_code = models.CharField(max_length=10, blank=True)
+    # When the inbound message being answered arrived (set on the event recorded at send time)
+    inbound_at = models.DateTimeField(blank=True, null=True)
+    recorded_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Message Status Event"
+        verbose_name_plural = "Message Status Events"
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['message_sid', 'status']),
+            models.Index(fields=['status', 'recorded_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.message_sid} {self.status}"
+
+
+class DeliveryLatencyRollup(TimeStampedModel):
+    """Delivery counts and latency percentiles (seconds) of the replies sent in one hour"""
+    hour = models.DateTimeField(unique=True)
+    sent = models.PositiveIntegerField(default=0)
+    delivered = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    # Inbound message received -> reply accepted by Twilio (our own queueing)
+    queue_p50 = models.FloatField(blank=True, null=True)
+    queue_p90 = models.FloatField(blank=True, null=True)
+    # Inbound message received -> reply delivered to the handset
+    delivered_p50 = models.FloatField(blank=True, null=True)
+    delivered_p90 = models.FloatField(blank=True, null=True)
+    delivered_p99 = models.FloatField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = "Delivery Latency Rollup"
+        verbose_name_plural = "Delivery Latency Rollups"
+        ordering = ['-hour']
+
+    def __str__(self):
+        return f"{self.hour:%Y-%m-%d %H:00} ({self.sent} sent)"
@@ -0,0 +1,253 @@
+"""
+Outbound WhatsApp messages through the Twilio REST API.
+
+Replies are queued per recipient on a ``KeyedWorkerPool``, so a user's
+messages go out one at a time and in order. Messages still waiting when a
+worker gets to a recipient are merged into as few bodies as fit
+WhatsApp's limit; ``hold`` lets a conversation turn collect its replies
+and release them together.
+
+Requests go through one keep-alive ``requests.Session`` with timeouts.
+Only failures that prove Twilio did not take the message are retried, with
+jittered exponential backoff: 429s and errors while connecting. A 5xx or a
+connection lost after the request went out may still have been accepted,
+so those are given up on rather than risk sending a reply twice. Every attempt takes a token from a bucket refilled
+at the sender's message rate. ``TWILIO_API_BASE_URL`` points the client
+at another endpoint, such as the ``twilio_stub`` command.
+
+Accepted messages are recorded as delivery events (see ``delivery``), and
+Twilio reports later transitions to ``TWILIO_STATUS_CALLBACK_URL``.
+"""
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import requests
+from decouple import config
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from . import delivery
+from .workers import KeyedWorkerPool
+
+logger = logging.getLogger(__name__)
+
+TWILIO_ACCOUNT_SID = config('TWILIO_ACCOUNT_SID')
+TWILIO_AUTH_TOKEN = config('TWILIO_AUTH_TOKEN')
+TWILIO_WHATSAPP_NUMBER = config('TWILIO_WHATSAPP_NUMBER')
+TWILIO_API_BASE_URL = config('TWILIO_API_BASE_URL', default='https://api.twilio.com')
+
+# (connect, read) timeouts in seconds
+TWILIO_TIMEOUT = (
+    config('TWILIO_CONNECT_TIMEOUT', default=3.05, cast=float),
+    config('TWILIO_READ_TIMEOUT', default=10, cast=float),
+)
+# Attempts per message, and the backoff before the second one (doubled each time)
+MAX_ATTEMPTS = 4
+RETRY_BACKOFF = 0.5
+RETRY_BACKOFF_MAX = 8
+# Twilio rejected the message, so it can be sent again
+RETRY_STATUSES = {429}
+
+# Twilio rejects WhatsApp bodies longer than this
+MAX_BODY_LENGTH = 1600
+MESSAGE_SEPARATOR = '\n\n'
+
+outbound_pool = KeyedWorkerPool(
+    'whatsapp-outbound',
+    size=getattr(settings, 'WHATSAPP_OUTBOUND_THREADS', 2),
+)
+
+_session = None
+_session_lock = threading.Lock()
+
+_pending = defaultdict(list)
+_scheduled = set()
+_held = defaultdict(int)
+_inbound_at = {}
+_pending_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Thread-safe rate limiter: ``acquire`` blocks until a token is free"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+throttle = TokenBucket(getattr(settings, 'TWILIO_MESSAGES_PER_SECOND', 80))
+
+
+def get_session():
+    """Return the shared keep-alive session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(2, outbound_pool.size))
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.auth = (TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+                _session = session
+    return _session
+
+
+def messages_url():
+    return f"{TWILIO_API_BASE_URL.rstrip('/')}/2010-04-01/Accounts/{TWILIO_ACCOUNT_SID}/Messages.json"
+
+
+def coalesce(messages, limit=MAX_BODY_LENGTH):
+    """
+    Merge consecutive ``(text, inbound_at)`` messages into bodies of at most
+    ``limit`` characters; each body keeps the earliest ``inbound_at``.
+    """
+    bodies = []
+    for message, inbound_at in messages:
+        if bodies and len(bodies[-1][0]) + len(MESSAGE_SEPARATOR) + len(message) <= limit:
+            body, earliest = bodies[-1]
+            if earliest is None or (inbound_at is not None and inbound_at < earliest):
+                earliest = inbound_at
+            bodies[-1] = (f'{body}{MESSAGE_SEPARATOR}{message}', earliest)
+        else:
+            bodies.append((message, inbound_at))
+    return bodies
+
+
+def backoff(attempt):
+    """Seconds to wait before retry number ``attempt`` (1-based), with full jitter"""
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2 ** (attempt - 1)))
+
+
+def connect_failed(error):
+    """Whether a ``requests`` error happened before the request was sent"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    if isinstance(reason, MaxRetryError):
+        reason = reason.reason
+    return isinstance(reason, NewConnectionError)
+
+
+def deliver(to_number, body, inbound_at=None):
+    """
+    POST one message to Twilio, retrying transient failures; True when
+    accepted. ``inbound_at`` is when the message being answered arrived.
+    """
+    data = {
+        'From': f'whatsapp:{TWILIO_WHATSAPP_NUMBER}',
+        'To': f'whatsapp:{to_number}',
+        'Body': body,
+    }
+    status_callback = getattr(settings, 'TWILIO_STATUS_CALLBACK_URL', '')
+    if status_callback:
+        data['StatusCallback'] = status_callback
+    error = ''
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        throttle.acquire()
+        try:
+            response = get_session().post(messages_url(), data=data, timeout=TWILIO_TIMEOUT)
+        except requests.RequestException as e:
+            if not connect_failed(e):
+                # The request may have reached Twilio; a retry could send it twice
+                logger.warning("Twilio send to %s failed: %s", to_number, e)
+                return False
+            error = str(e)
+        else:
+            if response.status_code in (200, 201):
+                logger.debug("Twilio accepted message to %s", to_number)
+                _record_accepted(response, to_number, inbound_at)
+                return True
+            if response.status_code not in RETRY_STATUSES:
+                logger.warning("Twilio send to %s failed: HTTP %s %s", to_number, response.status_code, response.text[:200])
+                return False
+            error = f"HTTP {response.status_code}"
+
+        if attempt < MAX_ATTEMPTS:
+            logger.info("Twilio send to %s failed (%s); retry %d", to_number, error, attempt)
+            time.sleep(backoff(attempt))
+
+    logger.warning("Twilio send to %s failed after %d attempts: %s", to_number, MAX_ATTEMPTS, error)
+    return False
+
+
+def _record_accepted(response, to_number, inbound_at):
+    try:
+        payload = response.json()
+    except ValueError:
+        return
+    if payload.get('sid'):
+        delivery.record(payload['sid'], payload.get('status') or 'queued', to_number, inbound_at=inbound_at)
+
+
+def _drain(to_number):
+    """Send everything queued for ``to_number``, merged where it fits"""
+    with _pending_lock:
+        _scheduled.discard(to_number)
+        messages = _pending.pop(to_number, [])
+    for body, inbound_at in coalesce(messages):
+        deliver(to_number, body, inbound_at)
+
+
+def _schedule(to_number):
+    """Queue a drain for ``to_number`` unless one is waiting or it is held (lock held)"""
+    if _pending.get(to_number) and not _held.get(to_number) and to_number not in _scheduled:
+        _scheduled.add(to_number)
+        outbound_pool.submit(to_number, _drain, to_number)
+
+
+def queue_message(to_number, message):
+    """Queue ``message`` for ``to_number`` behind earlier ones"""
+    with _pending_lock:
+        _pending[to_number].append((message, _inbound_at.get(to_number)))
+        _schedule(to_number)
+
+
+def flush(to_number):
+    """Release the messages queued for ``to_number`` even while it is held"""
+    with _pending_lock:
+        if _pending.get(to_number) and to_number not in _scheduled:
+            _scheduled.add(to_number)
+            outbound_pool.submit(to_number, _drain, to_number)
+
+
+@contextmanager
+def hold(to_number, inbound_at=None):
+    """
+    Collect messages for ``to_number`` and send them together on exit.
+    ``inbound_at`` (when the message being answered arrived) is kept with
+    them for the delivery latency metrics.
+    """
+    with _pending_lock:
+        _held[to_number] += 1
+        if inbound_at is not None:
+            _inbound_at[to_number] = inbound_at
+    try:
+        yield
+    finally:
+        with _pending_lock:
+            _held[to_number] -= 1
+            if not _held[to_number]:
+                del _held[to_number]
+                _inbound_at.pop(to_number, None)
+            _schedule(to_number)
@@ -0,0 +1,227 @@
+"""
+In-memory, typo-tolerant lookup of federal programs by name.
+
+WhatsApp users type names the way they say them: "npower", "n power",
+"anchor borower", "ccT". Every program is indexed under a few aliases
+(the full name, the name without its parenthesised part, the acronym in
+parentheses and one built from the initials), each reduced to lowercase
+letters and digits. A character trigram inverted index picks candidate
+aliases and a bounded edit distance to each alias (or its beginning)
+re-ranks them. A match on the beginning of a longer alias must start with
+the same letter, and short queries get only one edit there.
+
+The index is built from the database on first use and rebuilt after the
+``programs_changed`` signal (or, across processes, when the program
+table's version changes).
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict, namedtuple
+
+from django.db.models import Count, Max
+
+from .models import FederalProgram
+from .signals import programs_changed
+
+logger = logging.getLogger(__name__)
+
+# How often a process checks whether another process changed the programs
+VERSION_CHECK_INTERVAL = 60
+# Aliases ranked by trigram overlap that get the edit-distance re-rank
+RERANK_CANDIDATES = 8
+# Queries shorter than this match the beginning of an alias with one edit at most
+PREFIX_STRICT_LENGTH = 10
+
+# Name words left out of generated acronyms
+ACRONYM_STOPWORDS = {'of', 'and', 'the', 'for', 'on', 'in', '&'}
+
+ProgramMatch = namedtuple('ProgramMatch', ['program_id', 'name', 'distance'])
+
+_NON_ALNUM_RE = re.compile(r'[^0-9a-z]+')
+_PAREN_RE = re.compile(r'\(([^)]*)\)')
+_WORD_RE = re.compile(r'[0-9a-z&]+')
+
+
+def compact(text):
+    """Lowercase ``text`` and keep only letters and digits"""
+    return _NON_ALNUM_RE.sub('', (text or '').lower())
+
+
+def trigrams(text):
+    padded = f'^{text}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_distance(length):
+    """Edits tolerated for a query of ``length`` characters"""
+    if length <= 4:
+        # Short inputs are acronyms; "cct" must not match "nct"
+        return 0
+    return min(3, length // 5 + 1)
+
+
+def bounded_prefix_distance(query, alias, bound):
+    """
+    Fewest edits turning ``query`` into ``alias`` or into a prefix of it.
+
+    Only the diagonal band of width ``2 * bound + 1`` is computed and the
+    search stops as soon as every cell exceeds ``bound``; the result is then
+    ``bound + 1``.
+    """
+    limit = bound + 1
+    alias = alias[:len(query) + bound]
+    m = len(alias)
+    previous = [j if j <= bound else limit for j in range(m + 1)]
+    for i, q_char in enumerate(query, 1):
+        current = [limit] * (m + 1)
+        if i <= bound:
+            current[0] = i
+        row_min = current[0]
+        for j in range(max(1, i - bound), min(m, i + bound) + 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (q_char != alias[j - 1]))
+            if cost < limit:
+                current[j] = cost
+                if cost < row_min:
+                    row_min = cost
+        if row_min > bound:
+            return limit
+        previous = current
+    return min(previous)
+
+
+def prefix_match_allowed(query, alias, distance):
+    """
+    Whether a match against the beginning of a longer alias counts. Short
+    words are a few edits from the start of many names ("power" is two from
+    "gover..."), so the first letter must agree and, below
+    ``PREFIX_STRICT_LENGTH`` characters, only one edit is allowed.
+    """
+    return query[0] == alias[0] and (distance <= 1 or len(query) >= PREFIX_STRICT_LENGTH)
+
+
+def program_aliases(name):
+    """Compact aliases a program can be asked for by"""
+    lowered = (name or '').lower()
+    aliases = {compact(lowered)}
+
+    bare = _PAREN_RE.sub(' ', lowered)
+    aliases.add(compact(bare))
+    for inner in _PAREN_RE.findall(lowered):
+        inner_compact = compact(inner)
+        # "(CCT)" is an acronym; "(Risk-sharing & Agri-finance)" is not
+        if inner_compact and ' ' not in inner.strip():
+            aliases.add(inner_compact)
+
+    words = [word for word in _WORD_RE.findall(bare) if word not in ACRONYM_STOPWORDS]
+    if len(words) > 1:
+        aliases.add(''.join(word[0] for word in words))
+
+    return {alias for alias in aliases if alias}
+
+
+class ProgramMatcher:
+    """Trigram index over program aliases"""
+
+    def __init__(self, programs):
+        self.names = {}
+        self.aliases = []
+        self.exact = {}
+        self.index = defaultdict(list)
+
+        for program_id, name in programs:
+            self.names[program_id] = name
+            for alias in program_aliases(name):
+                alias_id = len(self.aliases)
+                self.aliases.append((alias, program_id))
+                self.exact.setdefault(alias, program_id)
+                for gram in trigrams(alias):
+                    self.index[gram].append(alias_id)
+
+    def match(self, query, limit=3):
+        """Programs matching ``query`` within the edit bound, closest first"""
+        q = compact(query)
+        if not q:
+            return []
+        if q in self.exact:
+            program_id = self.exact[q]
+            matches = [ProgramMatch(program_id, self.names[program_id], 0)]
+            if limit == 1:
+                return matches
+        else:
+            matches = []
+
+        bound = max_distance(len(q))
+        overlap = Counter()
+        for gram in trigrams(q):
+            for alias_id in self.index.get(gram, ()):
+                overlap[alias_id] += 1
+
+        best = {match.program_id: match.distance for match in matches}
+        for alias_id, _ in overlap.most_common(RERANK_CANDIDATES):
+            alias, program_id = self.aliases[alias_id]
+            # Prefix distance, so a shortened name ("anchor borower") matches
+            distance = bounded_prefix_distance(q, alias, bound)
+            if len(alias) > len(q) + bound and not prefix_match_allowed(q, alias, distance):
+                # Too much shorter than the alias to be a typo of all of it
+                continue
+            if distance <= bound and distance < best.get(program_id, bound + 1):
+                best[program_id] = distance
+
+        ranked = sorted(best.items(), key=lambda item: (item[1], len(self.names[item[0]])))
+        return [ProgramMatch(pid, self.names[pid], distance) for pid, distance in ranked[:limit]]
+
+    def suggest(self, query, limit=3):
+        """Programs sharing the most trigrams with ``query``, for "did you mean" replies"""
+        q = compact(query)
+        overlap = Counter()
+        for gram in trigrams(q):
+            for alias_id in self.index.get(gram, ()):
+                overlap[self.aliases[alias_id][1]] += 1
+        return [self.names[program_id] for program_id, hits in overlap.most_common(limit) if hits > 1]
+
+
+_matcher = None
+_version = None
+_checked = 0.0
+_lock = threading.Lock()
+
+
+def _table_version():
+    return tuple(FederalProgram.objects.aggregate(count=Count('id'), modified=Max('modified')).values())
+
+
+def invalidate(**kwargs):
+    """Drop the index; the next lookup rebuilds it"""
+    global _matcher
+    _matcher = None
+
+
+def get_matcher():
+    """The process-wide matcher, (re)built when programs changed"""
+    global _matcher, _version, _checked
+    now = time.monotonic()
+    if _matcher is not None and now - _checked < VERSION_CHECK_INTERVAL:
+        return _matcher
+
+    with _lock:
+        version = _table_version()
+        _checked = now
+        if _matcher is None or version != _version:
+            _matcher = ProgramMatcher(FederalProgram.objects.values_list('id', 'name'))
+            _version = version
+            logger.info("Built program matcher with %d aliases", len(_matcher.aliases))
+        return _matcher
+
+
+def match_programs(query, limit=3):
+    """Top ``limit`` typo-tolerant matches for ``query``"""
+    return get_matcher().match(query, limit)
+
+
+def suggest_programs(query, limit=3):
+    return get_matcher().suggest(query, limit)
+
+
+programs_changed.connect(invalidate, dispatch_uid='program_matcher_invalidate')
@@ -0,0 +1,179 @@
+"""
+Ranked full-text search over federal programs.
+
+The index is maintained by the database itself (see migration
+``0005_program_search``):
+
+- SQLite: an external-content, Porter-stemmed FTS5 table kept in sync by
+  triggers on the program table, ranked with ``bm25()``;
+- PostgreSQL: a GIN expression index over a weighted ``tsvector`` ranked
+  with ``ts_rank_cd``, plus a trigram index on the name for misspellings.
+
+Both weight matches in the name above agency, sector and description.
+Databases without either fall back to ``icontains`` scans.
+"""
+import logging
+import re
+
+from django.db import connection, connections, DatabaseError, DEFAULT_DB_ALIAS
+
+from .models import FederalProgram
+
+logger = logging.getLogger(__name__)
+
+PROGRAM_TABLE = FederalProgram._meta.db_table
+FTS_TABLE = 'whatsapp_verifier_federalprogram_fts'
+
+# bm25() column weights, in FTS column order: name, agency, sector, description
+FTS_WEIGHTS = (10.0, 4.0, 2.0, 1.0)
+
+# Must match the expression of the GIN index created by the migration
+PG_DOCUMENT = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(agency, '')), 'B') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(sector, '')), 'C') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(description, '')), 'D')"
+)
+PG_TRIGRAM_THRESHOLD = 0.3
+
+# Filler words of chat questions that would otherwise match every description
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'about', 'can', 'do', 'does', 'for', 'from', 'how',
+    'i', 'in', 'is', 'it', 'me', 'my', 'of', 'on', 'or', 'program', 'programme',
+    'scheme', 'tell', 'the', 'to', 'what', 'where', 'who', 'with',
+}
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_fts_available = {}
+
+
+def search_terms(query):
+    """Lowercased search words of ``query`` without stopwords"""
+    words = [word.lower() for word in _TOKEN_RE.findall(query or '')]
+    terms = [word for word in words if word not in STOPWORDS]
+    # A query made only of stopwords (e.g. "program") is searched as typed
+    return terms or words
+
+
+def has_fts_index():
+    """Whether the current SQLite database has the FTS5 program index"""
+    alias = connection.alias
+    if alias not in _fts_available:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _fts_available[alias] = cursor.fetchone() is not None
+    return _fts_available[alias]
+
+
+def _sqlite_ids(terms, limit):
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    sql = (
+        f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+        f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s"
+    )
+    phrases = ['"%s"*' % term.replace('"', '""') for term in terms]
+    with connection.cursor() as cursor:
+        # Every word first, then any word ranked by how much of it matched
+        for operator in (' AND ', ' OR '):
+            cursor.execute(sql, [operator.join(phrases), limit])
+            ids = [row[0] for row in cursor.fetchall()]
+            if ids or len(phrases) == 1:
+                return ids
+    return []
+
+
+def _postgres_ids(terms, limit):
+    prefixes = ["'%s':*" % term.replace("'", "''").replace('\\', '') for term in terms]
+    sql = (
+        f"SELECT id FROM {PROGRAM_TABLE}, to_tsquery('simple', %s) query "
+        f"WHERE ({PG_DOCUMENT}) @@ query "
+        f"ORDER BY ts_rank_cd({PG_DOCUMENT}, query) DESC, id LIMIT %s"
+    )
+    with connection.cursor() as cursor:
+        for operator in (' & ', ' | '):
+            cursor.execute(sql, [operator.join(prefixes), limit])
+            ids = [row[0] for row in cursor.fetchall()]
+            if ids:
+                return ids
+
+        # Nothing matched word-wise; try a misspelling of the name
+        cursor.execute(
+            f"SELECT id FROM {PROGRAM_TABLE} "
+            "WHERE similarity(name, %s) > %s ORDER BY similarity(name, %s) DESC, id LIMIT %s",
+            [' '.join(terms), PG_TRIGRAM_THRESHOLD, ' '.join(terms), limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fallback(query, limit):
+    results = FederalProgram.objects.filter(
+        name__icontains=query
+    ) | FederalProgram.objects.filter(
+        description__icontains=query
+    ) | FederalProgram.objects.filter(
+        agency__icontains=query
+    )
+    return list(results[:limit])
+
+
+def search_programs(query, limit=5):
+    """Return up to ``limit`` programs matching ``query``, best match first"""
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    try:
+        if connection.vendor == 'sqlite' and has_fts_index():
+            ids = _sqlite_ids(terms, limit)
+        elif connection.vendor == 'postgresql':
+            ids = _postgres_ids(terms, limit)
+        else:
+            return _fallback(query.strip(), limit)
+    except DatabaseError:
+        logger.exception("Program search failed for %r; falling back to icontains", query)
+        return _fallback(query.strip(), limit)
+
+    programs = FederalProgram.objects.in_bulk(ids)
+    return [programs[pk] for pk in ids if pk in programs]
+
+
+def install_sqlite_triggers(using=DEFAULT_DB_ALIAS):
+    """
+    Create the triggers that keep the FTS table in sync, if missing.
+
+    SQLite drops a table's triggers when a migration rebuilds the table, so
+    this runs after every ``migrate``. Returns True when triggers were
+    (re)created, in which case the index is rebuilt from the table.
+    """
+    conn = connections[using]
+    if conn.vendor != 'sqlite' or FTS_TABLE not in conn.introspection.table_names():
+        return False
+
+    columns = 'name, agency, sector, description'
+    new_values = 'new.id, new.name, new.agency, new.sector, new.description'
+    old_values = 'old.id, old.name, old.agency, old.sector, old.description'
+    delete_old = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', {old_values});"
+    insert_new = f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES ({new_values});"
+    triggers = {
+        f'{FTS_TABLE}_ai': f"AFTER INSERT ON {PROGRAM_TABLE} BEGIN {insert_new} END",
+        f'{FTS_TABLE}_ad': f"AFTER DELETE ON {PROGRAM_TABLE} BEGIN {delete_old} END",
+        f'{FTS_TABLE}_au': f"AFTER UPDATE ON {PROGRAM_TABLE} BEGIN {delete_old} {insert_new} END",
+    }
+
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [PROGRAM_TABLE])
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in triggers if name not in existing]
+        for name in missing:
+            cursor.execute(f"CREATE TRIGGER {name} {triggers[name]}")
+        if missing:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return bool(missing)
+
+
+def optimize_index():
+    """Merge the FTS index segments after a bulk import (SQLite only)"""
+    if connection.vendor == 'sqlite' and has_fts_index():
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .models import FederalProgram, WhatsAppSession
+
+# Sent whenever the set of federal programs changes (admin edits, imports)
+programs_changed = Signal()
+
+
+@receiver(post_save, sender=FederalProgram, dispatch_uid='federalprogram_saved')
+@receiver(post_delete, sender=FederalProgram, dispatch_uid='federalprogram_deleted')
+def federal_program_changed(sender, **kwargs):
+    programs_changed.send(sender=sender)
+
+
+@receiver(post_save, sender=WhatsAppSession, dispatch_uid='whatsappsession_saved')
+@receiver(post_delete, sender=WhatsAppSession, dispatch_uid='whatsappsession_deleted')
+def whatsapp_session_changed(sender, instance, **kwargs):
+    """Drop the cached copy of a session written outside the session store"""
+    from .sessions import forget
+
+    forget(instance.phone_number)
+
+
+def restore_search_triggers(sender, using, **kwargs):
+    """Table rebuilds during migrations drop the SQLite search triggers; put them back"""
+    from .search import install_sqlite_triggers
+
+    install_sqlite_triggers(using)
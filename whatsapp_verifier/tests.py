@@ -1,3 +1,145 @@
-from django.test import TestCase
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from . import delivery
+from .models import DeliveryLatencyRollup, MessageStatusEvent
+from .program_matcher import ProgramMatcher
+
+HOUR = datetime(2026, 10, 1, 12, tzinfo=dt_timezone.utc)
+
+
+def event(sid, status, minute, second=0, inbound_at=None):
+    return MessageStatusEvent.objects.create(
+        message_sid=sid, status=status, recorded_at=HOUR + timedelta(minutes=minute, seconds=second),
+        inbound_at=inbound_at,
+    )
+
+
+class DeliveryBufferTests(TestCase):
+    def setUp(self):
+        delivery.flush()
+
+    def test_record_buffers_until_flush(self):
+        delivery.record('SM1', 'Delivered', phone_number='+2348000000000')
+        delivery.record('SM1', 'read')
+        self.assertFalse(MessageStatusEvent.objects.exists())
+
+        self.assertEqual(delivery.flush(), 2)
+        self.assertEqual(
+            list(MessageStatusEvent.objects.values_list('message_sid', 'status')),
+            [('SM1', 'delivered'), ('SM1', 'read')],
+        )
+        self.assertEqual(delivery.flush(), 0)
+
+    def test_status_callback_records_event(self):
+        response = self.client.post(reverse('whatsapp_status_callback'), {
+            'MessageSid': 'SM2', 'MessageStatus': 'delivered', 'To': 'whatsapp:+2348000000000',
+        })
+        self.assertEqual(response.status_code, 200)
+        delivery.flush()
+        stored = MessageStatusEvent.objects.get(message_sid='SM2')
+        self.assertEqual((stored.status, stored.phone_number), ('delivered', '+2348000000000'))
+
+    def test_status_callback_requires_sid_and_status(self):
+        response = self.client.post(reverse('whatsapp_status_callback'), {'MessageSid': 'SM3'})
+        self.assertEqual(response.status_code, 400)
+
+
+class DeliveryFlusherTests(TransactionTestCase):
+    def test_flusher_thread_writes_full_batches(self):
+        for index in range(delivery.FLUSH_BATCH_SIZE):
+            delivery.record(f'SM{index}', 'queued')
+        deadline = time.monotonic() + 5
+        while MessageStatusEvent.objects.count() < delivery.FLUSH_BATCH_SIZE and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(MessageStatusEvent.objects.count(), delivery.FLUSH_BATCH_SIZE)
+
+
+class RollupTests(TestCase):
+    def test_percentile_is_nearest_rank(self):
+        self.assertIsNone(delivery.percentile([], 0.5))
+        self.assertEqual(delivery.percentile([1, 2, 3, 4], 0.5), 2)
+        self.assertEqual(delivery.percentile([1, 2, 3, 4], 0.9), 4)
+        self.assertEqual(delivery.percentile([7], 0.99), 7)
+
+    def test_rollup_latencies_and_counts(self):
+        # Replies answering messages that arrived 2 s, 4 s and 6 s before they were accepted
+        for index, seconds in enumerate((2, 4, 6)):
+            accepted = HOUR + timedelta(minutes=10 + index)
+            event(f'SM{index}', 'accepted', 10 + index, inbound_at=accepted - timedelta(seconds=seconds))
+        event('SM0', 'delivered', 10, second=3)
+        event('SM1', 'delivered', 11, second=6)
+        event('SM2', 'failed', 12, second=1)
+        # A push not answering any message counts as sent but has no latency
+        event('SM9', 'accepted', 20)
+
+        rollup = delivery.rollup_hour(HOUR)
+        self.assertEqual((rollup.sent, rollup.delivered, rollup.failed), (4, 2, 1))
+        self.assertEqual(rollup.queue_p50, 4)
+        self.assertEqual(rollup.queue_p90, 6)
+        self.assertEqual(rollup.delivered_p50, 5)
+        self.assertEqual(rollup.delivered_p90, 10)
+        self.assertEqual(DeliveryLatencyRollup.objects.get(hour=HOUR).sent, 4)
+
+    def test_queued_callback_does_not_replace_send_event(self):
+        inbound_at = HOUR + timedelta(minutes=5)
+        event('SM1', 'queued', 5, second=2, inbound_at=inbound_at)
+        event('SM1', 'queued', 5, second=30)
+        event('SM1', 'delivered', 5, second=5)
+
+        rollup = delivery.rollup_hour(HOUR)
+        self.assertEqual(rollup.sent, 1)
+        self.assertEqual(rollup.queue_p50, 2)
+        self.assertEqual(rollup.delivered_p50, 5)
+
+    def test_message_counts_in_the_hour_it_was_first_accepted(self):
+        event('SM1', 'accepted', 59, inbound_at=HOUR + timedelta(minutes=58))
+        MessageStatusEvent.objects.create(
+            message_sid='SM1', status='queued', recorded_at=HOUR + timedelta(hours=1, seconds=5),
+        )
+        self.assertEqual(delivery.rollup_hour(HOUR).sent, 1)
+        self.assertIsNone(delivery.rollup_hour(HOUR + timedelta(hours=1)))
+
+    def test_empty_hour_has_no_rollup(self):
+        self.assertIsNone(delivery.rollup_hour(HOUR))
+
+
+PROGRAM_NAMES = [
+    'N-Power',
+    'Conditional Cash Transfer (CCT)',
+    'Government Enterprise & Empowerment Programme (GEEP)',
+    "Anchor Borrowers' Programme (ABP)",
+    'National Youth Service Corps (NYSC)',
+    'Nigeria Centre for Disease Control (NCDC) Programs',
+]
+
+
+class ProgramMatcherTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.matcher = ProgramMatcher(enumerate(PROGRAM_NAMES))
+
+    def best(self, query):
+        matches = self.matcher.match(query, limit=1)
+        return matches[0].name if matches else None
+
+    def test_names_as_users_type_them(self):
+        self.assertEqual(self.best('npower'), 'N-Power')
+        self.assertEqual(self.best('n power'), 'N-Power')
+        self.assertEqual(self.best('npowr'), 'N-Power')
+        self.assertEqual(self.best('anchor borower'), "Anchor Borrowers' Programme (ABP)")
+        self.assertEqual(self.best('ccT'), 'Conditional Cash Transfer (CCT)')
+        self.assertEqual(self.best('government enterprise'), 'Government Enterprise & Empowerment Programme (GEEP)')
+
+    def test_acronyms_must_match_exactly(self):
+        self.assertIsNone(self.best('nct'))
+
+    def test_short_words_do_not_match_the_start_of_unrelated_names(self):
+        # "power" is two edits from "gover", the start of the GEEP name
+        self.assertEqual([match.name for match in self.matcher.match('power')], ['N-Power'])
+        self.assertEqual(self.matcher.match('batch'), [])
+        self.assertEqual(self.matcher.match('natural'), [])
@@ -0,0 +1,166 @@
+"""
+Cached machine translation for bot replies.
+
+Most translated text is the same handful of menus and notices, so every
+translation is remembered twice: in an in-process LRU and in the
+``TranslationMemo`` table keyed by (SHA-256 of the source, language).
+Only misses reach Google Translate.
+
+googletrans' ``Translator`` is asynchronous and owns an ``httpx``
+client bound to one event loop, so a single translator runs on a private
+loop thread and callers submit work to it. After a failed call the
+translator is skipped for ``FAILURE_BACKOFF`` seconds and the source text
+is returned untranslated, so an outage does not slow every message down.
+"""
+import asyncio
+import hashlib
+import inspect
+import logging
+import threading
+import time
+
+from django.db import DatabaseError
+
+from .lru import LRUCache
+from .models import TranslationMemo
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for Google Translate before giving up on a call
+TRANSLATE_TIMEOUT = 8
+# Seconds to skip the translator after it failed
+FAILURE_BACKOFF = 60
+
+_memo = LRUCache(maxsize=4096)
+
+
+class TranslationUnavailable(Exception):
+    """Google Translate could not be reached or failed recently"""
+
+
+_translator = None
+_loop = None
+_translator_lock = threading.Lock()
+_failed_until = 0.0
+
+
+def source_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _get_translator():
+    """Return the shared translator and the loop it runs on"""
+    global _translator, _loop
+    with _translator_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='translator-loop', daemon=True).start()
+        if _translator is None:
+            from googletrans import Translator
+
+            async def create():
+                # The httpx client must be created on the loop that uses it
+                return Translator(raise_exception=True)
+
+            _translator = asyncio.run_coroutine_threadsafe(create(), _loop).result(TRANSLATE_TIMEOUT)
+    return _translator, _loop
+
+
+def _call_translator(texts, language):
+    """Translate ``texts`` with one request batch; returns the translated strings"""
+    translator, loop = _get_translator()
+    result = translator.translate(texts, dest=language)
+    if inspect.isawaitable(result):
+        future = asyncio.run_coroutine_threadsafe(result, loop)
+        try:
+            result = future.result(TRANSLATE_TIMEOUT)
+        except Exception:
+            future.cancel()
+            raise
+    return [translated.text for translated in result]
+
+
+def _load_memos(hashes, language):
+    try:
+        return dict(
+            TranslationMemo.objects.filter(language=language, source_hash__in=hashes)
+            .values_list('source_hash', 'translated_text')
+        )
+    except DatabaseError:
+        logger.exception("Could not read translation memos")
+        return {}
+
+
+def _save_memos(pairs, language):
+    memos = [
+        TranslationMemo(source_hash=source_hash(text), language=language,
+                        source_text=text, translated_text=translated)
+        for text, translated in pairs
+    ]
+    try:
+        TranslationMemo.objects.bulk_create(memos, ignore_conflicts=True)
+    except DatabaseError:
+        logger.exception("Could not store translation memos")
+
+
+def translate_many(texts, language, strict=False):
+    """
+    Translate every string of ``texts`` into ``language``.
+
+    Cached translations are served from memory or the database, the rest
+    are sent to Google Translate in a single call. Strings that cannot be
+    translated are returned unchanged, or ``TranslationUnavailable`` is
+    raised when ``strict`` is set.
+    """
+    texts = list(texts)
+    if language == 'en' or not texts:
+        return texts
+
+    translations = {}
+    missing = {}
+    for text in texts:
+        if not text.strip():
+            translations[text] = text
+            continue
+        key = (source_hash(text), language)
+        cached = _memo.get(key)
+        if cached is not None:
+            translations[text] = cached
+        else:
+            missing[key[0]] = text
+
+    if missing:
+        for digest, translated in _load_memos(list(missing), language).items():
+            _memo.set((digest, language), translated)
+            translations[missing.pop(digest)] = translated
+
+    if missing:
+        pending = list(missing.values())
+        translated = _translate_remote(pending, language)
+        if translated is not None:
+            for text, result in zip(pending, translated):
+                _memo.set((source_hash(text), language), result)
+                translations[text] = result
+            _save_memos(zip(pending, translated), language)
+        elif strict:
+            raise TranslationUnavailable(f"Could not translate {len(pending)} text(s) to {language}")
+
+    return [translations.get(text, text) for text in texts]
+
+
+def _translate_remote(texts, language):
+    """Call Google Translate unless it failed recently; None on failure"""
+    global _failed_until
+    if time.monotonic() < _failed_until:
+        return None
+    try:
+        return _call_translator(texts, language)
+    except Exception as e:
+        _failed_until = time.monotonic() + FAILURE_BACKOFF
+        logger.warning("Translation to %s failed, skipping translator for %ss: %s", language, FAILURE_BACKOFF, e)
+        return None
+
+
+def translate(text, language):
+    """Translate one string; returns ``text`` unchanged when that fails"""
+    return translate_many([text], language)[0]
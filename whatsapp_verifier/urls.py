@@ -3,4 +3,5 @@ from . import views
 
 urlpatterns = [
     path('webhook/', views.whatsapp_webhook, name='whatsapp_webhook'),
+    path('status/', views.whatsapp_status_callback, name='whatsapp_status_callback'),
 ]
\ No newline at end of file
@@ -1,247 +1,196 @@
 import requests
-import base64
-import hashlib
-from urllib.parse import urlparse
-from decouple import config
-from googletrans import Translator
-from .models import FederalProgram
-
-VIRUSTOTAL_API_KEY = config('VIRUSTOTAL_API_KEY', default='')
+from website import reputation
+from . import blocklist, domain_matcher, virustotal
+from .canonical import canonicalize_url
+from .messages import render
+from .models import FederalProgram, URLVerdict
+from .program_matcher import match_programs, suggest_programs
+from .search import search_programs
+from .translation import translate, translate_many
+from .analysis_poller import watch_analysis
+from .verdicts import get_cached_verdict, lookup_verdict, submit_for_analysis
 
 def translate_text(text, dest_language):
-    """Translate text to the specified language"""
-    try:
-        translator = Translator()
-        translation = translator.translate(text, dest=dest_language)
-        return translation.text
-    except Exception as e:
-        print(f"Translation error: {e}")
-        return text
+    """Translate text to the specified language (cached, see ``translation``)"""
+    return translate(text, dest_language)
+
+def translate_texts(texts, dest_language):
+    """Translate several texts with at most one Google Translate call"""
+    return translate_many(texts, dest_language)
 
 def get_program_info(program_name, language='en'):
     """Get information about a federal program"""
     try:
-        # Try to find the program in the database
-        program = FederalProgram.objects.filter(name__icontains=program_name).first()
+        # Try the typo-tolerant name matcher, then full-text search
+        program = None
+        name_matches = match_programs(program_name, limit=1)
+        if name_matches:
+            program = FederalProgram.objects.filter(pk=name_matches[0].program_id).first()
+        if program is None:
+            matches = search_programs(program_name, limit=1)
+            program = matches[0] if matches else None
         
         if program:
-            message = f"✅ PROGRAM FOUND\n\n📋 Name: {program.name}\n🏢 Sector: {program.sector}\n🔗 Official Link: {program.link}"
+            message = render('program_found', language, name=program.name, sector=program.sector, link=program.link)
             if program.description:
-                message += f"\n📝 Description: {program.description}"
+                message += render('program_description', language, description=program.description)
         else:
             # If not found in database, provide general guidance
-            message = f"❌ PROGRAM NOT FOUND\n\n'{program_name}' was not found in our database.\n\n💡 Tips:\n• Check spelling\n• Try shorter name (e.g., 'N-Power' instead of 'N-Power Program')\n• Contact relevant ministry directly\n\n🏛️ Common Programs:\n• N-Power\n• Anchor Borrowers\n• TraderMoni\n• MarketMoni\n• Conditional Cash Transfer"
-        
-        # Translate if needed
-        if language != 'en':
-            message = translate_text(message, language)
+            suggestions = suggest_programs(program_name)
+            did_you_mean = ''
+            if suggestions:
+                did_you_mean = render('did_you_mean', language, suggestions='\n'.join(f"• {name}" for name in suggestions))
+            message = render('program_not_found', language, query=program_name, did_you_mean=did_you_mean)
             
         return message
         
     except Exception as e:
         print(f"Error getting program info: {e}")
-        base_message = f"⚠️ Error retrieving information for '{program_name}'. Please try again or contact support."
-        if language != 'en':
-            return translate_text(base_message, language)
-        return base_message
-
-def get_url_id_base64(url):
-    """Get base64 URL identifier for VirusTotal API (without padding)"""
-    try:
-        # Canonicalize URL (basic version)
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-        
-        # Remove trailing slash if present
-        if url.endswith('/') and len(url) > 8:  # Don't remove from just http:// or https://
-            url = url.rstrip('/')
-        
-        # Encode to base64 and remove padding
-        url_bytes = url.encode('utf-8')
-        base64_encoded = base64.urlsafe_b64encode(url_bytes).decode('utf-8')
-        # Remove padding characters
-        url_id = base64_encoded.rstrip('=')
-        return url_id
-    except Exception as e:
-        print(f"Error creating URL ID: {e}")
-        return None
-
-def get_url_id_sha256(url):
-    """Get SHA-256 URL identifier for VirusTotal API"""
-    try:
-        # Canonicalize URL (basic version)
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-            
-        # Remove trailing slash if present
-        if url.endswith('/') and len(url) > 8:
-            url = url.rstrip('/')
-        
-        # Create SHA-256 hash
-        url_bytes = url.encode('utf-8')
-        sha256_hash = hashlib.sha256(url_bytes).hexdigest()
-        return sha256_hash
-    except Exception as e:
-        print(f"Error creating SHA-256 URL ID: {e}")
-        return None
+        return render('program_error', language, query=program_name)
 
 def basic_url_safety_check(url):
     """Perform basic safety checks without API"""
-    try:
-        # Validate URL format
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-        
-        parsed = urlparse(url)
-        domain = parsed.netloc.lower()
-        
-        # List of known safe Nigerian government domains
-        safe_ng_domains = [
-            'gov.ng', 'n-sip.gov.ng', 'statehouse.gov.ng', 'cbn.gov.ng',
-            'ncdc.gov.ng', 'nphcda.gov.ng', 'nysc.gov.ng', 'nddc.gov.ng',
-            'tetfund.gov.ng', 'boi.ng', 'rea.gov.ng', 'npc.gov.ng'
-        ]
-        
-        # List of generally safe global domains
-        safe_global_domains = [
-            'google.com', 'github.com', 'wikipedia.org', 'microsoft.com',
-            'apple.com', 'facebook.com', 'instagram.com', 'twitter.com',
-            'youtube.com', 'whatsapp.com', 'linkedin.com'
-        ]
-        
-        # Check if it's a known safe domain
-        if any(safe_domain in domain for safe_domain in safe_ng_domains):
-            return f"✅ GOVERNMENT WEBSITE\n\nDomain: {domain}\nThis appears to be an official Nigerian government website. Generally safe for official use.\n\n🔒 Always verify the exact URL spelling before entering personal information."
-        
-        if any(safe_domain in domain for safe_domain in safe_global_domains):
-            return f"✅ KNOWN WEBSITE\n\nDomain: {domain}\nThis is a well-known website. Generally safe but always exercise caution.\n\n💡 Verify you're on the correct official website."
-        
-        # Check for suspicious patterns
-        suspicious_keywords = ['login', 'password', 'bank', 'verify', 'secure', 'account', 'pay', 'update', 'confirm']
-        suspicious_found = [kw for kw in suspicious_keywords if kw in url.lower()]
-        
-        if suspicious_found:
-            return f"⚠️ SUSPICIOUS PATTERNS DETECTED\n\nDomain: {domain}\nSuspicious keywords found: {', '.join(suspicious_found)}\n\n🚨 BE VERY CAREFUL:\n• This link contains words commonly used in phishing\n• Don't enter personal/financial information\n• Verify with official sources"
-        
-        # Check for suspicious domain patterns
-        if any(char in domain for char in ['xn--', '..', '--']):
-            return f"⚠️ SUSPICIOUS DOMAIN\n\nDomain: {domain}\nThis domain contains potentially suspicious patterns.\n\n🔍 Double-check the spelling and authenticity"
-        
+    return format_classification(domain_matcher.classify_url(url))
+
+def basic_url_safety_checks(urls):
+    """Batch version of ``basic_url_safety_check``"""
+    return [format_classification(c) for c in domain_matcher.classify_urls(urls)]
+
+def format_classification(classification):
+    """Render a ``domain_matcher.Classification`` as a WhatsApp reply"""
+    category, domain = classification.category, classification.domain
+    
+    if category == domain_matcher.GOVERNMENT:
+        return f"✅ GOVERNMENT WEBSITE\n\nDomain: {domain}\nThis appears to be an official Nigerian government website. Generally safe for official use.\n\n🔒 Always verify the exact URL spelling before entering personal information."
+    
+    if category == domain_matcher.KNOWN:
+        return f"✅ KNOWN WEBSITE\n\nDomain: {domain}\nThis is a well-known website. Generally safe but always exercise caution.\n\n💡 Verify you're on the correct official website."
+    
+    if category == domain_matcher.SUSPICIOUS_KEYWORDS_FOUND:
+        return f"⚠️ SUSPICIOUS PATTERNS DETECTED\n\nDomain: {domain}\nSuspicious keywords found: {', '.join(classification.keywords)}\n\n🚨 BE VERY CAREFUL:\n• This link contains words commonly used in phishing\n• Don't enter personal/financial information\n• Verify with official sources"
+    
+    if category == domain_matcher.SUSPICIOUS_DOMAIN:
+        return f"⚠️ SUSPICIOUS DOMAIN\n\nDomain: {domain}\nThis domain contains potentially suspicious patterns.\n\n🔍 Double-check the spelling and authenticity"
+    
+    if category == domain_matcher.UNKNOWN:
         return f"🔍 UNKNOWN WEBSITE\n\nDomain: {domain}\n\n💡 SAFETY TIPS:\n• Verify the website is legitimate\n• Check for spelling errors in the URL\n• Don't enter personal information unless certain\n• When in doubt, contact the organization directly"
-        
-    except Exception as e:
-        return f"❌ URL ANALYSIS ERROR\n\nCould not analyze the URL properly.\n\n💡 Manual check recommended:\n• Verify URL spelling\n• Check for suspicious characters\n• Only visit trusted websites"
+    
+    return f"❌ URL ANALYSIS ERROR\n\nCould not analyze the URL properly.\n\n💡 Manual check recommended:\n• Verify URL spelling\n• Check for suspicious characters\n• Only visit trusted websites"
 
-def verify_link_virustotal(url):
-    """Verify a URL using VirusTotal API with proper error handling"""
+def format_verdict_message(verdict, basic_result):
+    """Render a stored VirusTotal verdict as a WhatsApp reply"""
+    if verdict.verdict == URLVerdict.VERDICT_PENDING:
+        return f"🔍 ANALYSIS IN PROGRESS\n\nThis URL was recently submitted to VirusTotal.\n\n⏱️ Results will be available in 1-2 minutes.\nTry verifying again shortly.\n\n{basic_result}"
+    
+    stats = verdict.stats
+    analysis_date = verdict.scan_date.strftime('%Y-%m-%d %H:%M') if verdict.scan_date else "Unknown"
+    
+    # Analyze results
+    malicious = stats.get('malicious', 0)
+    suspicious = stats.get('suspicious', 0)
+    harmless = stats.get('harmless', 0)
+    undetected = stats.get('undetected', 0)
+    
+    total_scans = malicious + suspicious + harmless + undetected
+    
+    if malicious > 0:
+        return f"🚨 DANGEROUS LINK DETECTED!\n\n⚠️ {malicious}/{total_scans} security vendors flagged this as MALICIOUS\nLast analysis: {analysis_date}\n\n⛔ DO NOT VISIT THIS LINK\n⛔ DO NOT ENTER ANY INFORMATION\n\n{basic_result}"
+    
+    elif suspicious > 0:
+        return f"⚠️ SUSPICIOUS LINK\n\n🟡 {suspicious}/{total_scans} vendors flagged as suspicious\nLast analysis: {analysis_date}\n\n🔒 PROCEED WITH EXTREME CAUTION:\n• Don't enter personal information\n• Verify website legitimacy first\n\n{basic_result}"
+    
+    elif harmless > 0:
+        return f"✅ LINK APPEARS SAFE\n\n✓ {harmless}/{total_scans} vendors marked as harmless\nLast analysis: {analysis_date}\n\n{basic_result}"
+    
+    else:
+        return f"🔍 INCONCLUSIVE RESULTS\n\nScanned by {total_scans} vendors\nLast analysis: {analysis_date}\n\n{basic_result}"
+
+def verify_link_virustotal(url, phone_number=None):
+    """
+    Verify a URL using VirusTotal API with proper error handling.
+
+    When ``phone_number`` is given and VirusTotal has no verdict yet, that
+    user is sent the result as soon as the analysis finishes.
+    """
     print(f"🔍 Starting analysis for: {url}")
     
     # Always perform basic safety check first
     basic_result = basic_url_safety_check(url)
     
-    # If no API key, return basic check only
-    if not VIRUSTOTAL_API_KEY:
-        return f"⚠️ VirusTotal API unavailable\n\n{basic_result}"
-    
     # Validate and normalize URL
-    if not url.startswith(('http://', 'https://')):
-        url = 'https://' + url
-    
-    headers = {
-        "x-apikey": VIRUSTOTAL_API_KEY,
-        "User-Agent": "Federal-Programs-Bot/1.0"
-    }
+    try:
+        url = canonicalize_url(url)
+    except ValueError:
+        return f"❌ URL Processing Error\n\n{basic_result}"
     
     try:
-        # Create proper URL identifier using base64 encoding
-        url_id = get_url_id_base64(url)
-        if not url_id:
-            return f"❌ URL Processing Error\n\n{basic_result}"
-        
-        print(f"🔗 URL ID (base64): {url_id[:20]}...")
-        
-        # Try to get existing analysis first
-        analysis_url = f"https://www.virustotal.com/api/v3/urls/{url_id}"
-        
-        print(f"📡 Making API request to: {analysis_url}")
-        response = requests.get(analysis_url, headers=headers, timeout=15)
-        
-        print(f"📊 API Response Status: {response.status_code}")
-        
-        if response.status_code == 200:
-            # Existing analysis found
-            result = response.json()
-            
-            if 'data' not in result or 'attributes' not in result['data']:
-                return f"⚠️ API Response Format Error\n\n{basic_result}"
-            
-            attributes = result['data']['attributes']
-            
-            if 'last_analysis_stats' not in attributes:
-                return f"🔍 NO ANALYSIS DATA\n\nURL hasn't been fully analyzed yet.\n\n{basic_result}"
-            
-            stats = attributes['last_analysis_stats']
-            last_analysis = attributes.get('last_analysis_date', 0)
-            
-            # Convert timestamp to readable date if available
-            analysis_date = "Unknown"
-            if last_analysis:
-                try:
-                    from datetime import datetime
-                    analysis_date = datetime.fromtimestamp(last_analysis).strftime('%Y-%m-%d %H:%M')
-                except:
-                    analysis_date = "Recent"
-            
-            # Analyze results
-            malicious = stats.get('malicious', 0)
-            suspicious = stats.get('suspicious', 0)
-            harmless = stats.get('harmless', 0)
-            undetected = stats.get('undetected', 0)
-            
-            total_scans = malicious + suspicious + harmless + undetected
-            
-            if malicious > 0:
-                return f"🚨 DANGEROUS LINK DETECTED!\n\n⚠️ {malicious}/{total_scans} security vendors flagged this as MALICIOUS\nLast analysis: {analysis_date}\n\n⛔ DO NOT VISIT THIS LINK\n⛔ DO NOT ENTER ANY INFORMATION\n\n{basic_result}"
-            
-            elif suspicious > 0:
-                return f"⚠️ SUSPICIOUS LINK\n\n🟡 {suspicious}/{total_scans} vendors flagged as suspicious\nLast analysis: {analysis_date}\n\n🔒 PROCEED WITH EXTREME CAUTION:\n• Don't enter personal information\n• Verify website legitimacy first\n\n{basic_result}"
-            
-            elif harmless > 0:
-                return f"✅ LINK APPEARS SAFE\n\n✓ {harmless}/{total_scans} vendors marked as harmless\nLast analysis: {analysis_date}\n\n{basic_result}"
-            
-            else:
-                return f"🔍 INCONCLUSIVE RESULTS\n\nScanned by {total_scans} vendors\nLast analysis: {analysis_date}\n\n{basic_result}"
-        
-        elif response.status_code == 404:
+        # Known scam links are answered from the local blocklist
+        hit = blocklist.check_url(url)
+        if hit is not None:
+            print(f"⛔ Blocklist hit for {url}: {hit.matched}")
+            return f"🚨 KNOWN SCAM LINK!\n\n⛔ {hit.matched} is on our list of known scam and phishing sites.\n\n⛔ DO NOT VISIT THIS LINK\n⛔ DO NOT ENTER ANY INFORMATION\n\n{basic_result}"
+        
+        # Links our users keep reporting are flagged before VirusTotal catches up
+        reported = reputation.check_url(url)
+        if reported is not None:
+            print(f"📣 Reported link {url}: {reported.matched} ({reported.report_count} reporters)")
+            return f"🚨 REPORTED SCAM LINK!\n\n📣 {reported.matched} has been reported as a scam by {reported.report_count} of our users, most recently on {reported.last_reported:%d %b %Y}.\n\n⛔ DO NOT VISIT THIS LINK\n⛔ DO NOT ENTER ANY INFORMATION\n\n{basic_result}"
+        
+        # Reuse a fresh verdict for this link if we have one
+        cached = get_cached_verdict(url)
+        if cached is not None:
+            print(f"⚡ Cached verdict for {url}: {cached.verdict}")
+            if cached.verdict == URLVerdict.VERDICT_PENDING and phone_number:
+                watch_analysis(url, phone_number)
+                return f"🔍 ANALYSIS IN PROGRESS\n\nThis URL is already being analyzed by VirusTotal.\n\n🔔 We'll send you the result here as soon as it's ready.\n\n{basic_result}"
+            return format_verdict_message(cached, basic_result)
+        
+        # If no API key, return basic check only
+        if not virustotal.is_configured():
+            return f"⚠️ VirusTotal API unavailable\n\n{basic_result}"
+        
+        print(f"📡 Looking up {url} on VirusTotal")
+        verdict, status_code, response = lookup_verdict(url, timeout=45)
+        
+        print(f"📊 API Response Status: {status_code}")
+        
+        if verdict is not None:
+            return format_verdict_message(verdict, basic_result)
+        
+        elif status_code == 200:
+            # Report exists but VirusTotal has not finished analysing it
+            return f"🔍 NO ANALYSIS DATA\n\nURL hasn't been fully analyzed yet.\n\n{basic_result}"
+        
+        elif status_code == 404:
             # URL not found in VirusTotal database - submit for analysis
             print("📤 URL not found, attempting to submit for analysis...")
             
-            # Submit URL for analysis
-            submit_url = "https://www.virustotal.com/api/v3/urls"
-            submit_data = {"url": url}
-            
-            submit_response = requests.post(submit_url, headers=headers, data=submit_data, timeout=15)
+            submit_status, analysis_id = submit_for_analysis(url, timeout=45)
             
-            if submit_response.status_code == 200:
+            if submit_status == 200 and phone_number:
+                watch_analysis(url, phone_number, analysis_id)
+                return f"🔍 ANALYSIS SUBMITTED\n\nURL submitted to VirusTotal for analysis.\n\n🔔 We'll send you the result here in 1-2 minutes, no need to resend the link.\n\n{basic_result}"
+            elif submit_status == 200:
                 return f"🔍 ANALYSIS SUBMITTED\n\nURL submitted to VirusTotal for analysis.\n\n⏱️ Results will be available in 1-2 minutes.\nTry verifying again shortly.\n\n{basic_result}"
             else:
                 return f"🔍 NEW URL\n\nThis URL hasn't been analyzed by VirusTotal yet.\n\n{basic_result}"
         
-        elif response.status_code == 401:
+        elif status_code == 401:
             return f"🔑 API KEY ERROR\n\nVirusTotal API key is invalid or expired.\n\n{basic_result}"
         
-        elif response.status_code == 429:
+        elif status_code == 429:
             return f"⏰ RATE LIMIT EXCEEDED\n\nToo many requests. Please wait a moment and try again.\n\n{basic_result}"
         
         else:
-            print(f"❌ Unexpected API response: {response.status_code}")
-            try:
-                error_data = response.json()
-                print(f"Error details: {error_data}")
-            except:
-                print(f"Raw response: {response.text[:200]}")
+            print(f"❌ Unexpected API response: {status_code}")
+            if response is not None:
+                try:
+                    error_data = response.json()
+                    print(f"Error details: {error_data}")
+                except:
+                    print(f"Raw response: {response.text[:200]}")
             
-            return f"⚠️ API ERROR (Status: {response.status_code})\n\nUsing basic safety analysis:\n\n{basic_result}"
+            return f"⚠️ API ERROR (Status: {status_code})\n\nUsing basic safety analysis:\n\n{basic_result}"
                 
     except requests.exceptions.Timeout:
         return f"⏰ SERVICE TIMEOUT\n\nVirusTotal service is slow. Using basic analysis:\n\n{basic_result}"
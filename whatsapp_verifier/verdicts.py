@@ -0,0 +1,254 @@
+"""
+Shared store of VirusTotal verdicts.
+
+Both the website link checker and the WhatsApp bot read through this
+module before calling VirusTotal. Verdicts live in the ``URLVerdict``
+table and hot entries are also kept in a small in-process LRU so repeat
+lookups of a viral link never touch the database.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+from . import virustotal, vt_scheduler
+from .canonical import canonicalize_url, url_hash
+from .lru import LRUCache
+from .models import URLVerdict
+
+# How long a verdict stays fresh. Malicious links rarely become safe, while
+# a clean result can go stale as soon as the site is compromised.
+VERDICT_TTLS = {
+    URLVerdict.VERDICT_MALICIOUS: timedelta(days=7),
+    URLVerdict.VERDICT_SUSPICIOUS: timedelta(days=1),
+    URLVerdict.VERDICT_HARMLESS: timedelta(hours=6),
+    URLVerdict.VERDICT_UNDETECTED: timedelta(hours=6),
+    URLVerdict.VERDICT_PENDING: timedelta(minutes=2),
+}
+
+_verdict_cache = LRUCache(maxsize=2048)
+
+# Outcome of ``lookup_verdict``: ``verdict`` is a URLVerdict (or None) and
+# ``status_code`` the VirusTotal HTTP status (200 for cache hits).
+VerdictLookup = namedtuple('VerdictLookup', ['verdict', 'status_code', 'response'])
+
+
+def classify_threats(results):
+    """Group the per-engine results of a VirusTotal report by threat type"""
+    threat_types = {
+        'phishing': 0,
+        'malware': 0,
+        'spam': 0,
+        'scam': 0,
+        'suspicious': 0,
+        'other_malicious': 0
+    }
+
+    threat_details = []
+
+    for engine, result in results.items():
+        category = (result.get('category') or '').lower()
+        result_text = (result.get('result') or '').lower()
+
+        if category in ['malicious', 'suspicious']:
+            # Categorize by threat type
+            if 'phishing' in result_text or 'phish' in result_text:
+                threat_types['phishing'] += 1
+                threat_details.append({'engine': engine, 'type': 'Phishing', 'result': result.get('result') or 'Phishing detected'})
+            elif 'malware' in result_text or 'trojan' in result_text or 'virus' in result_text:
+                threat_types['malware'] += 1
+                threat_details.append({'engine': engine, 'type': 'Malware', 'result': result.get('result') or 'Malware detected'})
+            elif 'spam' in result_text:
+                threat_types['spam'] += 1
+                threat_details.append({'engine': engine, 'type': 'Spam', 'result': result.get('result') or 'Spam detected'})
+            elif 'scam' in result_text or 'fraud' in result_text:
+                threat_types['scam'] += 1
+                threat_details.append({'engine': engine, 'type': 'Scam/Fraud', 'result': result.get('result') or 'Scam detected'})
+            elif category == 'suspicious':
+                threat_types['suspicious'] += 1
+                threat_details.append({'engine': engine, 'type': 'Suspicious', 'result': result.get('result') or 'Suspicious activity'})
+            else:
+                threat_types['other_malicious'] += 1
+                threat_details.append({'engine': engine, 'type': 'Other Threat', 'result': result.get('result') or 'Threat detected'})
+
+    # Determine primary threat type
+    primary_threat = None
+    for threat, label in [('phishing', 'phishing'), ('malware', 'malware'), ('scam', 'scam'),
+                          ('spam', 'spam'), ('suspicious', 'suspicious'), ('other_malicious', 'other')]:
+        if threat_types[threat] > 0:
+            primary_threat = label
+            break
+
+    return threat_types, threat_details, primary_threat
+
+
+def verdict_from_stats(stats):
+    """Overall verdict for a ``last_analysis_stats`` block"""
+    if stats.get('malicious', 0) > 0:
+        return URLVerdict.VERDICT_MALICIOUS
+    if stats.get('suspicious', 0) > 0:
+        return URLVerdict.VERDICT_SUSPICIOUS
+    if stats.get('harmless', 0) > 0:
+        return URLVerdict.VERDICT_HARMLESS
+    return URLVerdict.VERDICT_UNDETECTED
+
+
+def _remember(verdict):
+    ttl = (verdict.expires_at - timezone.now()).total_seconds()
+    if ttl > 0:
+        _verdict_cache.set(verdict.url_hash, verdict, ttl=ttl)
+
+
+def get_cached_verdict(url):
+    """Return a fresh ``URLVerdict`` for ``url`` or None"""
+    key = url_hash(url)
+    verdict = _verdict_cache.get(key)
+    if verdict is not None:
+        return verdict
+
+    verdict = URLVerdict.objects.filter(url_hash=key, expires_at__gt=timezone.now()).first()
+    if verdict is not None:
+        _remember(verdict)
+    return verdict
+
+
+def _save_verdict(url, verdict, **fields):
+    now = timezone.now()
+    verdict_obj, _ = URLVerdict.objects.update_or_create(
+        url_hash=url_hash(url),
+        defaults={
+            'url': canonicalize_url(url),
+            'verdict': verdict,
+            'expires_at': now + VERDICT_TTLS[verdict],
+            **fields,
+        },
+    )
+    _remember(verdict_obj)
+    return verdict_obj
+
+
+def store_verdict(url, attributes):
+    """Store the verdict contained in a VirusTotal URL object's attributes"""
+    stats = attributes.get('last_analysis_stats') or {}
+    threat_types, threat_details, primary_threat = classify_threats(attributes.get('last_analysis_results') or {})
+
+    scan_date = None
+    if attributes.get('last_analysis_date'):
+        scan_date = datetime.fromtimestamp(attributes['last_analysis_date'], tz=dt_timezone.utc)
+
+    return _save_verdict(
+        url,
+        verdict_from_stats(stats),
+        stats=stats,
+        threat_types=threat_types,
+        threat_details=threat_details,
+        primary_threat=primary_threat,
+        reputation=attributes.get('reputation', 0) or 0,
+        scan_date=scan_date,
+    )
+
+
+def store_analysis_verdict(url, analysis):
+    """Store the verdict of a completed analysis object (``/analyses/{id}``)"""
+    return store_verdict(url, {
+        'last_analysis_stats': analysis.get('stats') or {},
+        'last_analysis_results': analysis.get('results') or {},
+        'last_analysis_date': analysis.get('date'),
+    })
+
+
+def store_pending_verdict(url):
+    """Remember that ``url`` was just submitted and has no verdict yet"""
+    return _save_verdict(
+        url,
+        URLVerdict.VERDICT_PENDING,
+        stats={},
+        threat_types={},
+        threat_details=[],
+        primary_threat=None,
+        scan_date=None,
+    )
+
+
+def lookup_verdict(url, priority=vt_scheduler.INTERACTIVE, timeout=30):
+    """
+    Return the verdict for ``url`` from the store, asking VirusTotal on a miss.
+
+    The VirusTotal call goes through the quota scheduler, so concurrent
+    lookups of the same link share one request. Network errors from the
+    client are left to the caller. When VirusTotal answers with anything
+    but a usable report, ``verdict`` is None; ``status_code`` is 429 when
+    no quota became available within ``timeout`` seconds. ``response`` is
+    only set for the caller that made the request.
+    """
+    cached = get_cached_verdict(url)
+    if cached is not None:
+        return VerdictLookup(cached, 200, None)
+
+    def call():
+        response = virustotal.get_url_report(url)
+        verdict = None
+        if response.status_code == 200:
+            attributes = (response.json().get('data') or {}).get('attributes') or {}
+            if 'last_analysis_stats' in attributes:
+                verdict = store_verdict(url, attributes)
+        elif response.status_code == 429:
+            vt_scheduler.drain()
+        return VerdictLookup(verdict, response.status_code, response), response.status_code
+
+    def replay(status_code):
+        return VerdictLookup(get_cached_verdict(url), status_code, None)
+
+    try:
+        return vt_scheduler.run(f"report:{url_hash(url)}", call, replay, priority=priority, timeout=timeout)
+    except vt_scheduler.VirusTotalBusy:
+        return VerdictLookup(None, 429, None)
+
+
+def submit_for_analysis(url, priority=vt_scheduler.INTERACTIVE, timeout=30):
+    """
+    Submit ``url`` to VirusTotal once and record it as pending.
+
+    Returns ``(status_code, analysis_id)``. The status is 200 when the
+    submission was accepted (or another caller already submitted the link,
+    in which case ``analysis_id`` may be empty) and 429 when no quota was
+    free in time.
+    """
+    def call():
+        cached = get_cached_verdict(url)
+        if cached is not None:
+            return (200, ''), [200, '']
+        response = virustotal.submit_url(url)
+        analysis_id = ''
+        if response.status_code == 200:
+            analysis_id = (response.json().get('data') or {}).get('id', '')
+            store_pending_verdict(url)
+        elif response.status_code == 429:
+            vt_scheduler.drain()
+        return (response.status_code, analysis_id), [response.status_code, analysis_id]
+
+    try:
+        return vt_scheduler.run(f"submit:{url_hash(url)}", call, tuple,
+                                priority=priority, timeout=timeout)
+    except vt_scheduler.VirusTotalBusy:
+        return 429, ''
+
+
+def verdict_as_result(verdict):
+    """Shape a verdict like the ``safe_browsing`` result of the website checker"""
+    if verdict.verdict == URLVerdict.VERDICT_PENDING:
+        return {
+            "error": "This link was just submitted to VirusTotal. Please check again in a minute or two.",
+            "safe": None,
+        }
+
+    return {
+        "safe": verdict.verdict not in (URLVerdict.VERDICT_MALICIOUS, URLVerdict.VERDICT_SUSPICIOUS),
+        "primary_threat": verdict.primary_threat,
+        "threat_types": verdict.threat_types,
+        "threat_details": verdict.threat_details,
+        "total_threats": sum(verdict.threat_types.values()),
+        "scan_date": int(verdict.scan_date.timestamp()) if verdict.scan_date else None,
+        "reputation": verdict.reputation,
+        "url": verdict.url,
+    }
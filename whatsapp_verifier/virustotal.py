@@ -0,0 +1,79 @@
+"""
+The single VirusTotal v3 client used by every link checker.
+
+A module-level ``requests.Session`` keeps connections to VirusTotal alive
+between lookups. Timeouts and bounded retries (connection errors and 5xx
+responses only) are configured here rather than at each call site.
+"""
+import threading
+
+import requests
+from decouple import config
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .canonical import canonicalize_url, vt_url_id
+
+VIRUSTOTAL_API_KEY = config('VIRUSTOTAL_API_KEY', default='')
+VIRUSTOTAL_API_BASE = config('VIRUSTOTAL_API_BASE', default='https://www.virustotal.com/api/v3')
+
+# (connect, read) timeouts in seconds
+VIRUSTOTAL_TIMEOUT = (
+    config('VIRUSTOTAL_CONNECT_TIMEOUT', default=3.05, cast=float),
+    config('VIRUSTOTAL_READ_TIMEOUT', default=10, cast=float),
+)
+VIRUSTOTAL_MAX_RETRIES = config('VIRUSTOTAL_MAX_RETRIES', default=2, cast=int)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def is_configured():
+    return bool(VIRUSTOTAL_API_KEY)
+
+
+def get_session():
+    """Return the shared keep-alive session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=VIRUSTOTAL_MAX_RETRIES,
+                    connect=VIRUSTOTAL_MAX_RETRIES,
+                    read=1,
+                    status=VIRUSTOTAL_MAX_RETRIES,
+                    backoff_factor=0.5,
+                    status_forcelist=(500, 502, 503, 504),
+                    allowed_methods=frozenset(['GET', 'POST']),
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=16, max_retries=retry)
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.headers.update({
+                    "x-apikey": VIRUSTOTAL_API_KEY,
+                    "User-Agent": "Federal-Programs-Bot/1.0",
+                })
+                _session = session
+    return _session
+
+
+def get_url_report(url):
+    """GET the URL object for ``url``; 404 means VirusTotal has never seen it"""
+    return get_session().get(f"{VIRUSTOTAL_API_BASE}/urls/{vt_url_id(url)}", timeout=VIRUSTOTAL_TIMEOUT)
+
+
+def submit_url(url):
+    """Submit ``url`` for a fresh analysis; the response carries the analysis id"""
+    return get_session().post(
+        f"{VIRUSTOTAL_API_BASE}/urls",
+        data={"url": canonicalize_url(url)},
+        timeout=VIRUSTOTAL_TIMEOUT,
+    )
+
+
+def get_analysis(analysis_id):
+    """GET an analysis object returned by ``submit_url``"""
+    return get_session().get(f"{VIRUSTOTAL_API_BASE}/analyses/{analysis_id}", timeout=VIRUSTOTAL_TIMEOUT)
@@ -0,0 +1,256 @@
+"""
+Quota scheduler in front of VirusTotal.
+
+The free VirusTotal tier only allows a handful of lookups per minute, so
+every network call goes through here:
+
+- a token bucket sized to the quota hands out one token per request;
+- waiters are served by priority (interactive checks before background
+  work) and then in arrival order;
+- concurrent lookups of the same key collapse into one in-flight call
+  whose result is shared with every waiter.
+
+State lives in a small SQLite file next to the project so all gunicorn
+workers on the host share one bucket. Within a process, waiters on the
+same key are woken directly instead of polling.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+RATE_PER_MINUTE = getattr(settings, 'VIRUSTOTAL_REQUESTS_PER_MINUTE', 4)
+BUCKET_CAPACITY = getattr(settings, 'VIRUSTOTAL_BURST', RATE_PER_MINUTE)
+STATE_PATH = getattr(settings, 'VIRUSTOTAL_QUOTA_DB', os.path.join(settings.BASE_DIR, 'vt_quota.sqlite3'))
+
+POLL_INTERVAL = 0.2
+# Waiters not heard from for this long, and in-flight calls older than
+# any caller would wait, belong to a process that died; they are removed
+# so they do not block the queue.
+WAITER_STALE_AFTER = 30
+INFLIGHT_STALE_AFTER = 120
+# Finished calls stay visible this long so followers in other processes
+# can pick up the outcome.
+FINISHED_TTL = 60
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+_calls = {}
+_calls_lock = threading.Lock()
+
+
+class VirusTotalBusy(Exception):
+    """No quota became available before the caller's deadline"""
+
+
+def _connect():
+    global _schema_ready
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(STATE_PATH, timeout=30, isolation_level=None, check_same_thread=False)
+        _local.conn = conn
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript("""
+                    CREATE TABLE IF NOT EXISTS bucket (
+                        name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL
+                    );
+                    CREATE TABLE IF NOT EXISTS waiters (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        priority INTEGER NOT NULL, seen REAL NOT NULL
+                    );
+                    CREATE TABLE IF NOT EXISTS inflight (
+                        key TEXT PRIMARY KEY, started REAL NOT NULL,
+                        finished REAL, outcome TEXT
+                    );
+                """)
+                _schema_ready = True
+    return conn
+
+
+class _Transaction:
+    """``BEGIN IMMEDIATE`` ... ``COMMIT`` on the shared state file"""
+
+    def __enter__(self):
+        self.conn = _connect()
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+def _refill(conn, now):
+    """Top up the bucket for the time elapsed and return the token count"""
+    row = conn.execute("SELECT tokens, updated FROM bucket WHERE name = 'virustotal'").fetchone()
+    if row is None:
+        tokens = float(BUCKET_CAPACITY)
+    else:
+        tokens, updated = row
+        tokens = min(float(BUCKET_CAPACITY), tokens + (now - updated) * RATE_PER_MINUTE / 60.0)
+    conn.execute(
+        "INSERT INTO bucket (name, tokens, updated) VALUES ('virustotal', ?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+        (tokens, now),
+    )
+    return tokens
+
+
+def acquire(priority=INTERACTIVE, timeout=30):
+    """
+    Block until a quota token is available for this caller.
+
+    Raises ``VirusTotalBusy`` if none is granted within ``timeout`` seconds.
+    """
+    deadline = time.monotonic() + timeout
+    with _Transaction() as conn:
+        waiter_id = conn.execute(
+            "INSERT INTO waiters (priority, seen) VALUES (?, ?)", (priority, time.time())
+        ).lastrowid
+
+    try:
+        while True:
+            now = time.time()
+            with _Transaction() as conn:
+                conn.execute("DELETE FROM waiters WHERE seen < ?", (now - WAITER_STALE_AFTER,))
+                conn.execute("UPDATE waiters SET seen = ? WHERE id = ?", (now, waiter_id))
+                tokens = _refill(conn, now)
+                head = conn.execute("SELECT id FROM waiters ORDER BY priority, id LIMIT 1").fetchone()
+                if head and head[0] == waiter_id and tokens >= 1:
+                    conn.execute("UPDATE bucket SET tokens = tokens - 1 WHERE name = 'virustotal'")
+                    conn.execute("DELETE FROM waiters WHERE id = ?", (waiter_id,))
+                    waiter_id = None
+                    return
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise VirusTotalBusy(f"No VirusTotal quota available within {timeout}s")
+            next_token = max(0.0, 1 - tokens) * 60.0 / RATE_PER_MINUTE
+            time.sleep(min(remaining, max(POLL_INTERVAL, min(next_token, 1.0))))
+    finally:
+        if waiter_id is not None:
+            with _Transaction() as conn:
+                conn.execute("DELETE FROM waiters WHERE id = ?", (waiter_id,))
+
+
+def drain():
+    """Empty the bucket, e.g. after VirusTotal itself answered 429"""
+    with _Transaction() as conn:
+        _refill(conn, time.time())
+        conn.execute("UPDATE bucket SET tokens = 0 WHERE name = 'virustotal'")
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _claim(key):
+    """Try to become the process that performs the call for ``key``"""
+    now = time.time()
+    with _Transaction() as conn:
+        conn.execute(
+            "DELETE FROM inflight WHERE finished < ? OR (finished IS NULL AND started < ?)",
+            (now - FINISHED_TTL, now - INFLIGHT_STALE_AFTER),
+        )
+        row = conn.execute("SELECT finished FROM inflight WHERE key = ?", (key,)).fetchone()
+        if row is not None and row[0] is None:
+            return False
+        conn.execute(
+            "INSERT OR REPLACE INTO inflight (key, started, finished, outcome) VALUES (?, ?, NULL, NULL)",
+            (key, now),
+        )
+        return True
+
+
+def _finish(key, outcome):
+    with _Transaction() as conn:
+        conn.execute(
+            "UPDATE inflight SET finished = ?, outcome = ? WHERE key = ?",
+            (time.time(), json.dumps(outcome), key),
+        )
+
+
+def _wait_for_other_process(key, deadline):
+    """Poll until the owning process finishes ``key``; None if it vanished"""
+    conn = _connect()
+    while time.monotonic() < deadline:
+        row = conn.execute("SELECT started, finished, outcome FROM inflight WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        started, finished, outcome = row
+        if finished is not None:
+            return json.loads(outcome)
+        if started < time.time() - INFLIGHT_STALE_AFTER:
+            return None
+        time.sleep(POLL_INTERVAL)
+    raise VirusTotalBusy(f"Timed out waiting for in-flight lookup of {key}")
+
+
+def run(key, call, replay, priority=INTERACTIVE, timeout=30):
+    """
+    Run ``call`` for ``key`` under the quota, sharing the result with every
+    concurrent caller of the same key.
+
+    ``call()`` must return ``(result, note)`` where ``note`` is a small
+    JSON-serialisable summary. Callers in the same process receive
+    ``result`` itself; callers in other processes receive ``replay(note)``.
+    """
+    deadline = time.monotonic() + timeout
+
+    with _calls_lock:
+        local = _calls.get(key)
+        leader = local is None
+        if leader:
+            local = _calls[key] = _Call()
+
+    if not leader:
+        if not local.done.wait(max(0.0, deadline - time.monotonic())):
+            raise VirusTotalBusy(f"Timed out waiting for in-flight lookup of {key}")
+        if local.error is not None:
+            raise local.error
+        return local.result
+
+    try:
+        while True:
+            if _claim(key):
+                outcome = {'busy': True}
+                try:
+                    acquire(priority, max(0.0, deadline - time.monotonic()))
+                    outcome = {'failed': True}
+                    local.result, note = call()
+                    outcome = {'note': note}
+                    return local.result
+                finally:
+                    _finish(key, outcome)
+
+            outcome = _wait_for_other_process(key, deadline)
+            if outcome is None or outcome.get('failed'):
+                # The other process went away or failed; try ourselves
+                continue
+            if outcome.get('busy'):
+                raise VirusTotalBusy("VirusTotal quota exhausted")
+            local.result = replay(outcome['note'])
+            return local.result
+    except Exception as e:
+        local.error = e
+        raise
+    finally:
+        with _calls_lock:
+            _calls.pop(key, None)
+        local.done.set()
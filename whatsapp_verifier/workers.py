@@ -0,0 +1,71 @@
+import logging
+import queue
+import threading
+import zlib
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class KeyedWorkerPool:
+    """
+    Small thread pool that runs jobs in the background.
+
+    Every job is submitted with a key (e.g. a phone number). Jobs sharing a
+    key always land on the same worker thread, so they run one at a time and
+    in the order they were submitted. Jobs for different keys run in parallel.
+    """
+
+    def __init__(self, name, size=4):
+        self.name = name
+        self.size = max(1, int(size))
+        self._queues = []
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the worker threads (safe to call more than once)"""
+        with self._lock:
+            if self._threads:
+                return False
+            for index in range(self.size):
+                jobs = queue.Queue()
+                thread = threading.Thread(
+                    target=self._run,
+                    args=(jobs,),
+                    name=f"{self.name}-{index}",
+                    daemon=True,
+                )
+                self._queues.append(jobs)
+                self._threads.append(thread)
+                thread.start()
+            return True
+
+    @property
+    def started(self):
+        return bool(self._threads)
+
+    def _shard(self, key):
+        return zlib.crc32(str(key).encode("utf-8")) % self.size
+
+    def submit(self, key, func, *args, **kwargs):
+        """Queue ``func(*args, **kwargs)`` behind earlier jobs for ``key``"""
+        self.start()
+        self._queues[self._shard(key)].put((func, args, kwargs))
+
+    def pending(self):
+        """Number of jobs waiting across all workers"""
+        return sum(jobs.qsize() for jobs in self._queues)
+
+    def _run(self, jobs):
+        while True:
+            func, args, kwargs = jobs.get()
+            close_old_connections()
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                logger.exception("%s job %s failed", self.name, getattr(func, "__name__", func))
+            finally:
+                close_old_connections()
+                jobs.task_done()